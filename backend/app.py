@@ -1,13 +1,23 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+import hashlib
+import mimetypes
 import os
-import uuid
+import threading
 from datetime import datetime
-from werkzeug.utils import secure_filename
+from PIL import UnidentifiedImageError
 from config import config, allowed_file
-from models.database import db, init_database, save_prediction_result, update_correction, get_object_type_by_name, ObjectType, Output, Input
+from models.database import db, init_database, save_prediction_result, update_correction, get_object_type_by_name, list_object_types, find_referenced_images, get_object_counts, get_object_count_totals, update_object_count_corrections, apply_accuracy_changes, ObjectType, Output, Input, OutputObjectCount, OutputSegments, AccuracyStats
 from performance_monitor import get_performance_monitor
 from performance_metrics import calculate_f1_metrics, calculate_legacy_accuracy, get_performance_badge_info
+from upload_io import UPLOAD_LAYOUTS, UploadWriter, decode_image
+from thumbnails import VariantGenerator
+from pagination import CountCache, encode_cursor, keyset_page
+from file_cleanup import FileCleanupWorker
+from result_writer import ResultWriteBehind
+from results_export import EXPORT_FORMATS, EXPORT_MIMETYPES, export_query, stream_export
+from sqlalchemy import delete, event, exists, false
+from werkzeug.security import safe_join
 
 # Create Flask app
 app = Flask(__name__)
@@ -17,22 +27,210 @@ CORS(app, origins=["http://localhost:3000", "http://localhost:3001"])  # Enable
 config_name = os.environ.get('FLASK_ENV', 'development')
 app.config.from_object(config[config_name])
 
+# Let the front-end server send upload bytes when configured to
+if app.config['UPLOAD_SERVE_MODE'] not in ('flask', 'x-accel', 'x-sendfile'):
+    raise ValueError(f"Unknown UPLOAD_SERVE_MODE: {app.config['UPLOAD_SERVE_MODE']}")
+app.config['USE_X_SENDFILE'] = app.config['UPLOAD_SERVE_MODE'] == 'x-sendfile'
+
+if app.config['UPLOAD_STORAGE'] not in UPLOAD_LAYOUTS:
+    raise ValueError(f"Unknown UPLOAD_STORAGE: {app.config['UPLOAD_STORAGE']}")
+
 # Initialize database
 init_database(app)
 
+# Background writer for uploaded files
+upload_writer = UploadWriter(
+    max_workers=app.config['UPLOAD_IO_WORKERS'],
+    fsync_policy=app.config['UPLOAD_FSYNC']
+)
+
+# Background generator for thumbnail / medium variants of uploads
+upload_variants = VariantGenerator(
+    sizes=app.config['UPLOAD_VARIANT_SIZES'],
+    max_workers=app.config['UPLOAD_VARIANT_WORKERS'],
+    max_queue=app.config['UPLOAD_VARIANT_QUEUE_SIZE']
+)
+
+# Exact result totals for cursor pagination, dropped whenever results change
+result_counts = CountCache(ttl=app.config['RESULTS_COUNT_CACHE_TTL'])
+
+@event.listens_for(Output, 'after_insert')
+@event.listens_for(Output, 'after_delete')
+def invalidate_result_counts(mapper, connection, target):
+    result_counts.invalidate()
+
+# Optional background writer for prediction results (RESULT_WRITE_MODE)
+if app.config['RESULT_WRITE_MODE'] not in ('sync', 'write-behind'):
+    raise ValueError(f"Unknown RESULT_WRITE_MODE: {app.config['RESULT_WRITE_MODE']}")
+
+def on_results_committed(batch):
+    """Write-behind commit hook: refresh totals and release the uploads' claims"""
+    result_counts.invalidate()
+    for record in batch:
+        upload_writer.release(app.config['UPLOAD_FOLDER'], record['image_path'])
+
+result_writer = None
+result_writer_lock = threading.Lock()
+
+def start_result_writer():
+    """
+    Write-behind writer of this server process, created on first use
+    
+    Only the server creates it (scripts importing app never touch the
+    journals); creating it replays journals left by stopped processes.
+    """
+    global result_writer
+    with result_writer_lock:
+        if result_writer is None and app.config['RESULT_WRITE_MODE'] == 'write-behind':
+            # Bulk inserts skip ORM events, so the writer invalidates totals itself
+            result_writer = ResultWriteBehind(
+                app,
+                journal_path=app.config['WRITE_BEHIND_JOURNAL'],
+                batch_size=app.config['WRITE_BEHIND_BATCH_SIZE'],
+                max_delay=app.config['WRITE_BEHIND_MAX_DELAY_MS'] / 1000,
+                fsync=app.config['WRITE_BEHIND_FSYNC'],
+                max_attempts=app.config['WRITE_BEHIND_MAX_ATTEMPTS'],
+                on_commit=on_results_committed
+            )
+    return result_writer
+
+def persist_prediction(image_path, object_type_name, predicted_count, description=None, object_counts=None,
+                       segment_data=None):
+    """
+    Store a prediction result, in the background when write-behind is enabled
+    
+    Returns:
+        tuple: (result_id, created_at ISO string)
+    """
+    writer = start_result_writer()
+    if writer is not None:
+        # The upload stays claimed until the writer commits the result (on_results_committed)
+        upload_writer.claim(app.config['UPLOAD_FOLDER'], image_path)
+        record = writer.submit(
+            image_path, object_type_name, predicted_count,
+            description=description, object_counts=object_counts, segment_data=segment_data
+        )
+        return record['output_id'], record['created_at']
+    
+    output_record = save_prediction_result(
+        image_path=image_path,
+        object_type_name=object_type_name,
+        predicted_count=predicted_count,
+        description=description,
+        object_counts=object_counts,
+        segment_data=segment_data
+    )
+    return output_record.id, output_record.created_at.isoformat()
+
 # Initialize the AI pipeline with error handling
 pipeline = None
 pipeline_error = None
 
 try:
-    from models.pipeline import ObjectCountingPipeline
-    pipeline = ObjectCountingPipeline()
-    print("✅ AI Pipeline initialized successfully!")
+    from models.backends import create_pipeline
+    pipeline = create_pipeline(app.config)
+    print(f"✅ AI Pipeline initialized successfully! (backend: {app.config['PIPELINE_BACKEND']})")
 except Exception as e:
     pipeline_error = str(e)
     print(f"❌ Failed to initialize AI pipeline: {e}")
     print("💡 Make sure all dependencies are installed. See INSTALL_STEPS.md")
 
+def primary_object_type(objects):
+    """
+    Object type a count-all result is stored under: the most detected type,
+    or the first object type when that one is unknown or nothing was detected
+    """
+    if objects:
+        primary_object = max(objects, key=lambda x: x["count"])
+        if get_object_type_by_name(primary_object["type"]):
+            return primary_object["type"]
+    return list_object_types()[0]['name']
+
+def ingest_upload(image_file, full_resolution=False):
+    """
+    Read an upload once, decode it and start persisting it in the background
+    
+    Args:
+        image_file: Uploaded file from the request
+        full_resolution (bool): Skip reduced-size JPEG decoding
+    
+    Returns:
+        tuple: (image_array, decode_stats, store_future); the future resolves
+               to the stored path relative to UPLOAD_FOLDER
+    """
+    data = image_file.read()
+    draft_size = None if full_resolution else (app.config['DECODE_DRAFT_SIZE'] or None)
+    image, decode_stats = decode_image(data, draft_size=draft_size)
+    
+    upload_folder = app.config['UPLOAD_FOLDER']
+    store_future = upload_writer.store(
+        upload_folder, data, image_file.filename, layout=app.config['UPLOAD_STORAGE']
+    )
+    
+    # Thumbnails are generated in the background once the original is on disk
+    def queue_variants(future):
+        if future.exception() is None:
+            upload_variants.enqueue(upload_folder, future.result())
+    store_future.add_done_callback(queue_variants)
+    
+    return image, decode_stats, store_future
+
+def release_upload_claim(store_future):
+    """Drop a request's claim on its stored upload once its result is persisted (or failed)"""
+    if store_future.exception() is None:
+        upload_writer.release(app.config['UPLOAD_FOLDER'], store_future.result())
+
+def remove_upload(image_path):
+    """File cleanup job: delete an upload file and its cached variants"""
+    upload_folder = app.config['UPLOAD_FOLDER']
+    # Skipped if an identical upload was stored since the file was condemned
+    if upload_writer.remove(upload_folder, image_path):
+        print(f"🗑️  Deleted image file: {image_path}")
+        upload_variants.remove(upload_folder, image_path)
+
+def release_uploads(image_paths):
+    """
+    Queue removal of upload files that no remaining input references
+    
+    Content-addressed files are shared by identical uploads, so call this
+    after the deleting transaction commits. The reference check runs here,
+    on the request thread, under the upload writer's lock; the worker only
+    touches the filesystem, and not if the file was stored again meanwhile.
+    """
+    def find_referenced(paths):
+        referenced = set()
+        for chunk in chunked(paths, BULK_DELETE_CHUNK_SIZE):
+            referenced |= find_referenced_images(chunk)
+        return referenced
+    
+    upload_cleanup.enqueue(
+        upload_writer.condemn(app.config['UPLOAD_FOLDER'], sorted(set(image_paths)), find_referenced)
+    )
+
+# Upload files of deleted results are removed off the request thread, with retry
+upload_cleanup = FileCleanupWorker(
+    remove_upload,
+    max_attempts=app.config['UPLOAD_CLEANUP_ATTEMPTS'],
+    retry_delay=app.config['UPLOAD_CLEANUP_RETRY_DELAY']
+)
+
+def wants_full_resolution():
+    """Whether the request asked to skip reduced-size decoding"""
+    return request.form.get('full_resolution', 'false').lower() in ('1', 'true', 'yes')
+
+def build_stage_metrics(decode_stats, result):
+    """Merge decode stats with the pipeline's per-stage times"""
+    stage_times = {"decode": decode_stats["decode_time"]}
+    stage_times.update(result.get("stage_times", {}))
+    return {
+        "stage_times": stage_times,
+        "decoded_pixels": decode_stats["decoded_pixels"],
+        "decoded_size": decode_stats["decoded_size"],
+        "original_size": decode_stats["original_size"],
+        "draft_decode": decode_stats["draft"],
+        "mask_stats": result.get("mask_stats")
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -44,7 +242,8 @@ def health_check():
             "message": "Object Counting API is running",
             "database": "connected",
             "object_types": object_types_count,
-            "pipeline_available": pipeline is not None
+            "pipeline_available": pipeline is not None,
+            "pipeline_backend": app.config['PIPELINE_BACKEND']
         })
     except Exception as e:
         return jsonify({
@@ -86,6 +285,7 @@ def test_pipeline():
             "object_type": object_type,
             "predicted_count": result["count"],
             "total_segments": result["total_segments"],
+            "skipped_segments": result.get("skipped_segments", 0),
             "processing_time": result["processing_time"]
         })
         
@@ -131,42 +331,49 @@ def count_objects():
         # Verify object type exists
         object_type = get_object_type_by_name(object_type_name)
         if not object_type:
-            available_types = [ot.name for ot in ObjectType.query.all()]
+            available_types = [ot['name'] for ot in list_object_types()]
             return jsonify({
                 "error": f"Invalid object type: {object_type_name}",
                 "available_types": available_types
             }), 400
         
-        # Save uploaded image
-        filename = secure_filename(image_file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        # Ensure upload directory exists
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        image_file.save(image_path)
-        
-        # Process image with AI pipeline
-        image_file.seek(0)  # Reset file pointer for pipeline processing
-        result = pipeline.count_objects(image_file, object_type_name)
-        
-        # Save result to database (store relative path)
-        output_record = save_prediction_result(
-            image_path=unique_filename,  # Store just the filename, not full path
-            object_type_name=object_type_name,
-            predicted_count=result["count"],
-            description=description
-        )
+        # Decode once; the original is written to disk while the pipeline runs
+        try:
+            image, decode_stats, store_future = ingest_upload(
+                image_file, full_resolution=wants_full_resolution()
+            )
+        except (UnidentifiedImageError, OSError):
+            return jsonify({"error": "Invalid image file"}), 400
+        
+        try:
+            # Process image with AI pipeline
+            result = pipeline.count_objects(image, object_type_name)
+            image_path = store_future.result()
+            
+            # Save result to database (store relative path)
+            result_id, created_at = persist_prediction(
+                image_path=image_path,  # Store the path relative to UPLOAD_FOLDER
+                object_type_name=object_type_name,
+                predicted_count=result["count"],
+                description=description,
+                object_counts={object_type_name: result["count"]},
+                segment_data=result.get("segment_data")
+            )
+        finally:
+            release_upload_claim(store_future)
         
         return jsonify({
             "success": True,
-            "result_id": output_record.id,
+            "result_id": result_id,
             "object_type": object_type_name,
             "predicted_count": result["count"],
             "total_segments": result["total_segments"],
+            "skipped_segments": result.get("skipped_segments", 0),
+            "early_exit": result.get("early_exit", False),
             "processing_time": result["processing_time"],
-            "image_path": f"uploads/{unique_filename}",  # Return path for frontend use
-            "created_at": output_record.created_at.isoformat()
+            "stage_metrics": build_stage_metrics(decode_stats, result),
+            "image_path": f"uploads/{image_path}",  # Return path for frontend use
+            "created_at": created_at
         })
         
     except Exception as e:
@@ -204,56 +411,31 @@ def count_all_objects():
                 "allowed_types": list(app.config['ALLOWED_EXTENSIONS'])
             }), 400
         
-        # Save uploaded image
-        filename = secure_filename(image_file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        # Ensure upload directory exists
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        image_file.save(image_path)
-        
-        # Process image with AI pipeline for multi-object detection
-        image_file.seek(0)  # Reset file pointer for pipeline processing
-        result = pipeline.count_all_objects(image_file)
-        
-        # Store results for all detected object types in database
-        # We'll use the most common object type as the primary for now
-        # (This can be enhanced later for better multi-object storage)
-        if result["objects"]:
-            # Find the most detected object type
-            primary_object = max(result["objects"], key=lambda x: x["count"])
-            primary_object_type = get_object_type_by_name(primary_object["type"])
+        # Decode once; the original is written to disk while the pipeline runs
+        try:
+            image, decode_stats, store_future = ingest_upload(
+                image_file, full_resolution=wants_full_resolution()
+            )
+        except (UnidentifiedImageError, OSError):
+            return jsonify({"error": "Invalid image file"}), 400
+        
+        try:
+            # Process image with AI pipeline for multi-object detection
+            result = pipeline.count_all_objects(image)
+            image_path = store_future.result()
             
-            if primary_object_type:
-                # Save primary result to database
-                output_record = save_prediction_result(
-                    image_path=unique_filename,
-                    object_type_name=primary_object["type"],
-                    predicted_count=result["total_objects"],  # Store total count
-                    description=description
-                )
-                result_id = output_record.id
-            else:
-                # Fallback to first available object type
-                fallback_type = ObjectType.query.first()
-                output_record = save_prediction_result(
-                    image_path=unique_filename,
-                    object_type_name=fallback_type.name,
-                    predicted_count=result["total_objects"],
-                    description=description
-                )
-                result_id = output_record.id
-        else:
-            # No objects detected - store with first available type
-            fallback_type = ObjectType.query.first()
-            output_record = save_prediction_result(
-                image_path=unique_filename,
-                object_type_name=fallback_type.name,
-                predicted_count=0,
-                description=description
+            # Store results for all detected object types in database; the most
+            # common type is the primary, per-type counts go to output_object_counts
+            result_id, created_at = persist_prediction(
+                image_path=image_path,
+                object_type_name=primary_object_type(result["objects"]),
+                predicted_count=result["total_objects"],  # Store total count
+                description=description,
+                object_counts={obj["type"]: obj["count"] for obj in result["objects"]},
+                segment_data=result.get("segment_data")
             )
-            result_id = output_record.id
+        finally:
+            release_upload_claim(store_future)
         
         return jsonify({
             "success": True,
@@ -261,9 +443,11 @@ def count_all_objects():
             "objects": result["objects"],
             "total_objects": result["total_objects"],
             "total_segments": result["total_segments"],
+            "skipped_segments": result.get("skipped_segments", 0),
             "processing_time": result["processing_time"],
-            "image_path": f"uploads/{unique_filename}",
-            "created_at": output_record.created_at.isoformat()
+            "stage_metrics": build_stage_metrics(decode_stats, result),
+            "image_path": f"uploads/{image_path}",
+            "created_at": created_at
         })
         
     except Exception as e:
@@ -313,27 +497,52 @@ def correct_prediction():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def results_query(object_type_filter=None, contains=None):
+    """
+    Results joined with their input and object type, newest first
+    
+    Served by ix_outputs_created_at, or ix_outputs_object_type_created_at
+    when filtered by (primary) object type. contains keeps results with a
+    non-zero per-type count for that type, whatever their primary type.
+    """
+    # Base query joining Output, Input, and ObjectType tables
+    query = db.session.query(Output, Input, ObjectType).join(
+        Input, Output.input_fk == Input.id
+    ).join(
+        ObjectType, Output.object_type_fk == ObjectType.id
+    )
+    
+    # Filter on cached type ids, so the filters hit the object_type_fk indexes directly
+    if object_type_filter and object_type_filter != 'all':
+        object_type = get_object_type_by_name(object_type_filter)
+        query = query.filter(Output.object_type_fk == object_type['id'] if object_type else false())
+    
+    if contains:
+        object_type = get_object_type_by_name(contains)
+        query = query.filter(Output.id.in_(
+            db.session.query(OutputObjectCount.output_fk)
+            .filter(OutputObjectCount.object_type_fk == object_type['id'], OutputObjectCount.predicted_count > 0)
+        ) if object_type else false())
+    
+    # Order by creation date (newest first); id breaks ties for cursors
+    return query.order_by(Output.created_at.desc(), Output.id.desc())
+
 @app.route('/api/results', methods=['GET'])
 def get_results():
-    """Get all prediction results with pagination and complete data"""
+    """
+    Get all prediction results with pagination and complete data
+    Pass ?cursor= (empty for the first page) for keyset pagination
+    """
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         object_type_filter = request.args.get('object_type')
+        contains = request.args.get('contains')
         
-        # Base query joining Output, Input, and ObjectType tables
-        query = db.session.query(Output, Input, ObjectType).join(
-            Input, Output.input_fk == Input.id
-        ).join(
-            ObjectType, Output.object_type_fk == ObjectType.id
-        )
-        
-        # Apply object type filter if specified
-        if object_type_filter and object_type_filter != 'all':
-            query = query.filter(ObjectType.name == object_type_filter)
+        query = results_query(object_type_filter, contains)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Output.created_at.desc())
+        if 'cursor' in request.args:
+            return get_results_page(query, request.args['cursor'], per_page, (object_type_filter or 'all', contains))
         
         # Apply pagination
         paginated = query.paginate(
@@ -342,23 +551,9 @@ def get_results():
             error_out=False
         )
         
-        # Format results for frontend
-        results = []
-        for output, input_record, object_type in paginated.items:
-            results.append({
-                "id": output.id,
-                "object_type": object_type.name,
-                "predicted_count": output.predicted_count,
-                "corrected_count": output.corrected_count,
-                "image_path": input_record.image_path,
-                "description": input_record.description or "",
-                "created_at": output.created_at.isoformat(),
-                "input_id": input_record.id
-            })
-        
         return jsonify({
             "success": True,
-            "results": results,
+            "results": format_result_rows(paginated.items),
             "pagination": {
                 "page": page,
                 "per_page": per_page,
@@ -372,35 +567,208 @@ def get_results():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def format_result_rows(rows):
+    """Format (Output, Input, ObjectType) rows, with per-type counts, for the frontend"""
+    object_counts = get_object_counts([output.id for output, _, _ in rows])
+    results = []
+    for output, input_record, object_type in rows:
+        results.append({
+            "id": output.id,
+            "object_type": object_type.name,
+            "predicted_count": output.predicted_count,
+            "corrected_count": output.corrected_count,
+            "image_path": input_record.image_path,
+            "description": input_record.description or "",
+            "created_at": output.created_at.isoformat(),
+            "input_id": input_record.id,
+            "object_counts": object_counts[output.id]
+        })
+    return results
+
+def get_results_page(query, cursor, per_page, count_key):
+    """
+    Keyset-paginated results: an index seek past the cursor, no OFFSET
+    The exact total is only computed with ?include_total=true, and cached.
+    """
+    if per_page < 1:
+        return jsonify({"error": "per_page must be positive"}), 400
+    
+    try:
+        rows, has_next = keyset_page(query, Output.created_at, Output.id, cursor, per_page)
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    
+    pagination = {
+        "per_page": per_page,
+        "has_next": has_next,
+        "next_cursor": encode_cursor(rows[-1][0].created_at, rows[-1][0].id) if has_next else None
+    }
+    if request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes'):
+        pagination["total"] = result_counts.get(count_key, lambda: query.order_by(None).count())
+    
+    return jsonify({
+        "success": True,
+        "results": format_result_rows(rows),
+        "pagination": pagination
+    })
+
+@app.route('/api/results/export', methods=['GET'])
+def export_results():
+    """
+    Stream the full results history as CSV, JSONL or Parquet
+    Rows come from a server-side cursor in EXPORT_BATCH_SIZE batches, so the
+    response is never built in memory. Optional ?start= and ?end= (ISO dates,
+    end exclusive) and ?object_type= filters.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Invalid format: {export_format}", "formats": list(EXPORT_FORMATS)}), 400
+    
+    try:
+        start, end = (
+            datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+            for name in ('start', 'end')
+        )
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates"}), 400
+    
+    try:
+        query = export_query(start, end, request.args.get('object_type'))
+        chunks = stream_export(export_format, query, batch_size=app.config['EXPORT_BATCH_SIZE'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename=results.{export_format}"}
+    )
+
 @app.route('/api/object-types', methods=['GET'])
 def get_object_types():
     """Get all available object types"""
     try:
-        object_types = ObjectType.query.all()
         return jsonify({
-            "object_types": [obj_type.to_dict() for obj_type in object_types]
+            "object_types": list_object_types()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_accuracy_stats_summary():
+    """
+    Accuracy over all corrected results, overall and per object type
+    Read from running sums kept up to date by every correction, so the cost
+    does not grow with history size.
+    """
+    try:
+        rows = db.session.query(AccuracyStats, ObjectType.name)\
+            .outerjoin(ObjectType, AccuracyStats.object_type_fk == ObjectType.id)\
+            .all()
+        
+        overall = None
+        by_object_type = []
+        for stats, object_type_name in rows:
+            if stats.object_type_fk is None:
+                overall = stats.to_dict()
+            elif stats.corrected_results:
+                by_object_type.append({"object_type": object_type_name, **stats.to_dict()})
+        
+        return jsonify({
+            "success": True,
+            "overall": overall or AccuracyStats(corrected_results=0, excellent_count=0, good_count=0,
+                                                needs_review_count=0).to_dict(),
+            "by_object_type": sorted(by_object_type, key=lambda row: row["object_type"])
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/uploads/<filename>')
+@app.route('/api/object-counts', methods=['GET'])
+def get_object_count_summary():
+    """Per-object-type totals across all results (aggregated in SQL)"""
+    try:
+        return jsonify({
+            "success": True,
+            "object_counts": get_object_count_totals()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def upload_etag(filename, size=None):
+    """Strong ETag for an upload (or one of its resized variants)"""
+    return hashlib.sha1(f"{filename}:{size or 'original'}".encode()).hexdigest()
+
+def cached_upload_response(response, etag):
+    """Mark an upload response as immutable and long-lived"""
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['UPLOAD_CACHE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/uploads/<path:filename>')
 def serve_uploaded_file(filename):
     """
     Serve uploaded images for frontend display
+    Optional ?size=thumb|medium serves a cached resized variant
     """
     try:
         upload_folder = app.config['UPLOAD_FOLDER']
-        file_path = os.path.join(upload_folder, filename)
+        size = request.args.get('size')
         
-        # Security check: ensure file exists and is in uploads directory
-        if not os.path.exists(file_path):
-            return jsonify({"error": "File not found"}), 404
+        if size and size not in upload_variants.sizes:
+            return jsonify({
+                "error": f"Invalid size: {size}",
+                "available_sizes": list(upload_variants.sizes)
+            }), 400
         
         # Ensure the file is within the uploads directory (prevent directory traversal)
-        if not os.path.abspath(file_path).startswith(os.path.abspath(upload_folder)):
+        file_path = safe_join(upload_folder, filename)
+        if file_path is None:
             return jsonify({"error": "Access denied"}), 403
         
-        return send_file(file_path)
+        # A deleted upload must not be revalidated from a client's cached copy
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            return jsonify({"error": "File not found"}), 404
+        
+        # Upload names are content hashes (or uuid-prefixed) and never rewritten, so
+        # the ETag can be derived from the name alone
+        etag = upload_etag(filename, size)
+        if etag in request.if_none_match:
+            return cached_upload_response(app.response_class(status=304), etag)
+        
+        last_modified = datetime.utcfromtimestamp(int(file_stat.st_mtime))
+        if not request.if_none_match and request.if_modified_since \
+                and request.if_modified_since.replace(tzinfo=None) >= last_modified:
+            return cached_upload_response(app.response_class(status=304), etag)
+        
+        if size:
+            # Generated on first request if the background pool has not got to it yet
+            try:
+                file_path = upload_variants.get_variant(upload_folder, filename, size)
+            except FileNotFoundError:
+                # The original was deleted since the check above
+                return jsonify({"error": "File not found"}), 404
+        
+        if app.config['UPLOAD_SERVE_MODE'] == 'x-accel':
+            # nginx streams the file from its internal location (sendfile, Range, 304s)
+            relative_path = os.path.relpath(file_path, upload_folder).replace(os.sep, '/')
+            response = app.response_class(mimetype=mimetypes.guess_type(file_path)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = app.config['UPLOAD_ACCEL_PREFIX'] + relative_path
+            return cached_upload_response(response, etag)
+        
+        # conditional=True adds Range / 206 support for large originals
+        # (with UPLOAD_SERVE_MODE=x-sendfile, send_file only emits the X-Sendfile header)
+        response = send_file(
+            file_path,
+            mimetype='image/jpeg' if size else None,
+            etag=etag,
+            last_modified=last_modified,
+            conditional=True
+        )
+        return cached_upload_response(response, etag)
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -418,23 +786,17 @@ def delete_result(result_id):
         # Find the associated input record
         input_record = Input.query.get(output.input_fk)
         
-        # Delete the image file if it exists
-        if input_record and input_record.image_path:
-            try:
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], input_record.image_path)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"🗑️  Deleted image file: {input_record.image_path}")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not delete image file: {e}")
-        
         # Delete the records from database
+        apply_accuracy_changes([(output.object_type_fk, output.predicted_count, output.corrected_count, None)])
         db.session.delete(output)
         if input_record:
             db.session.delete(input_record)
-        
         db.session.commit()
         
+        # The image file is removed in the background unless another input shares it
+        if input_record and input_record.image_path:
+            release_uploads([input_record.image_path])
+        
         print(f"✅ Deleted result {result_id} and associated data")
         
         return jsonify({
@@ -458,25 +820,47 @@ def update_result_feedback(result_id):
         
         corrected_count = data.get('corrected_count')
         object_type_name = data.get('object_type')
+        object_corrections = data.get('object_counts')
         
         if corrected_count is None:
             return jsonify({"error": "corrected_count is required"}), 400
         
+        if object_corrections is not None and not (
+            isinstance(object_corrections, dict)
+            and all(isinstance(count, int) and count >= 0 for count in object_corrections.values())
+        ):
+            return jsonify({"error": "object_counts must map object types to non-negative integers"}), 400
+        
         # Find the output record
         output = Output.query.get(result_id)
         if not output:
             return jsonify({"error": "Result not found"}), 404
         
-        # Update the corrected count
+        # Object type if provided (unknown names leave it unchanged)
+        object_type_fk = output.object_type_fk
+        if object_type_name:
+            object_type = get_object_type_by_name(object_type_name)
+            if object_type:
+                object_type_fk = object_type['id']
+        
+        # Update the corrected count and type (and the running accuracy stats, same transaction);
+        # a type change moves the result's share of the sums to the new type, as remap_results does
         old_corrected_count = output.corrected_count
+        apply_accuracy_changes([
+            (output.object_type_fk, output.predicted_count, old_corrected_count, None),
+            (object_type_fk, output.predicted_count, None, corrected_count)
+        ])
         output.corrected_count = corrected_count
+        output.object_type_fk = object_type_fk
         output.updated_at = datetime.utcnow()
         
-        # Update object type if provided
-        if object_type_name:
-            object_type = ObjectType.query.filter_by(name=object_type_name).first()
-            if object_type:
-                output.object_type_id = object_type.id
+        # Per-type corrections for multi-object results
+        if object_corrections:
+            try:
+                update_object_count_corrections(result_id, object_corrections)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 400
         
         db.session.commit()
         
@@ -488,6 +872,7 @@ def update_result_feedback(result_id):
             "result_id": result_id,
             "predicted_count": output.predicted_count,
             "corrected_count": output.corrected_count,
+            "object_counts": get_object_counts([result_id])[result_id],
             "updated_at": output.updated_at.isoformat()
         })
         
@@ -554,7 +939,8 @@ def get_result_details(result_id):
                 # Legacy metrics (for compatibility)
                 "accuracy": accuracy,
                 "difference": abs(output.predicted_count - output.corrected_count) if output.corrected_count is not None else None,
-                "has_feedback": output.corrected_count is not None
+                "has_feedback": output.corrected_count is not None,
+                "object_counts": get_object_counts([output.id])[output.id]
             }
         })
         
@@ -562,6 +948,13 @@ def get_result_details(result_id):
         print(f"❌ Error getting result details for {result_id}: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Ids per IN clause, below SQLite's bound-parameter limit
+BULK_DELETE_CHUNK_SIZE = 500
+
+def chunked(items, size):
+    """Split a list into consecutive slices of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 @app.route('/api/results/bulk-delete', methods=['DELETE'])
 def bulk_delete_results():
     """Delete multiple results and their associated data"""
@@ -583,46 +976,56 @@ def bulk_delete_results():
         except (ValueError, TypeError):
             return jsonify({"error": "All result IDs must be integers"}), 400
         
-        deleted_results = []
-        deleted_files = []
-        failed_deletions = []
-        
-        for result_id in result_ids:
-            try:
-                # Find the output record
-                output = Output.query.get(result_id)
-                if not output:
-                    failed_deletions.append({"id": result_id, "reason": "Result not found"})
-                    continue
-                
-                # Find the associated input record
-                input_record = Input.query.get(output.input_id)
-                
-                # Delete the image file if it exists
-                if input_record and input_record.image_path:
-                    try:
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], input_record.image_path)
-                        if os.path.exists(file_path):
-                            os.remove(file_path)
-                            deleted_files.append(input_record.image_path)
-                            print(f"🗑️  Deleted image file: {input_record.image_path}")
-                    except Exception as e:
-                        print(f"⚠️  Warning: Could not delete image file for result {result_id}: {e}")
-                
-                # Delete the records from database
-                db.session.delete(output)
-                if input_record:
-                    db.session.delete(input_record)
-                
-                deleted_results.append(result_id)
-                
-            except Exception as e:
-                failed_deletions.append({"id": result_id, "reason": str(e)})
-                print(f"❌ Error deleting result {result_id}: {e}")
-        
-        # Commit all successful deletions
+        result_ids = list(dict.fromkeys(result_ids))
+        
+        # Resolve every requested result and its input in one IN query per chunk
+        rows = []
+        for chunk in chunked(result_ids, BULK_DELETE_CHUNK_SIZE):
+            rows.extend(db.session.query(
+                Output.id, Output.input_fk, Output.object_type_fk,
+                Output.predicted_count, Output.corrected_count, Input.image_path
+            ).outerjoin(
+                Input, Output.input_fk == Input.id
+            ).filter(Output.id.in_(chunk)).all())
+        
+        found_ids = {row.id for row in rows}
+        deleted_results = [result_id for result_id in result_ids if result_id in found_ids]
+        failed_deletions = [
+            {"id": result_id, "reason": "Result not found"}
+            for result_id in result_ids if result_id not in found_ids
+        ]
+        input_ids = list({row.input_fk for row in rows})
+        image_paths = list({row.image_path for row in rows if row.image_path})
+        
+        # Set-based deletes in a single transaction; inputs still used by
+        # another output are kept
         if deleted_results:
+            apply_accuracy_changes([
+                (row.object_type_fk, row.predicted_count, row.corrected_count, None) for row in rows
+            ])
+            for chunk in chunked(deleted_results, BULK_DELETE_CHUNK_SIZE):
+                db.session.execute(
+                    delete(OutputObjectCount).where(OutputObjectCount.output_fk.in_(chunk)),
+                    execution_options={"synchronize_session": False}
+                )
+                db.session.execute(
+                    delete(OutputSegments).where(OutputSegments.output_fk.in_(chunk)),
+                    execution_options={"synchronize_session": False}
+                )
+                db.session.execute(
+                    delete(Output).where(Output.id.in_(chunk)),
+                    execution_options={"synchronize_session": False}
+                )
+            for chunk in chunked(input_ids, BULK_DELETE_CHUNK_SIZE):
+                db.session.execute(
+                    delete(Input).where(Input.id.in_(chunk), ~exists().where(Output.input_fk == Input.id)),
+                    execution_options={"synchronize_session": False}
+                )
             db.session.commit()
+            
+            # Bulk statements bypass the ORM events that keep cached totals fresh
+            result_counts.invalidate()
+            release_uploads(image_paths)
             print(f"✅ Bulk deleted {len(deleted_results)} results: {deleted_results}")
         
         # Prepare response
@@ -630,7 +1033,7 @@ def bulk_delete_results():
             "success": True,
             "deleted_count": len(deleted_results),
             "deleted_result_ids": deleted_results,
-            "deleted_files": deleted_files,
+            "queued_files": image_paths,
             "failed_count": len(failed_deletions),
             "failures": failed_deletions,
             "message": f"Successfully deleted {len(deleted_results)} results"
@@ -733,6 +1136,10 @@ def get_performance_summary():
 if __name__ == '__main__':
     # Create uploads directory if it doesn't exist
     os.makedirs('uploads', exist_ok=True)
+    # Replay journaled results before serving (no-op unless RESULT_WRITE_MODE=write-behind);
+    # app.run(debug=True) reloads, so only in the serving child, not the watching parent
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_result_writer()
     print("Starting Object Counting API...")
     print("Available endpoints:")
     print("  GET  /health - Health check")
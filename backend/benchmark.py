@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the object counting pipeline
+Runs ObjectCountingPipeline in-process (no server needed) over a directory of
+images or over deterministic synthetic images and reports per-stage latency
+percentiles, throughput, peak memory and model load time.
+
+Usage:
+    python benchmark.py --preset quick
+    python benchmark.py --images ../model_pipeline --repetitions 3 --json bench.json
+    python benchmark.py --preset standard --compare bench.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from upload_io import decode_image
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'}
+
+# Presets keep runs comparable across commits: same synthetic seed, sizes and counts
+PRESETS = {
+    'quick': {
+        'synthetic': 2,
+        'sizes': [(640, 480)],
+        'repetitions': 1,
+        'concurrency': 1,
+        'warmup': 1
+    },
+    'standard': {
+        'synthetic': 4,
+        'sizes': [(1024, 768), (1920, 1080)],
+        'repetitions': 3,
+        'concurrency': 1,
+        'warmup': 1
+    },
+    'full': {
+        'synthetic': 8,
+        'sizes': [(1024, 768), (1920, 1080), (4000, 3000)],
+        'repetitions': 5,
+        'concurrency': 2,
+        'warmup': 2
+    }
+}
+
+SYNTHETIC_SEED = 1234
+PERCENTILES = (50, 95, 99)
+
+
+def generate_synthetic_images(count, sizes, seed=SYNTHETIC_SEED):
+    """
+    Generate deterministic synthetic test images
+
+    Each image is a noisy background with random rectangles and ellipses so
+    SAM produces a realistic number of masks.
+
+    Returns:
+        list: (name, encoded JPEG bytes) tuples
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+
+    for index in range(count):
+        width, height = sizes[index % len(sizes)]
+        background = rng.integers(90, 160, size=(height, width, 3), dtype=np.uint8)
+        image = Image.fromarray(background, 'RGB')
+        draw = ImageDraw.Draw(image)
+
+        for _ in range(int(rng.integers(6, 16))):
+            x0 = int(rng.integers(0, width - 20))
+            y0 = int(rng.integers(0, height - 20))
+            x1 = min(width - 1, x0 + int(rng.integers(20, max(21, width // 3))))
+            y1 = min(height - 1, y0 + int(rng.integers(20, max(21, height // 3))))
+            color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+            if rng.random() < 0.5:
+                draw.rectangle([x0, y0, x1, y1], fill=color)
+            else:
+                draw.ellipse([x0, y0, x1, y1], fill=color)
+
+        # JPEG like real uploads, so reduced-size decoding is exercised
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        images.append((f"synthetic_{index:03d}_{width}x{height}.jpg", buffer.getvalue()))
+
+    return images
+
+
+def load_image_directory(directory):
+    """Load all supported images from a directory as (name, bytes) tuples"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            images.append((name, f.read()))
+    return images
+
+
+def summarize_latencies(samples):
+    """
+    Summarize latency samples (seconds) as milliseconds
+
+    Returns:
+        dict: count, mean and p50/p95/p99 in milliseconds
+    """
+    if not samples:
+        return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {'count': int(values.size), 'mean_ms': round(float(values.mean()), 2)}
+    for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{pct}_ms'] = round(float(value), 2)
+    return summary
+
+
+def format_table(headers, rows):
+    """Render rows as a plain-text table"""
+    widths = [len(str(h)) for h in headers]
+    for row in rows:
+        widths = [max(w, len(str(cell))) for w, cell in zip(widths, row)]
+
+    def render(cells):
+        return '  '.join(str(cell).ljust(width) for cell, width in zip(cells, widths))
+
+    lines = [render(headers), '  '.join('-' * w for w in widths)]
+    lines.extend(render(row) for row in rows)
+    return '\n'.join(lines)
+
+
+class PeakRSSSampler:
+    """Track peak resident set size of this process"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _current_rss(self):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._current_rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.peak_bytes = self._current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        # The OS high-water mark catches spikes between samples
+        try:
+            import resource
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_rss *= 1 if sys.platform == 'darwin' else 1024
+            self.peak_bytes = max(self.peak_bytes, max_rss)
+        except ImportError:
+            pass
+        return self.peak_bytes
+
+
+def get_git_commit():
+    """Return the current git commit (short hash) or None"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(pipeline, images, repetitions=1, concurrency=1, warmup=1,
+                  mode='all', object_type='car', draft_size=None):
+    """
+    Run the pipeline over the images and collect timings
+
+    Args:
+        pipeline: Object exposing count_objects / count_all_objects
+        images (list): (name, bytes) tuples
+        repetitions (int): Passes over the image set
+        concurrency (int): Worker threads sharing the pipeline
+        warmup (int): Untimed runs before measuring
+        mode (str): 'all' for count_all_objects, 'count' for count_objects
+        object_type (str): Target type for 'count' mode
+        draft_size (int): Reduced-size JPEG decode target, None for full decode
+
+    Returns:
+        dict: Raw timings, segment counts and wall time
+    """
+    def run_one(data):
+        # Decode the same way the upload endpoints do, then hand over the array
+        start = time.perf_counter()
+        image, decode_stats = decode_image(data, draft_size=draft_size)
+        if mode == 'count':
+            result = pipeline.count_objects(image, object_type)
+        else:
+            result = pipeline.count_all_objects(image)
+        result.setdefault('stage_times', {})['decode'] = decode_stats['decode_time']
+        result['decoded_pixels'] = decode_stats['decoded_pixels']
+        return time.perf_counter() - start, result
+
+    for _, data in images[:warmup]:
+        run_one(data)
+
+    jobs = [data for _ in range(repetitions) for _, data in images]
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(run_one, jobs))
+    wall_time = time.perf_counter() - wall_start
+
+    stage_samples = {}
+    totals = []
+    segments = 0
+    decoded_pixels = 0
+    masks = {'generated': 0, 'suppressed': 0}
+    for elapsed, result in outcomes:
+        totals.append(elapsed)
+        segments += result.get('total_segments', 0)
+        decoded_pixels += result.get('decoded_pixels', 0)
+        for key in masks:
+            masks[key] += result.get('mask_stats', {}).get(key, 0)
+        for stage, seconds in result.get('stage_times', {}).items():
+            stage_samples.setdefault(stage, []).append(seconds)
+
+    return {
+        'wall_time': wall_time,
+        'totals': totals,
+        'stage_samples': stage_samples,
+        'images': len(jobs),
+        'segments': segments,
+        'decoded_pixels': decoded_pixels,
+        'masks': masks
+    }
+
+
+def build_report(run, model_load_time, peak_rss_bytes, settings):
+    """Build the JSON-serializable benchmark report"""
+    wall_time = run['wall_time'] or 1e-9
+    return {
+        'benchmark': 'pipeline',
+        'timestamp': datetime.utcnow().isoformat(),
+        'git_commit': get_git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'device': settings.get('device')
+        },
+        'settings': settings,
+        'model_load_time_s': round(model_load_time, 3),
+        'peak_rss_mb': round(peak_rss_bytes / 1024 / 1024, 1),
+        'images_processed': run['images'],
+        'segments_processed': run['segments'],
+        'decoded_megapixels': round(run.get('decoded_pixels', 0) / 1e6, 2),
+        'wall_time_s': round(run['wall_time'], 3),
+        'images_per_sec': round(run['images'] / wall_time, 3),
+        'segments_per_sec': round(run['segments'] / wall_time, 3),
+        'masks_generated': run.get('masks', {}).get('generated', 0),
+        'mask_suppression_rate': round(
+            run['masks']['suppressed'] / run['masks']['generated'], 4
+        ) if run.get('masks', {}).get('generated') else 0.0,
+        'latency': {
+            'total': summarize_latencies(run['totals']),
+            'stages': {
+                stage: summarize_latencies(samples)
+                for stage, samples in run['stage_samples'].items()
+            }
+        }
+    }
+
+
+def print_report(report, baseline=None):
+    """Print the report (and optional deltas against a baseline) as tables"""
+    print(f"\n📊 Pipeline benchmark @ {report['git_commit'] or 'unknown commit'}")
+    print(f"   Model load: {report['model_load_time_s']}s | Peak RSS: {report['peak_rss_mb']} MB")
+    print(f"   Images/sec: {report['images_per_sec']} | Segments/sec: {report['segments_per_sec']}")
+    print(f"   SAM masks: {report.get('masks_generated', 0)} | Suppressed by mask NMS: "
+          f"{report.get('mask_suppression_rate', 0.0) * 100:.1f}%")
+    print()
+
+    stages = dict(report['latency']['stages'])
+    stages['total'] = report['latency']['total']
+    base_stages = {}
+    if baseline:
+        base_stages = dict(baseline['latency']['stages'])
+        base_stages['total'] = baseline['latency']['total']
+
+    headers = ['stage', 'n', 'p50 ms', 'p95 ms', 'p99 ms']
+    if baseline:
+        headers.append('p50 Δ%')
+
+    rows = []
+    for stage, summary in stages.items():
+        row = [stage, summary['count'], summary['p50_ms'], summary['p95_ms'], summary['p99_ms']]
+        if baseline:
+            base = base_stages.get(stage)
+            if base and base['p50_ms']:
+                row.append(f"{(summary['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100:+.1f}")
+            else:
+                row.append('n/a')
+        rows.append(row)
+
+    print(format_table(headers, rows))
+
+    if baseline:
+        base_ips = baseline.get('images_per_sec') or 0
+        if base_ips:
+            delta = (report['images_per_sec'] - base_ips) / base_ips * 100
+            print(f"\n   Throughput vs {baseline.get('git_commit') or 'baseline'}: {delta:+.1f}% images/sec")
+
+
+def create_pipeline(backend='sam', fake_latency_ms=0.0):
+    """Instantiate the selected pipeline backend and time model loading"""
+    from models.backends import create_pipeline as create_backend
+    start = time.perf_counter()
+    pipeline = create_backend({
+        'PIPELINE_BACKEND': backend,
+        'FAKE_PIPELINE_LATENCY_MS': fake_latency_ms
+    })
+    return pipeline, time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the object counting pipeline in-process")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick',
+                        help="Benchmark preset (default: quick)")
+    parser.add_argument('--images', help="Directory of images to use instead of synthetic images")
+    parser.add_argument('--synthetic', type=int, help="Number of synthetic images to generate")
+    parser.add_argument('--repetitions', type=int, help="Passes over the image set")
+    parser.add_argument('--concurrency', type=int, help="Worker threads sharing the pipeline")
+    parser.add_argument('--warmup', type=int, help="Untimed warmup runs")
+    parser.add_argument('--mode', choices=['all', 'count'], default='all',
+                        help="'all' runs count_all_objects, 'count' runs count_objects")
+    parser.add_argument('--object-type', default='car', help="Target type for --mode count")
+    parser.add_argument('--draft-size', type=int, default=1024,
+                        help="Reduced-size JPEG decode target (0 for full decode)")
+    parser.add_argument('--backend', choices=['sam', 'fake'], default='sam',
+                        help="Pipeline backend (fake skips model loading)")
+    parser.add_argument('--fake-latency-ms', type=float, default=0.0,
+                        help="Simulated latency per image for --backend fake")
+    parser.add_argument('--json', dest='json_path', help="Write the JSON report to this path")
+    parser.add_argument('--compare', help="Previous JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    preset = PRESETS[args.preset]
+
+    repetitions = args.repetitions or preset['repetitions']
+    concurrency = args.concurrency or preset['concurrency']
+    warmup = preset['warmup'] if args.warmup is None else args.warmup
+
+    if args.images:
+        images = load_image_directory(args.images)
+        source = os.path.abspath(args.images)
+    else:
+        images = generate_synthetic_images(args.synthetic or preset['synthetic'], preset['sizes'])
+        source = f"synthetic(seed={SYNTHETIC_SEED})"
+
+    if not images:
+        print("❌ No images to benchmark")
+        return 1
+
+    print(f"🚀 Benchmarking {len(images)} images x {repetitions} repetitions "
+          f"(concurrency={concurrency}, preset={args.preset})")
+
+    sampler = PeakRSSSampler()
+    sampler.start()
+    pipeline, model_load_time = create_pipeline(args.backend, args.fake_latency_ms)
+    run = run_benchmark(
+        pipeline, images,
+        repetitions=repetitions,
+        concurrency=concurrency,
+        warmup=warmup,
+        mode=args.mode,
+        object_type=args.object_type,
+        draft_size=args.draft_size or None
+    )
+    peak_rss = sampler.stop()
+
+    settings = {
+        'preset': args.preset,
+        'backend': args.backend,
+        'source': source,
+        'image_count': len(images),
+        'repetitions': repetitions,
+        'concurrency': concurrency,
+        'warmup': warmup,
+        'mode': args.mode,
+        'draft_size': args.draft_size or None,
+        'object_type': args.object_type if args.mode == 'count' else None,
+        'device': getattr(pipeline, 'device', None)
+    }
+    report = build_report(run, model_load_time, peak_rss, settings)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for SAM mask postprocessing
+Generates synthetic SAM-style mask records (COCO RLE, as the pipeline asks
+SAM for) at several image sizes and mask counts and times each
+postprocessing step from models/postprocess.py on its own, plus the whole
+chain segment_image() runs after SAM. No model is loaded.
+
+Usage:
+    python benchmark_postprocess.py --save-baseline postprocess_baseline.json
+    python benchmark_postprocess.py --baseline postprocess_baseline.json --threshold 0.15
+
+Exits with status 1 when any step's throughput drops by more than the
+threshold compared to the baseline.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmark import format_table, get_git_commit
+from models import postprocess, rle
+
+# (width, height, mask_count)
+CASES = {
+    'quick': [(640, 480, 16), (1024, 768, 32)],
+    'standard': [(640, 480, 16), (1024, 768, 64), (1920, 1080, 64)],
+    'large': [(1024, 768, 64), (1920, 1080, 128), (4000, 3000, 64)]
+}
+
+TOP_N = 10
+MASK_SEED = 42
+# Pre-filter thresholds that all take part (see prefilter_masks())
+PREFILTER = {'max_area_fraction': 0.9, 'min_area_fraction': 0.001, 'max_aspect_ratio': 10, 'max_border_edges': 2,
+             'min_stability': 0.9}
+
+
+def generate_synthetic_masks(width, height, count, seed=MASK_SEED):
+    """
+    Generate SAM-style mask records
+
+    Masks are ellipses of varied size; about a third are parts nested inside
+    an earlier mask, like SAM's whole-object-plus-parts output.
+
+    Returns:
+        list: dicts with segmentation, area, bbox, predicted_iou,
+              stability_score, point_coords and crop_box
+    """
+    rng = np.random.default_rng(seed)
+    ys, xs = np.ogrid[:height, :width]
+    masks = []
+
+    for index in range(count):
+        if masks and rng.random() < 0.33:
+            x, y, w, h = masks[int(rng.integers(0, len(masks)))]['bbox']
+            cx = x + w * rng.uniform(0.3, 0.7)
+            cy = y + h * rng.uniform(0.3, 0.7)
+            rx = max(2.0, w * rng.uniform(0.1, 0.3))
+            ry = max(2.0, h * rng.uniform(0.1, 0.3))
+        else:
+            cx = rng.uniform(0, width)
+            cy = rng.uniform(0, height)
+            rx = rng.uniform(0.02, 0.3) * width
+            ry = rng.uniform(0.02, 0.3) * height
+
+        segmentation = ((xs - cx) / rx) ** 2 + ((ys - cy) / ry) ** 2 <= 1.0
+        rows = np.any(segmentation, axis=1)
+        cols = np.any(segmentation, axis=0)
+        if not rows.any():
+            continue
+        y0, y1 = np.where(rows)[0][[0, -1]]
+        x0, x1 = np.where(cols)[0][[0, -1]]
+
+        masks.append({
+            'segmentation': segmentation,
+            'area': int(segmentation.sum()),
+            'bbox': [int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1)],
+            'predicted_iou': float(rng.uniform(0.7, 1.0)),
+            'stability_score': float(rng.uniform(0.85, 1.0)),
+            'point_coords': [[float(cx), float(cy)]],
+            'crop_box': [0, 0, width, height]
+        })
+
+    return masks
+
+
+def synthetic_image(width, height, seed=MASK_SEED):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8), 'RGB')
+
+
+def time_step(func, repeat):
+    """Median wall time of func over repeat runs (after one warmup run)"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def benchmark_case(width, height, mask_count, repeat):
+    """Time each postprocessing step for one synthetic case"""
+    image = np.array(synthetic_image(width, height))
+    # The masks as SAM returns them with output_mode='coco_rle'
+    masks = [
+        {**mask_data, 'segmentation': rle.encode(mask_data['segmentation'])}
+        for mask_data in generate_synthetic_masks(width, height, mask_count)
+    ]
+
+    masks_sorted = postprocess.sort_masks(masks)
+    rles = [mask_data['segmentation'] for mask_data in masks_sorted]
+    stability = [mask_data['stability_score'] for mask_data in masks_sorted]
+    kept_masks = [
+        mask_data for mask_data, kept in zip(masks_sorted, postprocess.suppress_duplicate_masks(rles)) if kept
+    ]
+    top_rles = [mask_data['segmentation'] for mask_data in kept_masks[:TOP_N]]
+    top_boxes = rle.bbox(top_rles)
+
+    def segment():
+        # What ObjectCountingPipeline.segment_image() does after SAM
+        ordered = postprocess.sort_masks(masks)
+        ordered_rles = [mask_data['segmentation'] for mask_data in ordered]
+        rejected = postprocess.prefilter_masks(ordered_rles, stability, (width, height), **PREFILTER)
+        keep = postprocess.suppress_duplicate_masks(ordered_rles, suppressors=~rejected)
+        postprocess.extract_segments_rle(
+            image, [mask_data for mask_data, kept in zip(ordered, keep) if kept], TOP_N, skip=rejected[keep]
+        )
+
+    steps = {
+        'sort': lambda: postprocess.sort_masks(masks),
+        'rle_bbox': lambda: rle.bbox(rles),
+        'prefilter': lambda: postprocess.prefilter_masks(rles, stability, (width, height), **PREFILTER),
+        'mask_nms': lambda: postprocess.suppress_duplicate_masks(rles),
+        'visible': lambda: postprocess.visible_windows(top_rles, top_boxes),
+        'extract': lambda: postprocess.extract_segments_rle(image, kept_masks, TOP_N),
+        'segment': segment
+    }
+
+    results = {}
+    for name, func in steps.items():
+        median = time_step(func, repeat)
+        results[name] = {
+            'median_ms': round(median * 1000, 4),
+            'throughput_per_s': round(1.0 / median, 2) if median > 0 else float('inf')
+        }
+    return results
+
+
+def compare_to_baseline(report, baseline, threshold):
+    """
+    Compare step throughput against a baseline report
+
+    Returns:
+        list: (case, step, baseline_tp, current_tp, change) for regressions
+    """
+    regressions = []
+    for case, steps in report['results'].items():
+        base_steps = baseline.get('results', {}).get(case, {})
+        for step, current in steps.items():
+            base = base_steps.get(step)
+            if not base or not base.get('throughput_per_s'):
+                continue
+            change = (current['throughput_per_s'] - base['throughput_per_s']) / base['throughput_per_s']
+            if change < -threshold:
+                regressions.append((case, step, base['throughput_per_s'], current['throughput_per_s'], change))
+    return regressions
+
+
+def run(preset, repeat):
+    results = {}
+    for width, height, mask_count in CASES[preset]:
+        case = f"{width}x{height}_{mask_count}masks"
+        print(f"⏱️  {case}...")
+        results[case] = benchmark_case(width, height, mask_count, repeat)
+
+    return {
+        'benchmark': 'postprocess',
+        'git_commit': get_git_commit(),
+        'preset': preset,
+        'repeat': repeat,
+        'top_n': TOP_N,
+        'results': results
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SAM mask postprocessing steps")
+    parser.add_argument('--preset', choices=sorted(CASES), default='standard')
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per step")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="Allowed throughput drop as a fraction (default: 0.15)")
+    parser.add_argument('--save-baseline', help="Write this run as the new baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args.preset, args.repeat)
+
+    rows = [
+        [case, step, values['median_ms'], values['throughput_per_s']]
+        for case, steps in report['results'].items()
+        for step, values in steps.items()
+    ]
+    print()
+    print(format_table(['case', 'step', 'median ms', 'ops/s'], rows))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} step(s) regressed by more than {args.threshold:.0%}:")
+            for case, step, base_tp, current_tp, change in regressions:
+                print(f"   {case} {step}: {base_tp} -> {current_tp} ops/s ({change:+.1%})")
+            return 1
+        print(f"\n✅ No step regressed by more than {args.threshold:.0%} "
+              f"vs {baseline.get('git_commit') or 'baseline'}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Upload serving throughput: Flask streaming vs X-Accel-Redirect / X-Sendfile
+In-process mode measures how much worker time /uploads/<filename> costs in
+each UPLOAD_SERVE_MODE (what a gunicorn worker would spend per request).
+HTTP mode hits running servers, e.g. Flask directly vs nginx in front of it.
+
+Usage:
+    python benchmark_uploads.py --file-mb 8 --requests 200 --concurrency 8
+    python benchmark_uploads.py --url http://localhost:5000/uploads/x.jpg --url http://localhost/uploads/x.jpg
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Serving files does not need the models
+os.environ.setdefault('PIPELINE_BACKEND', 'fake')
+
+from benchmark import format_table, summarize_latencies
+
+SERVE_MODES = ('flask', 'x-accel', 'x-sendfile')
+
+
+def run_requests(fetch, total, concurrency):
+    """
+    Call fetch() total times across concurrency threads
+
+    Returns:
+        dict: requests/sec, MB/sec and latency summary
+    """
+    latencies = []
+    transferred = [0]
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        size = fetch()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            transferred[0] += size
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total)))
+    wall_time = time.perf_counter() - wall_start
+
+    return {
+        'requests_per_sec': round(total / wall_time, 1),
+        'mb_per_sec': round(transferred[0] / wall_time / 1024 / 1024, 1),
+        'latency': summarize_latencies(latencies)
+    }
+
+
+def benchmark_in_process(file_mb, total, concurrency):
+    """Serve one large upload through the Flask app in each serve mode"""
+    from app import app
+
+    results = {}
+    with tempfile.TemporaryDirectory() as upload_folder:
+        filename = 'benchmark_upload.jpg'
+        with open(os.path.join(upload_folder, filename), 'wb') as f:
+            f.write(os.urandom(int(file_mb * 1024 * 1024)))
+
+        original = {key: app.config[key] for key in ('UPLOAD_FOLDER', 'UPLOAD_SERVE_MODE', 'USE_X_SENDFILE')}
+        app.config['UPLOAD_FOLDER'] = upload_folder
+        local = threading.local()
+
+        def fetch():
+            if not hasattr(local, 'client'):
+                local.client = app.test_client()
+            response = local.client.get(f"/uploads/{filename}")
+            body = response.get_data()
+            response.close()
+            return len(body)
+
+        try:
+            for mode in SERVE_MODES:
+                app.config['UPLOAD_SERVE_MODE'] = mode
+                app.config['USE_X_SENDFILE'] = mode == 'x-sendfile'
+                print(f"⏱️  {mode}...")
+                results[mode] = run_requests(fetch, total, concurrency)
+        finally:
+            app.config.update(original)
+
+    return results
+
+
+def benchmark_http(urls, total, concurrency):
+    """Fetch each URL from running servers"""
+    import requests
+
+    results = {}
+    for url in urls:
+        local = threading.local()
+
+        def fetch():
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            response = local.session.get(url)
+            response.raise_for_status()
+            return len(response.content)
+
+        print(f"⏱️  {url}...")
+        results[url] = run_requests(fetch, total, concurrency)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare upload serving throughput by serve mode")
+    parser.add_argument('--file-mb', type=float, default=8.0, help="Size of the served file (in-process mode)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per mode")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients")
+    parser.add_argument('--url', action='append', help="Benchmark running servers instead (repeatable)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.url:
+        results = benchmark_http(args.url, args.requests, args.concurrency)
+    else:
+        results = benchmark_in_process(args.file_mb, args.requests, args.concurrency)
+
+    rows = [
+        [name, r['requests_per_sec'], r['mb_per_sec'], r['latency']['p50_ms'], r['latency']['p99_ms']]
+        for name, r in results.items()
+    ]
+    print()
+    print(format_table(['target', 'req/s', 'MB/s', 'p50 ms', 'p99 ms'], rows))
+
+    if not args.url:
+        print("\n💡 x-accel / x-sendfile numbers are worker time only: the front-end server sends the bytes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,9 +21,27 @@ class Config:
         MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'object_counting')
         
         SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+        
+        # Connection pool: pre-ping and recycle drop connections MySQL closed on its side
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', '10')),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', '20')),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', '30')),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', '1800')),
+            'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+        }
     else:
         # SQLite configuration (default for development)
         SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///object_counting.db'
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+    
+    # SQLite pragmas, applied to every new connection: WAL lets readers run while
+    # one writer commits, and busy_timeout makes writers wait instead of failing
+    # with "database is locked"
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
@@ -31,6 +49,78 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+    # Uploads are written to disk on a background pool while inference runs
+    UPLOAD_IO_WORKERS = int(os.environ.get('UPLOAD_IO_WORKERS', '2'))
+    # fsync policy for upload writes: none, file or full (file + directory)
+    UPLOAD_FSYNC = os.environ.get('UPLOAD_FSYNC', 'none')
+    # Retries for background removal of deleted uploads (delay doubles per attempt)
+    UPLOAD_CLEANUP_ATTEMPTS = int(os.environ.get('UPLOAD_CLEANUP_ATTEMPTS', '5'))
+    UPLOAD_CLEANUP_RETRY_DELAY = float(os.environ.get('UPLOAD_CLEANUP_RETRY_DELAY', '0.5'))
+    # Upload file naming: 'content' stores <sha256> under ab/cd/ shards (identical
+    # uploads share one file), 'flat' keeps legacy <uuid>_<filename> names
+    UPLOAD_STORAGE = os.environ.get('UPLOAD_STORAGE', 'content')
+    # Resized variants served via /uploads/<filename>?size=thumb|medium (longest side in px)
+    UPLOAD_VARIANT_SIZES = {'thumb': 256, 'medium': 1024}
+    UPLOAD_VARIANT_WORKERS = int(os.environ.get('UPLOAD_VARIANT_WORKERS', '1'))
+    UPLOAD_VARIANT_QUEUE_SIZE = int(os.environ.get('UPLOAD_VARIANT_QUEUE_SIZE', '64'))
+    # Upload files never change, so browsers may cache them for a long time
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get('UPLOAD_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # Who sends upload bytes: 'flask' streams them itself, 'x-accel' hands off to an
+    # internal nginx location (UPLOAD_ACCEL_PREFIX), 'x-sendfile' uses the X-Sendfile header
+    UPLOAD_SERVE_MODE = os.environ.get('UPLOAD_SERVE_MODE', 'flask')
+    UPLOAD_ACCEL_PREFIX = os.environ.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')
+    
+    # Decode JPEGs at reduced size (DCT scaling) down to this long side; SAM works at 1024.
+    # 0 disables; requests can also ask for full_resolution=true
+    DECODE_DRAFT_SIZE = int(os.environ.get('DECODE_DRAFT_SIZE', '1024'))
+    
+    # AI pipeline settings
+    # 'sam' loads the real models, 'fake' is a deterministic model-free stand-in for load tests
+    PIPELINE_BACKEND = os.environ.get('PIPELINE_BACKEND', 'sam')
+    FAKE_PIPELINE_LATENCY_MS = float(os.environ.get('FAKE_PIPELINE_LATENCY_MS', '0'))
+    FAKE_PIPELINE_JITTER_MS = float(os.environ.get('FAKE_PIPELINE_JITTER_MS', '0'))
+    # ResNet class -> candidate label table, computed once with the zero-shot model
+    CLASS_CATEGORY_CACHE = os.environ.get('CLASS_CATEGORY_CACHE', 'instance/class_categories.json')
+    # Mask NMS before classification: SAM masks overlapping a larger kept mask by more
+    # than this IoU, or lying inside one by more than this fraction, are dropped (1 disables)
+    MASK_NMS_IOU_THRESHOLD = float(os.environ.get('MASK_NMS_IOU_THRESHOLD', '0.7'))
+    MASK_NMS_CONTAINMENT_THRESHOLD = float(os.environ.get('MASK_NMS_CONTAINMENT_THRESHOLD', '0.9'))
+    # Geometric pre-filter before classification: 'off', 'drop' (discard rejected masks) or
+    # 'background' (keep them as segments labelled background, without a ResNet pass)
+    SEGMENT_FILTER = os.environ.get('SEGMENT_FILTER', 'off')
+    SEGMENT_FILTER_MAX_AREA_FRACTION = float(os.environ.get('SEGMENT_FILTER_MAX_AREA_FRACTION', '0.6'))
+    SEGMENT_FILTER_MIN_AREA_FRACTION = float(os.environ.get('SEGMENT_FILTER_MIN_AREA_FRACTION', '0.0005'))
+    SEGMENT_FILTER_MAX_ASPECT_RATIO = float(os.environ.get('SEGMENT_FILTER_MAX_ASPECT_RATIO', '10'))  # 0 disables
+    SEGMENT_FILTER_MAX_BORDER_EDGES = int(os.environ.get('SEGMENT_FILTER_MAX_BORDER_EDGES', '2'))  # 4 disables
+    SEGMENT_FILTER_MIN_STABILITY = float(os.environ.get('SEGMENT_FILTER_MIN_STABILITY', '0'))
+    # /api/count labels segments from the cached class category table and returns 0 right
+    # away for types no ImageNet class maps to (same counts as the full pipeline)
+    TARGET_AWARE_COUNT = os.environ.get('TARGET_AWARE_COUNT', 'true').lower() == 'true'
+    
+    # Seconds an exact /api/results total (cursor mode, include_total=true) is reused
+    RESULTS_COUNT_CACHE_TTL = int(os.environ.get('RESULTS_COUNT_CACHE_TTL', '30'))
+    
+    # Rows per server-side cursor fetch (and per Parquet row group) for /api/results/export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))
+    
+    # How counting requests store results: 'sync' commits before responding,
+    # 'write-behind' journals the result and commits it in batches in the background
+    # (ids are pre-allocated; new results show up in listings up to one batch later)
+    RESULT_WRITE_MODE = os.environ.get('RESULT_WRITE_MODE', 'sync')
+    WRITE_BEHIND_JOURNAL = os.environ.get('WRITE_BEHIND_JOURNAL', 'instance/result_journal.jsonl')
+    WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '50'))
+    WRITE_BEHIND_MAX_DELAY_MS = float(os.environ.get('WRITE_BEHIND_MAX_DELAY_MS', '200'))
+    # fsync the journal per result: survives power loss, not just process crashes
+    WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', 'false').lower() == 'true'
+    # Tries per batch before its results are set aside in <journal>.failed.jsonl
+    WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', '10'))
+    # Result ids reserved per database round trip in write-behind mode (every result
+    # writer then takes ids from blocks; sync mode uses autoincrement ids)
+    ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', '100'))
+    
+    # Seconds the process-local object type cache goes without checking the
+    # cache_versions row; changes made by this process are picked up immediately
+    OBJECT_TYPE_CACHE_CHECK_INTERVAL = float(os.environ.get('OBJECT_TYPE_CACHE_CHECK_INTERVAL', '1'))
     
     # API settings
     API_TITLE = 'Object Counting API'
@@ -48,11 +138,14 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    # Survive power loss, not just process crashes, at some commit latency
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'FULL')
     
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # In-memory database for tests
+    SQLALCHEMY_ENGINE_OPTIONS = {}
 
 # Configuration dictionary
 config = {
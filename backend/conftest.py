@@ -9,12 +9,17 @@ from unittest.mock import Mock, patch
 # Add the backend directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Use the in-memory test database and the model-free pipeline backend
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('PIPELINE_BACKEND', 'fake')
+
 @pytest.fixture
-def app():
+def app(tmp_path):
     """Create a test Flask app instance"""
     from app import app as flask_app
     flask_app.config['TESTING'] = True
     flask_app.config['WTF_CSRF_ENABLED'] = False
+    flask_app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
     return flask_app
 
 @pytest.fixture
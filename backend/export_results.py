@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Export the results history for offline evaluation
+Streams outputs joined with their inputs and object types to CSV, JSONL or
+Parquet with a server-side cursor, so memory stays flat however many
+results there are. Parquet gets one row group per batch.
+
+Usage:
+    python export_results.py results.parquet [--format parquet] [--start 2025-01-01]
+                             [--end 2025-02-01] [--object-type car] [--batch-size 5000]
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+from app import app
+from results_export import EXPORT_FORMATS, export_query, stream_export
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export results history")
+    parser.add_argument('output', help="Output file")
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="Defaults to the output file's extension")
+    parser.add_argument('--start', type=datetime.fromisoformat, help="Created at or after (ISO date)")
+    parser.add_argument('--end', type=datetime.fromisoformat, help="Created before (ISO date)")
+    parser.add_argument('--object-type', help="Primary object type")
+    parser.add_argument('--batch-size', type=int, default=app.config['EXPORT_BATCH_SIZE'],
+                        help="Rows per fetch and per Parquet row group")
+    args = parser.parse_args()
+
+    export_format = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if export_format not in EXPORT_FORMATS:
+        parser.error(f"Cannot tell the format from '{args.output}', pass --format")
+
+    with app.app_context():
+        query = export_query(args.start, args.end, args.object_type)
+        chunks = stream_export(export_format, query, batch_size=args.batch_size)
+
+        written = 0
+        with open(args.output, 'wb') as out:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+
+    print(f"✅ Exported results to {args.output} ({written / 1024:.1f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Background removal of deleted uploads
+Deleting results only touches the database inside the request; the upload
+files are removed afterwards by a worker thread that retries failures (a file
+briefly locked by a reader, a slow network mount) with exponential backoff.
+"""
+
+import queue
+import threading
+import time
+
+
+class FileCleanupWorker:
+    """Run handler(item) for queued items on a daemon thread, retrying failures"""
+
+    def __init__(self, handler, max_attempts=5, retry_delay=0.5):
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.failed = []
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='file-cleanup', daemon=True)
+        self._worker.start()
+
+    def enqueue(self, items):
+        """Queue items (e.g. upload paths) for cleanup"""
+        for item in items:
+            self._queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._process(item)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, item):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.handler(item)
+                return
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self.failed.append(item)
+                    print(f"❌ Giving up on cleanup of {item} after {attempt} attempts: {e}")
+                    return
+                print(f"⚠️  Warning: Cleanup of {item} failed (attempt {attempt}), retrying: {e}")
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+    def join(self):
+        """Block until all queued items are processed"""
+        self._queue.join()
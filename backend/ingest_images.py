@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Bulk ingest: count objects in every image under a directory and store the results
+Offline equivalent of calling /api/count-all once per file. Files are read and
+decoded on a thread pool while the previous batch runs through the pipeline,
+the pipeline works on batch_size images at a time, originals are copied into
+upload storage and results are committed every commit_every images.
+
+Each commit appends the ingested files to a checkpoint, so an interrupted run
+continues where it stopped when started again with the same checkpoint. The
+files of a commit are noted with their output ids just before it, so a run
+that died between the database commit and the checkpoint write does not
+ingest them twice.
+
+Usage:
+    python ingest_images.py /archive/images [--batch-size 8] [--commit-every 100]
+                            [--decode-workers 4] [--checkpoint instance/ingest_checkpoint.txt]
+                            [--description "2023 archive"] [--full-resolution]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import UnidentifiedImageError
+
+from app import app, pipeline, pipeline_error, primary_object_type, remove_upload, upload_writer
+from config import allowed_file
+from models.database import Input, Output, db, add_prediction_result, find_referenced_images
+from upload_io import decode_image
+
+
+def find_images(directory):
+    """Image files under directory, as sorted relative paths so runs are repeatable"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if allowed_file(name):
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return paths
+
+
+def read_checkpoint(checkpoint_path):
+    """
+    Read a checkpoint
+
+    Committed files are plain "<relative path>" lines; files about to be
+    committed are "<relative path>\t<output id>\t<image path>" lines written
+    before the commit.
+
+    Returns:
+        tuple: (set of committed relative paths, {relative path: (output id,
+                image path)} of the rest, whose commit may or may not have
+                happened)
+    """
+    done, pending = set(), {}
+    if not os.path.exists(checkpoint_path):
+        return done, pending
+    with open(checkpoint_path, encoding='utf-8') as f:
+        for line in f:
+            path, _, result = line.rstrip('\n').partition('\t')
+            if not path:
+                continue
+            if result:
+                output_id, _, image_path = result.partition('\t')
+                pending[path] = (int(output_id), image_path)
+            else:
+                done.add(path)
+    return done, {path: result for path, result in pending.items() if path not in done}
+
+
+def load_checkpoint(checkpoint_path):
+    """Relative paths committed by earlier runs"""
+    return read_checkpoint(checkpoint_path)[0]
+
+
+def committed_results(results):
+    """
+    Subset of (output id, image path) pairs that are in the database
+
+    The image path is checked too: an id left unused by a rolled-back
+    commit can be taken by a later result.
+    """
+    results = list(results)
+    committed = set()
+    for start in range(0, len(results), 500):
+        rows = db.session.query(Output.id, Input.image_path).join(Input, Output.input_fk == Input.id).filter(
+            Output.id.in_([output_id for output_id, _ in results[start:start + 500]])
+        )
+        committed.update((output_id, image_path) for output_id, image_path in rows)
+    return committed
+
+
+def read_and_decode(directory, relative_path, draft_size):
+    """Read and decode one file (runs on the decode pool)"""
+    with open(os.path.join(directory, relative_path), 'rb') as f:
+        data = f.read()
+    image, _ = decode_image(data, draft_size=draft_size)
+    return data, image
+
+
+def decoded_batches(directory, paths, batch_size, decoder, draft_size):
+    """
+    Yield batches of (relative_path, decode_future)
+
+    The next batch is submitted before the current one is handed out, so
+    reading and decoding overlap with inference.
+    """
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    def submit(batch):
+        return [(path, decoder.submit(read_and_decode, directory, path, draft_size)) for path in batch]
+
+    upcoming = submit(batches[0]) if batches else []
+    for index in range(len(batches)):
+        current = upcoming
+        upcoming = submit(batches[index + 1]) if index + 1 < len(batches) else []
+        yield current
+
+
+def ingest_directory(directory, batch_size=8, commit_every=100, decode_workers=4,
+                     checkpoint_path='instance/ingest_checkpoint.txt', description=None,
+                     full_resolution=False):
+    """
+    Ingest every image under directory not yet in the checkpoint
+
+    Returns:
+        dict: Counters (ingested, failed, already_done) and per-stage seconds
+    """
+    done, pending = read_checkpoint(checkpoint_path)
+    if pending:
+        # The last run died around a commit: whatever reached the database is done
+        with app.app_context():
+            committed = committed_results(pending.values())
+        recovered = [path for path, result in pending.items() if result in committed]
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            checkpoint.write(''.join(f"{path}\n" for path in recovered))
+        done.update(recovered)
+    paths = [path for path in find_images(directory) if path not in done]
+    stats = {'ingested': 0, 'failed': 0, 'already_done': len(done)}
+    stage_seconds = {'decode_wait': 0.0, 'inference': 0.0, 'store': 0.0, 'database': 0.0}
+    print(f"📂 {len(paths)} images to ingest ({len(done)} done in earlier runs)")
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    layout = app.config['UPLOAD_STORAGE']
+    draft_size = None if full_resolution else (app.config['DECODE_DRAFT_SIZE'] or None)
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+
+    uncommitted = []
+    uncommitted_results = []
+    uncommitted_uploads = []
+    stores = []
+    start = time.perf_counter()
+
+    with app.app_context(), \
+            ThreadPoolExecutor(max_workers=decode_workers) as decoder, \
+            open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+
+        def reserve_ids():
+            # Ids for the whole next transaction, reserved while no write lock is held
+            # (write-behind mode only; otherwise ids are autoincrement)
+            for allocator in app.extensions['result_id_allocators'].values():
+                allocator.ensure_available(commit_every + batch_size)
+
+        def commit():
+            stage_start = time.perf_counter()
+            # Noted first, so a rerun can tell whether a commit interrupted here went through
+            checkpoint.write(''.join(
+                f"{path}\t{output_id}\t{image_path}\n"
+                for path, (output_id, image_path) in zip(uncommitted, uncommitted_results)
+            ))
+            checkpoint.flush()
+            db.session.commit()
+            # Only committed files go in the checkpoint
+            checkpoint.write(''.join(f"{path}\n" for path in uncommitted))
+            checkpoint.flush()
+            stage_seconds['database'] += time.perf_counter() - stage_start
+            stats['ingested'] += len(uncommitted)
+            uncommitted.clear()
+            uncommitted_results.clear()
+            # The stored files are referenced now (see UploadWriter.store)
+            for image_path in uncommitted_uploads:
+                upload_writer.release(upload_folder, image_path)
+            uncommitted_uploads.clear()
+            reserve_ids()
+            elapsed = time.perf_counter() - start
+            print(f"💾 {stats['ingested']}/{len(paths)} committed ({stats['ingested'] / elapsed:.1f} images/s)")
+
+        try:
+            reserve_ids()
+            for batch in decoded_batches(directory, paths, batch_size, decoder, draft_size):
+                stage_start = time.perf_counter()
+                decoded = []
+                for path, future in batch:
+                    try:
+                        data, image = future.result()
+                    except (UnidentifiedImageError, OSError) as e:
+                        stats['failed'] += 1
+                        print(f"   ❌ Skipped {path}: {e}")
+                        continue
+                    decoded.append((path, data, image))
+                stage_seconds['decode_wait'] += time.perf_counter() - stage_start
+                if not decoded:
+                    continue
+
+                # Originals are written on the upload pool while the pipeline runs
+                stores[:] = [
+                    upload_writer.store(upload_folder, data, os.path.basename(path), layout=layout)
+                    for path, data, _ in decoded
+                ]
+
+                stage_start = time.perf_counter()
+                results = pipeline.count_all_objects_batch([image for _, _, image in decoded])
+                stage_seconds['inference'] += time.perf_counter() - stage_start
+
+                stage_start = time.perf_counter()
+                image_paths = [store.result() for store in stores]
+                uncommitted_uploads.extend(image_paths)
+                stores.clear()
+                stage_seconds['store'] += time.perf_counter() - stage_start
+
+                stage_start = time.perf_counter()
+                for (path, _, _), image_path, result in zip(decoded, image_paths, results):
+                    output = add_prediction_result(
+                        image_path=image_path,
+                        object_type_name=primary_object_type(result["objects"]),
+                        predicted_count=result["total_objects"],
+                        description=description,
+                        object_counts={obj["type"]: obj["count"] for obj in result["objects"]},
+                        segment_data=result.get("segment_data")
+                    )
+                    uncommitted.append(path)
+                    uncommitted_results.append((output.id, image_path))
+                stage_seconds['database'] += time.perf_counter() - stage_start
+
+                if len(uncommitted) >= commit_every:
+                    commit()
+
+            if uncommitted:
+                commit()
+        except BaseException:
+            # Results since the last commit are redone on the next run
+            db.session.rollback()
+            # Their stored files are removed unless another input uses the same bytes
+            for store in stores:
+                if store.exception() is None:
+                    uncommitted_uploads.append(store.result())
+            for image_path in uncommitted_uploads:
+                upload_writer.release(upload_folder, image_path)
+            for image_path in upload_writer.condemn(upload_folder, sorted(set(uncommitted_uploads)),
+                                                    find_referenced_images):
+                remove_upload(image_path)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            print(f"\n📊 Summary:")
+            print(f"   ✅ Ingested: {stats['ingested']}")
+            print(f"   ❌ Failed to decode: {stats['failed']}")
+            print(f"   ℹ️  Done in earlier runs: {stats['already_done']}")
+            print(f"   ⏱️  {elapsed:.1f}s, {stats['ingested'] / elapsed if elapsed else 0:.2f} images/s")
+            for stage, seconds in stage_seconds.items():
+                print(f"      {stage:12} {seconds:8.2f}s")
+
+    stats['seconds'] = stage_seconds
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Count objects in a directory of images and store the results")
+    parser.add_argument('directory', help="Directory to ingest (walked recursively)")
+    parser.add_argument('--batch-size', type=int, default=8, help="Images per pipeline call")
+    parser.add_argument('--commit-every', type=int, default=100, help="Images per database commit")
+    parser.add_argument('--decode-workers', type=int, default=4, help="Threads reading and decoding files")
+    parser.add_argument('--checkpoint', default='instance/ingest_checkpoint.txt',
+                        help="Progress file; rerun with the same one to resume")
+    parser.add_argument('--description', help="Description stored with every result")
+    parser.add_argument('--full-resolution', action='store_true', help="Skip reduced-size JPEG decoding")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("🚀 Bulk Image Ingest")
+    print("=" * 50)
+
+    if pipeline is None:
+        print(f"❌ AI pipeline not available: {pipeline_error}")
+        sys.exit(1)
+
+    stats = ingest_directory(
+        args.directory,
+        batch_size=args.batch_size,
+        commit_every=args.commit_every,
+        decode_workers=args.decode_workers,
+        checkpoint_path=args.checkpoint,
+        description=args.description,
+        full_resolution=args.full_resolution
+    )
+    sys.exit(1 if stats['failed'] else 0)
@@ -5,6 +5,7 @@ Database initialization script
 
 from app import app
 from models.database import db, ObjectType
+from models.migrations import get_schema_version, run_migrations
 
 def init_database():
     """Initialize the database and create tables"""
@@ -13,10 +14,10 @@ def init_database():
     
     with app.app_context():
         try:
-            # Create all tables
-            print("📊 Creating database tables...")
-            db.create_all()
-            print("✅ Tables created successfully!")
+            # Create or upgrade the schema
+            print("📊 Applying schema migrations...")
+            applied = run_migrations()
+            print(f"✅ Schema at version {get_schema_version()} ({len(applied)} migrations applied)")
             
             # Check if object types exist
             existing_types = ObjectType.query.all()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the Object Counting API
+Drives /api/count-all, /api/results and the feedback endpoint at a target
+request rate and reports per-endpoint latency percentiles and error rates.
+
+Start the server with the model-free backend to measure the HTTP, upload and
+database layers on their own:
+    PIPELINE_BACKEND=fake FAKE_PIPELINE_LATENCY_MS=50 python app.py
+
+Then:
+    python load_test.py --rps 20 --duration 30
+    python load_test.py --rps 50 --mix count-all=1,results=4,feedback=2 --json load.json
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark import format_table, generate_synthetic_images, load_image_directory, summarize_latencies
+
+DEFAULT_MIX = 'count-all=1,results=3,feedback=1'
+ENDPOINTS = ('count-all', 'results', 'feedback')
+
+
+def parse_mix(mix):
+    """Parse 'count-all=1,results=3' into a weighted endpoint list"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in mix. Choose from: {', '.join(ENDPOINTS)}")
+        weights[name] = int(weight or 1)
+    return [name for name, weight in weights.items() for _ in range(weight)]
+
+
+class LoadGenerator:
+    """Open-loop load generator with a fixed request schedule"""
+
+    def __init__(self, base_url, images, rps, duration, mix, workers=32, timeout=60, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.images = images
+        self.rps = rps
+        self.duration = duration
+        self.schedule = parse_mix(mix)
+        self.workers = workers
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._result_ids = []
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.status_codes = {name: {} for name in ENDPOINTS}
+
+    def _session(self):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _seed_result_ids(self):
+        """Collect existing result ids so feedback requests have targets"""
+        try:
+            response = self._session().get(f"{self.base_url}/api/results",
+                                           params={'per_page': 100}, timeout=self.timeout)
+            ids = [r['id'] for r in response.json().get('results', [])]
+            self._result_ids.extend(ids)
+        except Exception as e:
+            print(f"⚠️  Could not seed result ids: {e}")
+
+    def _request(self, endpoint):
+        session = self._session()
+
+        if endpoint == 'count-all':
+            name, data = self.rng.choice(self.images)
+            response = session.post(f"{self.base_url}/api/count-all",
+                                    files={'image': (name, data)},
+                                    data={'description': 'load test'},
+                                    timeout=self.timeout)
+            if response.ok:
+                result_id = response.json().get('result_id')
+                if result_id is not None:
+                    with self._lock:
+                        self._result_ids.append(result_id)
+            return response
+
+        if endpoint == 'results':
+            page = self.rng.randint(1, 5)
+            return session.get(f"{self.base_url}/api/results",
+                               params={'page': page, 'per_page': 10}, timeout=self.timeout)
+
+        with self._lock:
+            result_id = self.rng.choice(self._result_ids) if self._result_ids else None
+        if result_id is None:
+            return None
+        return session.put(f"{self.base_url}/api/results/{result_id}/feedback",
+                           json={'corrected_count': self.rng.randint(0, 10)},
+                           timeout=self.timeout)
+
+    def _fire(self, endpoint, scheduled_at):
+        # Latency is measured from the scheduled send time so a slow server
+        # cannot hide queueing delay (no coordinated omission)
+        try:
+            response = self._request(endpoint)
+            if response is None:
+                return
+            status = response.status_code
+            failed = status >= 400
+        except requests.RequestException:
+            status = 'exception'
+            failed = True
+
+        elapsed = time.perf_counter() - scheduled_at
+        with self._lock:
+            self.samples[endpoint].append(elapsed)
+            self.status_codes[endpoint][str(status)] = self.status_codes[endpoint].get(str(status), 0) + 1
+            if failed:
+                self.errors[endpoint] += 1
+
+    def run(self):
+        """Issue requests at the target rate for the configured duration"""
+        self._seed_result_ids()
+
+        interval = 1.0 / self.rps
+        total_requests = int(self.rps * self.duration)
+        endpoints = itertools.cycle(self.schedule)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for index in range(total_requests):
+                scheduled_at = start + index * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._fire, next(endpoints), scheduled_at)
+        elapsed = time.perf_counter() - start
+
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """Summarize latencies and error rates per endpoint"""
+        endpoints = {}
+        for name in ENDPOINTS:
+            samples = self.samples[name]
+            if not samples:
+                continue
+            summary = summarize_latencies(samples)
+            summary['errors'] = self.errors[name]
+            summary['error_rate'] = round(self.errors[name] / len(samples), 4)
+            summary['status_codes'] = self.status_codes[name]
+            endpoints[name] = summary
+
+        completed = sum(len(s) for s in self.samples.values())
+        return {
+            'benchmark': 'http-load',
+            'base_url': self.base_url,
+            'target_rps': self.rps,
+            'achieved_rps': round(completed / elapsed, 2) if elapsed else 0,
+            'duration_s': round(elapsed, 2),
+            'requests': completed,
+            'errors': sum(self.errors.values()),
+            'endpoints': endpoints
+        }
+
+
+def print_report(report):
+    print(f"\n📊 Load test against {report['base_url']}")
+    print(f"   Target RPS: {report['target_rps']} | Achieved RPS: {report['achieved_rps']} | "
+          f"Requests: {report['requests']} | Errors: {report['errors']}\n")
+
+    rows = [
+        [name, s['count'], s['p50_ms'], s['p95_ms'], s['p99_ms'], f"{s['error_rate'] * 100:.2f}%"]
+        for name, s in report['endpoints'].items()
+    ]
+    print(format_table(['endpoint', 'n', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'], rows))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Object Counting API")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="API base URL")
+    parser.add_argument('--rps', type=float, default=10.0, help="Target requests per second")
+    parser.add_argument('--duration', type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"Weighted endpoint mix (default: {DEFAULT_MIX})")
+    parser.add_argument('--images', help="Directory of images to upload (default: synthetic)")
+    parser.add_argument('--workers', type=int, default=32, help="Concurrent client threads")
+    parser.add_argument('--json', dest='json_path', help="Write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.images:
+        images = load_image_directory(args.images)
+    else:
+        images = generate_synthetic_images(8, [(640, 480), (1024, 768)])
+
+    print(f"🚀 Load testing {args.url} at {args.rps} RPS for {args.duration}s (mix: {args.mix})")
+    generator = LoadGenerator(args.url, images, args.rps, args.duration, args.mix, workers=args.workers)
+    report = generator.run()
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json_path}")
+
+    return 1 if report['requests'] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Migration script to move uploads into content-addressed storage
+Rehashes flat '<uuid>_<filename>' uploads into sharded 'ab/cd/<sha256>.<ext>'
+paths, so identical images share one file, and updates Input.image_path.
+
+Inputs are processed in id-ordered batches with a commit per batch, so the
+script can be interrupted and re-run; already migrated rows are skipped.
+Files are hard-linked (or copied) into place before the commit and the old
+files are only deleted after it, once no input refers to them any more; an
+interruption can leave an old file behind, but never a row without its file.
+
+Usage:
+    python migrate_to_content_storage.py [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import uuid
+
+from app import app, upload_variants
+from models.database import db, Input, find_referenced_images
+from upload_io import content_address
+
+
+def is_content_addressed(image_path):
+    """Whether a stored path already uses the ab/cd/<sha256> layout"""
+    parts = image_path.split('/')
+    return len(parts) == 3 and parts[2].startswith(parts[0] + parts[1])
+
+
+def place_file(old_file, new_file):
+    """
+    Make new_file a hard link to (or a copy of) old_file, leaving old_file in place
+
+    Returns:
+        bool: False if new_file already existed (identical content)
+    """
+    if os.path.exists(new_file):
+        return False
+    os.makedirs(os.path.dirname(new_file), exist_ok=True)
+    tmp_path = f"{new_file}.{uuid.uuid4().hex}.part"
+    try:
+        os.link(old_file, tmp_path)
+    except OSError:
+        # Different file system or no hard link support
+        shutil.copyfile(old_file, tmp_path)
+    os.replace(tmp_path, new_file)
+    return True
+
+
+def migrate_batch(inputs, upload_folder, moved_paths, dry_run=False):
+    """
+    Place the files of one batch of inputs and update their paths
+
+    Old files are left in place; the caller deletes them after the commit.
+
+    Args:
+        inputs (list): Input records
+        upload_folder (str): Upload root
+        moved_paths (dict): Old path -> new path, shared across batches so
+                            inputs pointing at the same file stay consistent
+        dry_run (bool): Report only, change nothing
+
+    Returns:
+        tuple: (counters for migrated, deduplicated, skipped and missing
+               inputs, set of old paths this batch moved away from)
+    """
+    stats = {'migrated': 0, 'deduplicated': 0, 'skipped': 0, 'missing': 0}
+    old_paths = set()
+
+    for input_record in inputs:
+        old_path = input_record.image_path
+        if not old_path or is_content_addressed(old_path):
+            stats['skipped'] += 1
+            continue
+
+        if old_path in moved_paths:
+            if not dry_run:
+                input_record.image_path = moved_paths[old_path]
+            old_paths.add(old_path)
+            stats['migrated'] += 1
+            continue
+
+        old_file = os.path.join(upload_folder, old_path)
+        if not os.path.exists(old_file):
+            stats['missing'] += 1
+            print(f"   ❌ Missing: {old_path} (input ID {input_record.id})")
+            continue
+
+        with open(old_file, 'rb') as f:
+            new_path = content_address(f.read(), old_path)
+        new_file = os.path.join(upload_folder, *new_path.split('/'))
+
+        if os.path.exists(new_file):
+            stats['deduplicated'] += 1
+            print(f"   ♻️  Duplicate: {old_path} → {new_path}")
+        else:
+            print(f"   ✅ Moved: {old_path} → {new_path}")
+
+        if not dry_run:
+            place_file(old_file, new_file)
+            input_record.image_path = new_path
+
+        moved_paths[old_path] = new_path
+        old_paths.add(old_path)
+        stats['migrated'] += 1
+
+    return stats, old_paths
+
+
+def remove_old_files(old_paths, upload_folder):
+    """Delete committed-away old files that no input refers to any more"""
+    for old_path in old_paths - find_referenced_images(old_paths):
+        old_file = os.path.join(upload_folder, old_path)
+        if os.path.exists(old_file):
+            os.remove(old_file)
+        # Variants are keyed by path; they are regenerated on first request
+        upload_variants.remove(upload_folder, old_path)
+
+
+def migrate_to_content_storage(batch_size=500, dry_run=False):
+    """Migrate every input in id-ordered batches, committing after each batch"""
+    print("🔄 Migrating uploads to content-addressed storage...")
+    print("=" * 50)
+
+    totals = {'migrated': 0, 'deduplicated': 0, 'skipped': 0, 'missing': 0}
+    moved_paths = {}
+
+    with app.app_context():
+        upload_folder = app.config['UPLOAD_FOLDER']
+        last_id = 0
+
+        while True:
+            inputs = (Input.query
+                      .filter(Input.id > last_id)
+                      .order_by(Input.id)
+                      .limit(batch_size)
+                      .all())
+            if not inputs:
+                break
+
+            try:
+                stats, old_paths = migrate_batch(inputs, upload_folder, moved_paths, dry_run=dry_run)
+                if dry_run:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+            except Exception as e:
+                print(f"❌ Migration failed after input ID {last_id}: {e}")
+                db.session.rollback()
+                raise e
+
+            # Only now that the new paths are committed can the old files go
+            if not dry_run:
+                remove_old_files(old_paths, upload_folder)
+
+            for key, value in stats.items():
+                totals[key] += value
+            last_id = inputs[-1].id
+            print(f"📦 Batch done (up to input ID {last_id})")
+
+    print(f"\n📊 Summary{' (dry run)' if dry_run else ''}:")
+    print(f"   ✅ Migrated inputs: {totals['migrated']}")
+    print(f"   ♻️  Files deduplicated: {totals['deduplicated']}")
+    print(f"   ℹ️  Already migrated: {totals['skipped']}")
+    print(f"   ❌ Missing files: {totals['missing']}")
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move uploads into content-addressed storage")
+    parser.add_argument('--batch-size', type=int, default=500, help="Inputs per transaction")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without moving files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print("🚀 Content-Addressed Storage Migration Tool")
+    print("=" * 50)
+
+    totals = migrate_to_content_storage(batch_size=args.batch_size, dry_run=args.dry_run)
+    sys.exit(1 if totals['missing'] else 0)
@@ -0,0 +1,66 @@
+"""
+Pipeline backend selection
+'sam' loads the real SAM + ResNet-50 + DistilBERT pipeline, 'fake' loads a
+deterministic model-free stand-in for load-testing the HTTP and DB layers.
+"""
+
+PIPELINE_BACKENDS = ('sam', 'fake')
+SEGMENT_FILTER_MODES = ('off', 'drop', 'background')
+
+
+def segment_filter_settings(config):
+    """
+    Pre-filter settings for ObjectCountingPipeline from SEGMENT_FILTER_*
+
+    Returns:
+        dict or None: 'mode' plus prefilter_masks() thresholds; None when off
+    """
+    mode = config.get('SEGMENT_FILTER', 'off')
+    if mode not in SEGMENT_FILTER_MODES:
+        raise ValueError(f"Unknown segment filter '{mode}'. Choose one of: {', '.join(SEGMENT_FILTER_MODES)}")
+    if mode == 'off':
+        return None
+
+    return {
+        'mode': mode,
+        'max_area_fraction': config.get('SEGMENT_FILTER_MAX_AREA_FRACTION', 0.6),
+        'min_area_fraction': config.get('SEGMENT_FILTER_MIN_AREA_FRACTION', 0.0005),
+        'max_aspect_ratio': config.get('SEGMENT_FILTER_MAX_ASPECT_RATIO', 10.0),
+        'max_border_edges': config.get('SEGMENT_FILTER_MAX_BORDER_EDGES', 2),
+        'min_stability': config.get('SEGMENT_FILTER_MIN_STABILITY', 0.0)
+    }
+
+
+def create_pipeline(config):
+    """
+    Create the counting pipeline selected by PIPELINE_BACKEND
+
+    Args:
+        config: Mapping with PIPELINE_BACKEND, CLASS_CATEGORY_CACHE, MASK_NMS_*,
+            SEGMENT_FILTER_*, TARGET_AWARE_COUNT and FAKE_PIPELINE_* settings
+            (e.g. app.config)
+
+    Returns:
+        Pipeline object exposing count_objects / count_all_objects
+    """
+    backend = config.get('PIPELINE_BACKEND', 'sam')
+
+    if backend == 'fake':
+        from models.fake_pipeline import FakeObjectCountingPipeline
+        return FakeObjectCountingPipeline(
+            latency_ms=config.get('FAKE_PIPELINE_LATENCY_MS', 0.0),
+            jitter_ms=config.get('FAKE_PIPELINE_JITTER_MS', 0.0)
+        )
+
+    if backend == 'sam':
+        # Imported lazily so the fake backend never pulls in torch
+        from models.pipeline import ObjectCountingPipeline
+        return ObjectCountingPipeline(
+            category_cache_path=config.get('CLASS_CATEGORY_CACHE'),
+            nms_iou_threshold=config.get('MASK_NMS_IOU_THRESHOLD', 0.7),
+            nms_containment_threshold=config.get('MASK_NMS_CONTAINMENT_THRESHOLD', 0.9),
+            segment_filter=segment_filter_settings(config),
+            target_aware_count=config.get('TARGET_AWARE_COUNT', True)
+        )
+
+    raise ValueError(f"Unknown pipeline backend '{backend}'. Choose one of: {', '.join(PIPELINE_BACKENDS)}")
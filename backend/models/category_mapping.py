@@ -0,0 +1,130 @@
+"""
+ImageNet class -> category mapping
+The pipeline maps each segment's top ResNet-50 class to one of the candidate
+labels with a zero-shot classifier. The answer depends only on the class, so
+it can be tabulated once for all 1000 classes and cached on disk; stored
+segments can then be re-mapped without any model.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Categories the pipeline counts
+CANDIDATE_LABELS = [
+    "person", "car", "bus", "bicycle", "motorcycle",
+    "dog", "cat", "bird", "tree", "building",
+    "road", "sky"
+]
+
+# Label of segments the geometric pre-filter skips instead of classifying
+BACKGROUND_LABEL = "background"
+
+
+class ClassCategoryTable:
+    """Category (index into labels) of every class id"""
+
+    def __init__(self, labels, categories):
+        self.labels = list(labels)
+        self.categories = np.asarray(categories, dtype=np.int16)
+
+    def label_of(self, class_id):
+        return self.labels[self.categories[class_id]]
+
+    def map_classes(self, class_ids):
+        """Category indices for an array of class ids, any shape"""
+        return self.categories[np.asarray(class_ids, dtype=np.int64)]
+
+    def labels_of(self, class_ids):
+        """Label of each class id in a 1-D sequence"""
+        return [self.labels[category] for category in self.map_classes(class_ids)]
+
+    def classes_of(self, label):
+        """Class ids that map to label"""
+        if label not in self.labels:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.categories == self.labels.index(label))
+
+    def can_produce(self, label):
+        """Whether any class maps to label"""
+        return label in self.labels and bool((self.categories == self.labels.index(label)).any())
+
+
+def table_cache_key(class_names, labels):
+    return hashlib.sha256(json.dumps([list(class_names), list(labels)]).encode('utf-8')).hexdigest()
+
+
+def load_class_category_table(class_names, labels, cache_path):
+    """
+    The cached table for these class names and labels, without computing anything
+
+    Returns:
+        ClassCategoryTable or None: None when the cache is missing, unreadable
+                                    or was built for other names or labels
+    """
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Warning: Ignoring unreadable class category cache {cache_path}: {e}")
+        return None
+    if cached.get('key') != table_cache_key(class_names, labels):
+        return None
+    return ClassCategoryTable(labels, cached['categories'])
+
+
+def build_class_category_table(class_names, labels, classify, cache_path=None):
+    """
+    Map every class name to a label, reusing a cached table when possible
+
+    Args:
+        class_names (list): Class name per class id
+        labels (list): Candidate labels
+        classify (callable): class name -> label, e.g. the zero-shot classifier
+        cache_path (str): JSON cache, reused while class names and labels match
+
+    Returns:
+        ClassCategoryTable
+    """
+    table = load_class_category_table(class_names, labels, cache_path)
+    if table is not None:
+        return table
+
+    categories = [labels.index(classify(name)) for name in class_names]
+
+    if cache_path:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': table_cache_key(class_names, labels), 'labels': list(labels),
+                       'categories': categories}, f)
+
+    return ClassCategoryTable(labels, categories)
+
+
+def build_zero_shot_table(labels, cache_path=None, device=-1):
+    """
+    ClassCategoryTable of the ResNet-50 classes, without loading SAM or ResNet
+
+    Uses the same class names and zero-shot model as ObjectCountingPipeline,
+    so the table matches what the pipeline computes per segment.
+    """
+    # Imported lazily: only needed when the table is not cached yet
+    from transformers import AutoConfig, pipeline
+
+    id2label = AutoConfig.from_pretrained("microsoft/resnet-50").id2label
+    classifier = None
+
+    def classify(name):
+        nonlocal classifier
+        if classifier is None:
+            classifier = pipeline("zero-shot-classification",
+                                  model="typeform/distilbert-base-uncased-mnli", device=device)
+        return classifier(name, candidate_labels=labels)['labels'][0]
+
+    return build_class_category_table(
+        [id2label[idx] for idx in range(len(id2label))], labels, classify, cache_path=cache_path
+    )
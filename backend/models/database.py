@@ -1,6 +1,16 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, event, exc, func, select
+from sqlalchemy.orm import Session
 from datetime import datetime
 import os
+import threading
+import time
+
+import numpy as np
+
+from models.category_mapping import CANDIDATE_LABELS
+from performance_metrics import calculate_f1_metrics
 
 db = SQLAlchemy()
 
@@ -33,7 +43,7 @@ class Input(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    image_path = db.Column(db.String(500), nullable=False)
+    image_path = db.Column(db.String(500), nullable=False, index=True)
     description = db.Column(db.Text)
     
     # Relationship
@@ -51,14 +61,24 @@ class Input(db.Model):
 class Output(db.Model):
     """Model for prediction outputs and corrections"""
     __tablename__ = 'outputs'
+    __table_args__ = (
+        # /api/results filtered by object type, newest first
+        db.Index('ix_outputs_object_type_created_at', 'object_type_fk', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     predicted_count = db.Column(db.Integer, nullable=False)
     corrected_count = db.Column(db.Integer, nullable=True)
-    object_type_fk = db.Column(db.Integer, db.ForeignKey('object_types.id'), nullable=False)
-    input_fk = db.Column(db.Integer, db.ForeignKey('inputs.id'), nullable=False)
+    object_type_fk = db.Column(db.Integer, db.ForeignKey('object_types.id'), nullable=False, index=True)
+    input_fk = db.Column(db.Integer, db.ForeignKey('inputs.id'), nullable=False, index=True)
+    
+    # Relationship
+    object_counts = db.relationship('OutputObjectCount', backref='output', lazy=True,
+                                    cascade='all, delete-orphan')
+    segments = db.relationship('OutputSegments', backref='output', lazy=True, uselist=False,
+                               cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -72,64 +92,573 @@ class Output(db.Model):
             'object_type_name': self.object_type.name if self.object_type else None
         }
 
+class OutputObjectCount(db.Model):
+    """Model for per-object-type counts of a result (one row per detected type)"""
+    __tablename__ = 'output_object_counts'
+    __table_args__ = (
+        db.UniqueConstraint('output_fk', 'object_type_fk', name='uq_output_object_counts_output_type'),
+        # Results containing a given type
+        db.Index('ix_output_object_counts_type_output', 'object_type_fk', 'output_fk'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    output_fk = db.Column(db.Integer, db.ForeignKey('outputs.id'), nullable=False)
+    object_type_fk = db.Column(db.Integer, db.ForeignKey('object_types.id'), nullable=False)
+    predicted_count = db.Column(db.Integer, nullable=False)
+    corrected_count = db.Column(db.Integer, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'output_id': self.output_fk,
+            'object_type_id': self.object_type_fk,
+            'predicted_count': self.predicted_count,
+            'corrected_count': self.corrected_count
+        }
+
+class AccuracyStats(db.Model):
+    """Running sums of correction metrics per object type (object_type_fk NULL = all types)"""
+    __tablename__ = 'accuracy_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    object_type_fk = db.Column(db.Integer, db.ForeignKey('object_types.id'), nullable=True, unique=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    corrected_results = db.Column(db.Integer, nullable=False, default=0)
+    f1_sum = db.Column(db.Float, nullable=False, default=0.0)
+    precision_sum = db.Column(db.Float, nullable=False, default=0.0)
+    recall_sum = db.Column(db.Float, nullable=False, default=0.0)
+    abs_error_sum = db.Column(db.Float, nullable=False, default=0.0)
+    squared_error_sum = db.Column(db.Float, nullable=False, default=0.0)
+    # F1 buckets, as in calculate_overall_f1_stats: >= 90, >= 70, below
+    excellent_count = db.Column(db.Integer, nullable=False, default=0)
+    good_count = db.Column(db.Integer, nullable=False, default=0)
+    needs_review_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
+        count = self.corrected_results
+        return {
+            'count': count,
+            'avg_f1_score': self.f1_sum / count if count else 0,
+            'avg_precision': self.precision_sum / count if count else 0,
+            'avg_recall': self.recall_sum / count if count else 0,
+            'mae': self.abs_error_sum / count if count else 0,
+            'rmse': (self.squared_error_sum / count) ** 0.5 if count else 0,
+            'excellent_count': self.excellent_count,
+            'good_count': self.good_count,
+            'needs_review_count': self.needs_review_count
+        }
+
+class OutputSegments(db.Model):
+    """
+    Per-segment predictions of a result, for re-mapping categories without
+    re-segmenting: packed little-endian arrays, see pack_segment_data()
+    """
+    __tablename__ = 'output_segments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    output_fk = db.Column(db.Integer, db.ForeignKey('outputs.id'), nullable=False, unique=True)
+    # Target of a single-type /api/count result; NULL for count-all results
+    target_object_type_fk = db.Column(db.Integer, db.ForeignKey('object_types.id'), nullable=True)
+    image_width = db.Column(db.Integer, nullable=False)
+    image_height = db.Column(db.Integer, nullable=False)
+    segment_count = db.Column(db.Integer, nullable=False)
+    top_k = db.Column(db.Integer, nullable=False)
+    boxes = db.Column(db.LargeBinary, nullable=False)  # int32 (n, 4): x, y, width, height
+    areas = db.Column(db.LargeBinary, nullable=False)  # int32 (n,): mask pixels
+    class_ids = db.Column(db.LargeBinary, nullable=False)  # int16 (n, top_k), best first
+    logits = db.Column(db.LargeBinary, nullable=False)  # float16 (n, top_k)
+
+class IdSequence(db.Model):
+    """Next free id per table, for writers that hand out ids before inserting (hi/lo blocks)"""
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+class CacheVersion(db.Model):
+    """Change counter of a cached table, so every process's cache notices changes"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+# dtype of each packed OutputSegments array
+SEGMENT_ARRAY_DTYPES = {'boxes': '<i4', 'areas': '<i4', 'class_ids': '<i2', 'logits': '<f2'}
+
+def pack_segment_data(segment_data):
+    """
+    OutputSegments column values for a pipeline result's segment_data
+    
+    Returns:
+        dict: Columns except output_fk and target_object_type_fk
+    """
+    class_ids = np.asarray(segment_data['class_ids'])
+    packed = {
+        name: np.ascontiguousarray(segment_data[name], dtype=dtype).tobytes()
+        for name, dtype in SEGMENT_ARRAY_DTYPES.items()
+    }
+    return {
+        'image_width': int(segment_data['image_size'][0]),
+        'image_height': int(segment_data['image_size'][1]),
+        'segment_count': int(class_ids.shape[0]),
+        'top_k': int(class_ids.shape[1]) if class_ids.ndim == 2 else 0,
+        **packed
+    }
+
+def unpack_segment_arrays(row):
+    """Arrays of an OutputSegments row (or a row with the same columns)"""
+    shapes = {'boxes': (-1, 4), 'areas': (-1,), 'class_ids': (-1, row.top_k), 'logits': (-1, row.top_k)}
+    return {
+        name: np.frombuffer(getattr(row, name), dtype=dtype).reshape(shapes[name])
+        for name, dtype in SEGMENT_ARRAY_DTYPES.items()
+    }
+
+# Running-sum columns of AccuracyStats
+ACCURACY_SUM_COLUMNS = (
+    'corrected_results', 'f1_sum', 'precision_sum', 'recall_sum', 'abs_error_sum',
+    'squared_error_sum', 'excellent_count', 'good_count', 'needs_review_count'
+)
+
+def correction_contribution(predicted_count, corrected_count):
+    """One corrected result's share of the AccuracyStats running sums"""
+    metrics = calculate_f1_metrics(predicted_count, corrected_count, include_explanation=False)
+    f1_score = metrics['f1_score']
+    error = predicted_count - corrected_count
+    return {
+        'corrected_results': 1,
+        'f1_sum': f1_score,
+        'precision_sum': metrics['precision'],
+        'recall_sum': metrics['recall'],
+        'abs_error_sum': abs(error),
+        'squared_error_sum': error * error,
+        'excellent_count': int(f1_score >= 90),
+        'good_count': int(70 <= f1_score < 90),
+        'needs_review_count': int(f1_score < 70)
+    }
+
+def apply_accuracy_changes(changes):
+    """
+    Fold correction changes into AccuracyStats (no commit)
+    
+    Call in the same transaction as the change itself. Sums are updated with
+    col = col + delta, one UPDATE per affected object type plus the global row.
+    
+    Args:
+        changes (list): (object_type_fk, predicted_count, old_corrected, new_corrected)
+                        tuples; None means "no correction"
+    """
+    deltas = {}
+    for object_type_fk, predicted_count, old_corrected, new_corrected in changes:
+        for corrected, sign in ((old_corrected, -1), (new_corrected, 1)):
+            if corrected is None:
+                continue
+            contribution = correction_contribution(predicted_count, corrected)
+            for key in (None, object_type_fk):
+                totals = deltas.setdefault(key, dict.fromkeys(ACCURACY_SUM_COLUMNS, 0))
+                for column, value in contribution.items():
+                    totals[column] += sign * value
+    
+    for object_type_fk, totals in deltas.items():
+        if not any(totals.values()):
+            continue
+        get_accuracy_stats(object_type_fk, create=True)
+        values = {column: getattr(AccuracyStats, column) + delta for column, delta in totals.items()}
+        values['updated_at'] = datetime.utcnow()
+        db.session.execute(
+            db.update(AccuracyStats).where(AccuracyStats.object_type_fk.is_(None) if object_type_fk is None
+                                           else AccuracyStats.object_type_fk == object_type_fk).values(**values),
+            execution_options={'synchronize_session': False}
+        )
+
+def get_accuracy_stats(object_type_fk=None, create=False):
+    """
+    AccuracyStats row for an object type (None = all types), optionally created empty
+    
+    Per-type rows are created with INSERT .. ON CONFLICT DO NOTHING on the
+    unique object_type_fk, so concurrent writers creating the same row don't
+    fail; the all-types row is created by migration 4.
+    """
+    query = AccuracyStats.query.filter(
+        AccuracyStats.object_type_fk.is_(None) if object_type_fk is None
+        else AccuracyStats.object_type_fk == object_type_fk
+    )
+    stats = query.first()
+    if stats is None and create:
+        values = {'object_type_fk': object_type_fk, 'updated_at': datetime.utcnow(),
+                  **dict.fromkeys(ACCURACY_SUM_COLUMNS, 0)}
+        dialect = db.session.get_bind().dialect.name
+        if object_type_fk is not None and dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            db.session.execute(insert(AccuracyStats).values(**values).on_conflict_do_nothing(
+                index_elements=['object_type_fk']
+            ))
+        else:
+            db.session.execute(db.insert(AccuracyStats).values(**values))
+        stats = query.first()
+    return stats
+
+def configure_sqlite_connection(dbapi_connection, settings):
+    """Apply SQLite pragmas to a new DBAPI connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA journal_mode = {settings['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {settings['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings['SQLITE_MMAP_SIZE'])}")
+    finally:
+        cursor.close()
+
+def configure_engine(app):
+    """Hook per-connection tuning onto the app's engine (call in an app context)"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    settings = {
+        'SQLITE_JOURNAL_MODE': app.config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'SQLITE_SYNCHRONOUS': app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'SQLITE_BUSY_TIMEOUT_MS': app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'SQLITE_MMAP_SIZE': app.config.get('SQLITE_MMAP_SIZE', 0)
+    }
+    db.event.listen(engine, 'connect', lambda connection, record: configure_sqlite_connection(connection, settings))
+
 def init_database(app):
     """Initialize database with app context"""
     db.init_app(app)
     
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        configure_engine(app)
+        
+        # Create or upgrade the schema
+        from models.migrations import run_migrations
+        run_migrations()
         
         # Initialize object types if they don't exist
-        existing_types = ObjectType.query.all()
-        if not existing_types:
+        object_types = [
+            {'name': 'car', 'description': 'Automobiles and vehicles'},
+            {'name': 'cat', 'description': 'Domestic cats'},
+            {'name': 'tree', 'description': 'Trees and large plants'},
+            {'name': 'dog', 'description': 'Dogs and canines'},
+            {'name': 'building', 'description': 'Buildings and structures'},
+            {'name': 'person', 'description': 'People and humans'},
+            {'name': 'sky', 'description': 'Sky and atmospheric elements'},
+            {'name': 'ground', 'description': 'Ground and terrain'},
+            {'name': 'hardware', 'description': 'Tools and hardware items'},
+            {'name': 'bus', 'description': 'Buses and public transport vehicles'},
+            {'name': 'bicycle', 'description': 'Bicycles and bikes'},
+            {'name': 'motorcycle', 'description': 'Motorcycles and motorbikes'},
+            {'name': 'bird', 'description': 'Birds and flying animals'},
+            {'name': 'road', 'description': 'Roads and pathways'}
+        ]
+        existing_names = {name for name, in db.session.query(ObjectType.name)}
+        if existing_names:
+            # Every label the pipeline produces needs a row, or its per-type counts would be dropped
+            object_types = [t for t in object_types if t['name'] in CANDIDATE_LABELS]
+        missing_types = [t for t in object_types if t['name'] not in existing_names]
+        
+        if missing_types:
             print("📦 Initializing object types...")
-            
-            object_types = [
-                {'name': 'car', 'description': 'Automobiles and vehicles'},
-                {'name': 'cat', 'description': 'Domestic cats'},
-                {'name': 'tree', 'description': 'Trees and large plants'},
-                {'name': 'dog', 'description': 'Dogs and canines'},
-                {'name': 'building', 'description': 'Buildings and structures'},
-                {'name': 'person', 'description': 'People and humans'},
-                {'name': 'sky', 'description': 'Sky and atmospheric elements'},
-                {'name': 'ground', 'description': 'Ground and terrain'},
-                {'name': 'hardware', 'description': 'Tools and hardware items'}
-            ]
-            
-            for obj_type in object_types:
+            for obj_type in missing_types:
                 new_type = ObjectType(name=obj_type['name'], description=obj_type['description'])
                 db.session.add(new_type)
             
             db.session.commit()
-            print(f"✅ Created {len(object_types)} object types")
+            print(f"✅ Created {len(missing_types)} object types")
         else:
-            print(f"✅ Database already initialized with {len(existing_types)} object types")
+            print(f"✅ Database already initialized with {len(existing_names)} object types")
+        
+        # Load the object type cache up front so requests never wait on it
+        app.extensions['object_type_cache'] = ObjectTypeCache(app.config.get('OBJECT_TYPE_CACHE_CHECK_INTERVAL', 1.0))
+        list_object_types()
+    
+    # Ids of new results, shared by every writer in this process (see IdAllocator). Only
+    # write-behind hands out ids before inserting; sync writes keep autoincrement ids, so
+    # they never open a second write transaction for a block
+    app.extensions['result_id_allocators'] = {
+        table: IdAllocator(app, table, app.config.get('ID_BLOCK_SIZE', 100)) for table in ('inputs', 'outputs')
+    } if app.config.get('RESULT_WRITE_MODE') == 'write-behind' else {}
+
+class IdAllocator:
+    """
+    Hand out ids for a table from blocks reserved in id_sequences (hi/lo)
+    
+    One UPDATE reserves block_size ids, so most results need no database
+    round trip for their id. Blocks start past the table's current max id,
+    so rows inserted without the allocator earlier are never collided with;
+    rows inserted without it later could land inside a reserved block, so in
+    write-behind mode add_prediction_result() and the write-behind writer
+    both take their ids from the app's allocators
+    (app.extensions['result_id_allocators']).
+    """
+    
+    def __init__(self, app, table_name, block_size=100):
+        self.app = app
+        self.table_name = table_name
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+    
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._reserve(self.block_size)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+    
+    def ensure_available(self, count):
+        """
+        Reserve a new block now unless count ids are left
+        
+        Reserving writes id_sequences on its own connection, which waits for
+        SQLite's write lock; callers that insert many results per transaction
+        call this between transactions so next_id() never reserves mid-way.
+        """
+        with self._lock:
+            if self._end - self._next < count:
+                size = max(count, self.block_size)
+                self._next = self._reserve(size)
+                self._end = self._next + size
+    
+    def _reserve(self, size):
+        """Reserve the next size ids and return the first"""
+        table = db.metadata.tables[self.table_name]
+        sequences = IdSequence.__table__
+        past_max_id = select(func.coalesce(func.max(table.c.id), 0) + 1).scalar_subquery()
+        
+        with self.app.app_context():
+            for attempt in range(2):
+                try:
+                    with db.engine.begin() as connection:
+                        # UPDATE first: it takes the write lock before anything is read
+                        updated = connection.execute(
+                            sequences.update()
+                            .where(sequences.c.name == self.table_name)
+                            .values(next_value=case(
+                                (past_max_id > sequences.c.next_value, past_max_id),
+                                else_=sequences.c.next_value
+                            ) + size)
+                        ).rowcount
+                        if not updated:
+                            start = connection.execute(select(past_max_id)).scalar()
+                            connection.execute(sequences.insert().values(
+                                name=self.table_name, next_value=start + size
+                            ))
+                            return start
+                        
+                        next_value = connection.execute(
+                            select(sequences.c.next_value).where(sequences.c.name == self.table_name)
+                        ).scalar()
+                        return next_value - size
+                except exc.IntegrityError:
+                    # Another process created the sequence row first; update it instead
+                    if attempt:
+                        raise
+
+class ObjectTypeCache:
+    """
+    Process-local copy of the object_types table (about ten rows)
+
+    Every commit that changes object types, from any process, bumps the
+    'object_types' row of cache_versions. The cache compares that version at
+    most every check_interval seconds, and reloads when it moved. A name that
+    is not found checks the version right away, once per version: names still
+    missing then are remembered until the version moves.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._types = None  # {name: ObjectType.to_dict()}, in id order
+        self._version = None
+        self._misses = set()  # names known to be missing at self._version
+        self._checked_at = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def load(self, check=False):
+        """
+        Cached types; check=True compares the version now instead of waiting
+        for check_interval
+        """
+        now = time.monotonic()
+        types = self._types
+        if types is not None and not check and now - self._checked_at < self.check_interval:
+            return types
+
+        generation = self._generation
+        version = object_types_version()
+        if types is None or version != self._version:
+            rows = ObjectType.query.order_by(ObjectType.id).all()
+            types = {row.name: row.to_dict() for row in rows}
+        with self._lock:
+            # Don't store a snapshot that an invalidate() raced with
+            if generation == self._generation:
+                if version != self._version:
+                    self._misses = set()
+                self._types, self._version, self._checked_at = types, version, now
+        return types
+
+    def lookup(self, names):
+        """Cached types for the names found, checking for changes if any is newly missing"""
+        types = self.load()
+        unknown = [name for name in names if name not in types and name not in self._misses]
+        if unknown:
+            types = self.load(check=True)
+            with self._lock:
+                if types is self._types:
+                    self._misses.update(name for name in unknown if name not in types)
+        return types
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._types = None
+            self._misses = set()
+
+def object_types_version():
+    """Current 'object_types' change counter (0 before the first change)"""
+    return db.session.query(CacheVersion.version).filter_by(name='object_types').scalar() or 0
+
+def bump_object_types_version(session):
+    """Bump the 'object_types' change counter in the session's transaction"""
+    table = CacheVersion.__table__
+    connection = session.connection()
+    bumped = connection.execute(
+        table.update().where(table.c.name == 'object_types').values(version=table.c.version + 1)
+    ).rowcount
+    if not bumped:
+        connection.execute(table.insert().values(name='object_types', version=1))
+
+def list_object_types():
+    """All object types as dicts (cached), in id order"""
+    return list(current_app.extensions['object_type_cache'].load().values())
 
 def get_object_type_by_name(name):
-    """Get object type by name"""
-    return ObjectType.query.filter_by(name=name).first()
+    """Get object type by name (cached dict, see ObjectType.to_dict), or None"""
+    return current_app.extensions['object_type_cache'].lookup([name]).get(name)
 
-def save_prediction_result(image_path, object_type_name, predicted_count, description=None):
-    """Save a prediction result to database"""
+def get_object_type_ids(names):
+    """Map type names to ids (cached); unknown names are left out"""
+    names = list(names)
+    types = current_app.extensions['object_type_cache'].lookup(names)
+    return {name: types[name]['id'] for name in names if name in types}
+
+@event.listens_for(Session, 'before_flush')
+def track_object_type_changes(session, flush_context, instances):
+    if any(isinstance(obj, ObjectType) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['object_types_changed'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def track_object_type_bulk_changes(orm_execute_state):
+    # Query.delete() / update() skip flush events, e.g. in reset_object_types.py
+    if (orm_execute_state.is_delete or orm_execute_state.is_update) and \
+            any(mapper.class_ is ObjectType for mapper in orm_execute_state.all_mappers):
+        orm_execute_state.session.info['object_types_changed'] = True
+
+@event.listens_for(Session, 'before_commit')
+def version_object_type_changes(session):
+    # Flush first: commit only flushes after before_commit, and that flush may carry the changes
+    session.flush()
+    if session.info.get('object_types_changed') and not session.info.get('object_types_versioned'):
+        session.info['object_types_versioned'] = True
+        bump_object_types_version(session)
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_soft_rollback')
+def invalidate_object_type_cache(session, *args):
+    # On rollback too: a reload inside the transaction may have seen its changes
+    session.info.pop('object_types_versioned', None)
+    if session.info.pop('object_types_changed', False):
+        cache = current_app.extensions.get('object_type_cache')
+        if cache is not None:
+            cache.invalidate()
+
+def next_result_ids():
+    """(input id, output id) for a new result from the app's shared allocators; (None, None) = autoincrement"""
+    allocators = current_app.extensions.get('result_id_allocators')
+    if not allocators:
+        return None, None
+    return allocators['inputs'].next_id(), allocators['outputs'].next_id()
+
+def add_prediction_result(image_path, object_type_name, predicted_count, description=None, object_counts=None,
+                          segment_data=None, input_id=None, output_id=None):
+    """
+    Add a prediction result to the session without committing, so callers
+    can commit many results at once
+    
+    Args:
+        object_counts (dict): Optional per-type counts {type name: count},
+                              stored in output_object_counts
+        segment_data (dict): Optional pipeline segment_data, stored in output_segments
+        input_id, output_id (int): Pre-allocated ids; when omitted, taken from
+                                   the app's allocators in write-behind mode,
+                                   autoincrement otherwise
+    
+    Returns:
+        Output: The flushed output record
+    """
+    # Get or create object type
+    object_type = get_object_type_by_name(object_type_name)
+    if not object_type:
+        raise ValueError(f"Object type '{object_type_name}' not found")
+    
+    if input_id is None or output_id is None:
+        input_id, output_id = next_result_ids()
+    
+    # Create input record
+    input_record = Input(id=input_id, image_path=image_path, description=description)
+    db.session.add(input_record)
+    db.session.flush()  # Get the ID
+    
+    # Create output record
+    output_record = Output(
+        id=output_id,
+        predicted_count=predicted_count,
+        object_type_fk=object_type['id'],
+        input_fk=input_record.id
+    )
+    db.session.add(output_record)
+    db.session.flush()
+    
+    if object_counts:
+        save_object_counts(output_record.id, object_counts)
+    
+    if segment_data is not None:
+        save_segment_data(output_record.id, segment_data)
+    
+    return output_record
+
+def save_segment_data(output_id, segment_data):
+    """Store a result's per-segment predictions (no commit)"""
+    target = segment_data.get('target_object_type')
+    target_type = get_object_type_by_name(target) if target else None
+    db.session.execute(db.insert(OutputSegments), [{
+        'output_fk': output_id,
+        'target_object_type_fk': target_type['id'] if target_type else None,
+        **pack_segment_data(segment_data)
+    }])
+
+def save_prediction_result(image_path, object_type_name, predicted_count, description=None, object_counts=None,
+                           segment_data=None, input_id=None, output_id=None):
+    """
+    Save a prediction result to database
+    
+    Args:
+        object_counts (dict): Optional per-type counts {type name: count},
+                              stored in output_object_counts
+        segment_data (dict): Optional pipeline segment_data, stored in output_segments
+        input_id, output_id (int): Pre-allocated ids (see add_prediction_result)
+    """
     try:
-        # Get or create object type
-        object_type = get_object_type_by_name(object_type_name)
-        if not object_type:
-            raise ValueError(f"Object type '{object_type_name}' not found")
-        
-        # Create input record
-        input_record = Input(image_path=image_path, description=description)
-        db.session.add(input_record)
-        db.session.flush()  # Get the ID
-        
-        # Create output record
-        output_record = Output(
-            predicted_count=predicted_count,
-            object_type_fk=object_type.id,
-            input_fk=input_record.id
+        output_record = add_prediction_result(
+            image_path, object_type_name, predicted_count, description, object_counts, segment_data,
+            input_id=input_id, output_id=output_id
         )
-        db.session.add(output_record)
         db.session.commit()
         
         return output_record
@@ -138,6 +667,102 @@ def save_prediction_result(image_path, object_type_name, predicted_count, descri
         db.session.rollback()
         raise e
 
+def save_object_counts(output_id, object_counts):
+    """
+    Store per-type counts of a result with one bulk insert (no commit)
+    
+    Type names without an ObjectType row are skipped.
+    """
+    type_ids = get_object_type_ids(object_counts)
+    rows = [
+        {'output_fk': output_id, 'object_type_fk': type_ids[name], 'predicted_count': count}
+        for name, count in object_counts.items() if name in type_ids
+    ]
+    if rows:
+        db.session.execute(db.insert(OutputObjectCount), rows)
+    return len(rows)
+
+def get_object_counts(output_ids):
+    """
+    Per-type counts for several results in one joined query
+    
+    Returns:
+        dict: output id -> list of {object_type, predicted_count, corrected_count}
+    """
+    counts = {output_id: [] for output_id in output_ids}
+    if not output_ids:
+        return counts
+    
+    rows = db.session.query(OutputObjectCount, ObjectType.name)\
+        .join(ObjectType, OutputObjectCount.object_type_fk == ObjectType.id)\
+        .filter(OutputObjectCount.output_fk.in_(list(output_ids)))\
+        .order_by(OutputObjectCount.output_fk, OutputObjectCount.predicted_count.desc(), ObjectType.name)\
+        .all()
+    for object_count, type_name in rows:
+        counts[object_count.output_fk].append({
+            'object_type': type_name,
+            'predicted_count': object_count.predicted_count,
+            'corrected_count': object_count.corrected_count
+        })
+    return counts
+
+def update_object_count_corrections(output_id, corrections):
+    """
+    Set corrected counts for some object types of a result (no commit)
+    
+    Args:
+        corrections (dict): {type name: corrected count}
+    
+    Raises:
+        ValueError: A type has no stored count for this result
+    """
+    rows = db.session.query(OutputObjectCount, ObjectType.name)\
+        .join(ObjectType, OutputObjectCount.object_type_fk == ObjectType.id)\
+        .filter(OutputObjectCount.output_fk == output_id, ObjectType.name.in_(list(corrections)))\
+        .all()
+    found = {type_name: object_count for object_count, type_name in rows}
+    
+    missing = set(corrections) - set(found)
+    if missing:
+        raise ValueError(f"No stored count for object types: {', '.join(sorted(missing))}")
+    
+    for type_name, corrected_count in corrections.items():
+        found[type_name].corrected_count = corrected_count
+
+def get_object_count_totals():
+    """
+    Per-type totals across all results, aggregated in SQL
+    
+    Returns:
+        list: {object_type, results, predicted_total, corrected_results, corrected_total}
+    """
+    rows = db.session.query(
+        ObjectType.name,
+        db.func.count(OutputObjectCount.id),
+        db.func.sum(OutputObjectCount.predicted_count),
+        db.func.count(OutputObjectCount.corrected_count),
+        db.func.sum(OutputObjectCount.corrected_count)
+    ).join(ObjectType, OutputObjectCount.object_type_fk == ObjectType.id)\
+        .group_by(ObjectType.name)\
+        .order_by(ObjectType.name)\
+        .all()
+    
+    return [
+        {
+            'object_type': name,
+            'results': results,
+            'predicted_total': int(predicted_total or 0),
+            'corrected_results': corrected_results,
+            'corrected_total': int(corrected_total or 0)
+        }
+        for name, results, predicted_total, corrected_results, corrected_total in rows
+    ]
+
+def find_referenced_images(image_paths):
+    """Subset of image paths still stored on some input (content-addressed files are shared)"""
+    rows = db.session.query(Input.image_path).filter(Input.image_path.in_(list(image_paths))).distinct()
+    return {image_path for image_path, in rows}
+
 def update_correction(output_id, corrected_count):
     """Update a prediction with user correction"""
     try:
@@ -145,6 +770,7 @@ def update_correction(output_id, corrected_count):
         if not output:
             raise ValueError(f"Output with ID {output_id} not found")
         
+        apply_accuracy_changes([(output.object_type_fk, output.predicted_count, output.corrected_count, corrected_count)])
         output.corrected_count = corrected_count
         output.updated_at = datetime.utcnow()
         db.session.commit()
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import random
+import time
+
+import numpy as np
+from PIL import Image
+
+from models.category_mapping import CANDIDATE_LABELS, ClassCategoryTable
+
+
+class FakeObjectCountingPipeline:
+    """
+    Deterministic stand-in for ObjectCountingPipeline
+
+    Honors the same count_objects / count_all_objects contract without loading
+    any models, so the HTTP, upload and database layers can be load-tested.
+    Labels are derived from a hash of the image bytes: the same image always
+    yields the same result.
+    """
+
+    NUM_CLASSES = 1000  # like ResNet-50's ImageNet head
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, max_segments=10, candidate_labels=None):
+        """
+        Args:
+            latency_ms (float): Simulated inference latency per image
+            jitter_ms (float): Extra latency drawn uniformly from [0, jitter_ms],
+                seeded by the image so it is deterministic too
+            max_segments (int): Upper bound on simulated segments
+            candidate_labels (list): Labels to draw from
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.TOP_N = max_segments
+        self.TOP_K = 5
+        self.device = "fake"
+        self.candidate_labels = candidate_labels or list(CANDIDATE_LABELS)
+        # Fixed class -> category table: class i maps to label i mod len(labels)
+        self._class_category_table = ClassCategoryTable(
+            self.candidate_labels,
+            [class_id % len(self.candidate_labels) for class_id in range(self.NUM_CLASSES)]
+        )
+
+    def class_category_table(self):
+        return self._class_category_table
+
+    def _read_bytes(self, image_file):
+        """Read raw bytes from a file-like object, path, bytes or decoded array"""
+        if isinstance(image_file, np.ndarray):
+            return image_file.tobytes()
+        if isinstance(image_file, (bytes, bytearray)):
+            return bytes(image_file)
+        if isinstance(image_file, str):
+            with open(image_file, 'rb') as f:
+                return f.read()
+        data = image_file.read()
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+        return data
+
+    def _detect(self, image_file):
+        """Simulate the segment/classify/map stages for one image"""
+        stage_times = {}
+
+        stage_start = time.perf_counter()
+        data = self._read_bytes(image_file)
+        if isinstance(image_file, np.ndarray):
+            width, height = image_file.shape[1], image_file.shape[0]
+        else:
+            # Decode like the real pipeline so invalid uploads fail the same way
+            width, height = Image.open(io.BytesIO(data)).convert('RGB').size
+        stage_times["load_image"] = time.perf_counter() - stage_start
+
+        rng = random.Random(hashlib.sha256(data).hexdigest())
+        segment_count = rng.randint(0, self.TOP_N)
+        table = self.class_category_table()
+        class_ids = [rng.sample(range(self.NUM_CLASSES), self.TOP_K) for _ in range(segment_count)]
+        labels = [table.label_of(ids[0]) for ids in class_ids]
+        segment_data = self._segment_data(rng, width, height, class_ids)
+
+        stage_start = time.perf_counter()
+        delay_ms = self.latency_ms + rng.uniform(0, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+        stage_times["segment"] = time.perf_counter() - stage_start
+        stage_times["mask_nms"] = 0.0
+        stage_times["prefilter"] = 0.0
+        stage_times["classify"] = 0.0
+        stage_times["map_categories"] = 0.0
+
+        return labels, stage_times, segment_data
+
+    def _segment_data(self, rng, width, height, class_ids):
+        """Random boxes and descending logits shaped like the real pipeline's segment_data"""
+        boxes, areas = [], []
+        for _ in class_ids:
+            x, y = rng.randrange(width), rng.randrange(height)
+            w, h = rng.randint(1, width - x), rng.randint(1, height - y)
+            boxes.append((x, y, w, h))
+            areas.append(rng.randint(1, w * h))
+        logits = [sorted((rng.uniform(-5, 15) for _ in ids), reverse=True) for ids in class_ids]
+
+        return {
+            "image_size": (width, height),
+            "boxes": np.array(boxes, dtype=np.int32).reshape(-1, 4),
+            "areas": np.array(areas, dtype=np.int32),
+            "class_ids": np.array(class_ids, dtype=np.int16).reshape(-1, self.TOP_K),
+            "logits": np.array(logits, dtype=np.float16).reshape(-1, self.TOP_K)
+        }
+
+    @staticmethod
+    def _mask_stats(labels):
+        """No simulated duplicates: every mask becomes a segment"""
+        return {"generated": len(labels), "suppressed": 0, "suppression_rate": 0.0}
+
+    def count_objects(self, image_file, target_object_type):
+        """Simulated single-type count (same result shape as the real pipeline)"""
+        start_time = time.time()
+        if not self.class_category_table().can_produce(target_object_type):
+            # Like the real pipeline's target-aware early exit: no simulated work
+            return {
+                "count": 0,
+                "total_segments": 0,
+                "skipped_segments": 0,
+                "all_detected_objects": [],
+                "processing_time": round(time.time() - start_time, 2),
+                "stage_times": {},
+                "mask_stats": self._mask_stats([]),
+                "segment_data": None,
+                "early_exit": True
+            }
+        labels, stage_times, segment_data = self._detect(image_file)
+        segment_data["target_object_type"] = target_object_type
+
+        return {
+            "count": labels.count(target_object_type),
+            "total_segments": len(labels),
+            "skipped_segments": 0,
+            "all_detected_objects": labels,
+            "processing_time": round(time.time() - start_time, 2),
+            "stage_times": {stage: round(s, 4) for stage, s in stage_times.items()},
+            "mask_stats": self._mask_stats(labels),
+            "segment_data": segment_data,
+            "early_exit": False
+        }
+
+    def count_all_objects(self, image_file):
+        """Simulated multi-type count (same result shape as the real pipeline)"""
+        start_time = time.time()
+        labels, stage_times, segment_data = self._detect(image_file)
+
+        object_counts = {}
+        for label in labels:
+            object_counts[label] = object_counts.get(label, 0) + 1
+
+        return {
+            "objects": [
+                {"type": obj_type, "count": count}
+                for obj_type, count in object_counts.items()
+            ],
+            "total_objects": sum(object_counts.values()),
+            "total_segments": len(labels),
+            "skipped_segments": 0,
+            "all_detected_objects": labels,
+            "processing_time": round(time.time() - start_time, 2),
+            "stage_times": {stage: round(s, 4) for stage, s in stage_times.items()},
+            "mask_stats": self._mask_stats(labels),
+            "segment_data": segment_data
+        }
+
+    def count_all_objects_batch(self, image_files, classify_batch_size=32):
+        """Simulated batched multi-type count, one count_all_objects result per image"""
+        return [self.count_all_objects(image_file) for image_file in image_files]
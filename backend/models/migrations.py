@@ -0,0 +1,190 @@
+"""
+Versioned schema migrations
+Each migration runs once, in order, inside its own transaction and records
+its version in the schema_version table. The version row is written first,
+so workers starting at the same time never apply a migration twice.
+Migrations are written to be safe on databases created before versioning
+existed (tables already there, indexes missing), so they check before
+creating anything.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, exc, exists, literal, select
+)
+
+from models.database import db
+
+
+class SchemaVersion(db.Model):
+    """Applied migrations"""
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def create_indexes(connection, table_name, index_names):
+    """Create the named indexes declared on a model table, skipping existing ones"""
+    table = db.metadata.tables[table_name]
+    indexes = {index.name: index for index in table.indexes}
+    for name in index_names:
+        indexes[name].create(bind=connection, checkfirst=True)
+
+
+# Schema before migrations existed, frozen here: later migrations add to it
+BASELINE = MetaData()
+
+Table(
+    'object_types', BASELINE,
+    Column('id', Integer, primary_key=True),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('name', String(255), nullable=False, unique=True),
+    Column('description', Text)
+)
+
+Table(
+    'inputs', BASELINE,
+    Column('id', Integer, primary_key=True),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('image_path', String(500), nullable=False),
+    Column('description', Text)
+)
+
+Table(
+    'outputs', BASELINE,
+    Column('id', Integer, primary_key=True),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('predicted_count', Integer, nullable=False),
+    Column('corrected_count', Integer),
+    Column('object_type_fk', Integer, ForeignKey('object_types.id'), nullable=False),
+    Column('input_fk', Integer, ForeignKey('inputs.id'), nullable=False)
+)
+
+
+def initial_schema(connection):
+    """Tables as they existed before migrations (no-op on existing databases)"""
+    BASELINE.create_all(bind=connection, checkfirst=True)
+
+
+def result_listing_indexes(connection):
+    """Indexes behind /api/results ordering and filtering and upload reference counts"""
+    create_indexes(connection, 'outputs', [
+        'ix_outputs_created_at',
+        'ix_outputs_object_type_fk',
+        'ix_outputs_input_fk',
+        'ix_outputs_object_type_created_at'
+    ])
+    create_indexes(connection, 'inputs', ['ix_inputs_image_path'])
+
+
+def output_object_counts_table(connection):
+    """Per-object-type counts of each result"""
+    db.metadata.tables['output_object_counts'].create(bind=connection, checkfirst=True)
+
+
+def accuracy_stats_table(connection):
+    """Running accuracy sums, backfilled from corrections made so far"""
+    from models.database import ACCURACY_SUM_COLUMNS, correction_contribution
+
+    table = db.metadata.tables['accuracy_stats']
+    table.create(bind=connection, checkfirst=True)
+    if connection.execute(db.select(db.func.count()).select_from(table)).scalar():
+        return
+
+    outputs = db.metadata.tables['outputs']
+    totals = {None: dict.fromkeys(ACCURACY_SUM_COLUMNS, 0)}
+    rows = connection.execute(
+        db.select(outputs.c.object_type_fk, outputs.c.predicted_count, outputs.c.corrected_count)
+        .where(outputs.c.corrected_count.isnot(None))
+    )
+    for object_type_fk, predicted_count, corrected_count in rows:
+        contribution = correction_contribution(predicted_count, corrected_count)
+        for key in (None, object_type_fk):
+            row = totals.setdefault(key, dict.fromkeys(ACCURACY_SUM_COLUMNS, 0))
+            for column, value in contribution.items():
+                row[column] += value
+
+    now = datetime.utcnow()
+    connection.execute(table.insert(), [
+        {'object_type_fk': object_type_fk, 'updated_at': now, **row}
+        for object_type_fk, row in totals.items()
+    ])
+
+
+def id_sequences_table(connection):
+    """Id blocks for the result writers (see IdAllocator)"""
+    db.metadata.tables['id_sequences'].create(bind=connection, checkfirst=True)
+
+
+def output_segments_table(connection):
+    """Per-segment predictions; older results simply have none"""
+    db.metadata.tables['output_segments'].create(bind=connection, checkfirst=True)
+
+
+def cache_versions_table(connection):
+    """Change counters that let every process's caches notice changes"""
+    db.metadata.tables['cache_versions'].create(bind=connection, checkfirst=True)
+
+
+# (version, description, function) in the order they must run; append only
+MIGRATIONS = [
+    (1, 'initial schema', initial_schema),
+    (2, 'indexes for result listing', result_listing_indexes),
+    (3, 'per-object-type result counts', output_object_counts_table),
+    (4, 'running accuracy stats', accuracy_stats_table),
+    (5, 'id sequences', id_sequences_table),
+    (6, 'per-segment predictions', output_segments_table),
+    (7, 'cache versions', cache_versions_table),
+]
+
+
+def get_schema_version():
+    """Highest applied migration version, 0 for an unversioned database"""
+    SchemaVersion.__table__.create(bind=db.engine, checkfirst=True)
+    return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+
+
+def run_migrations():
+    """
+    Apply pending migrations (call inside an app context)
+
+    Returns:
+        list: Versions applied by this call
+    """
+    current_version = get_schema_version()
+    db.session.commit()
+    applied = []
+    versions = SchemaVersion.__table__
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        # Recording the version first takes the database write lock, so a
+        # worker starting at the same time waits and then finds it applied
+        try:
+            with db.engine.begin() as connection:
+                claimed = connection.execute(versions.insert().from_select(
+                    ['version', 'description', 'applied_at'],
+                    select(literal(version), literal(description), literal(datetime.utcnow()))
+                    .where(~exists().where(versions.c.version == version))
+                )).rowcount
+                if claimed:
+                    migrate(connection)
+        except exc.IntegrityError:
+            # Inserted concurrently where the database doesn't serialize writers
+            if version > get_schema_version():
+                raise
+            db.session.commit()
+            claimed = 0
+        if claimed:
+            applied.append(version)
+            print(f"🗄️  Applied migration {version}: {description}")
+
+    return applied
@@ -2,13 +2,21 @@ import numpy as np
 import torch
 import torch.nn.functional as F
 from segment_anything import SamAutomaticMaskGenerator, sam_model_registry
-import torchvision.transforms as tf
 from transformers import AutoImageProcessor, AutoModelForImageClassification, pipeline
 from PIL import Image
 import os
+import threading
 import urllib.request
 import time
 
+from models.category_mapping import (
+    BACKGROUND_LABEL, CANDIDATE_LABELS, build_class_category_table, load_class_category_table
+)
+from models import rle
+from models.postprocess import (
+    extract_segments_rle, get_mask_box, prefilter_masks, sort_masks, suppress_duplicate_masks
+)
+
 # Import performance monitor for stage tracking
 try:
     from performance_monitor import get_performance_monitor
@@ -25,22 +33,42 @@ class ObjectCountingPipeline:
     3. DistilBERT for zero-shot label mapping
     """
     
-    def __init__(self):
-        """Initialize all models and components"""
+    def __init__(self, category_cache_path=None, nms_iou_threshold=0.7, nms_containment_threshold=0.9,
+                 segment_filter=None, target_aware_count=True, warm_category_table=True):
+        """
+        Initialize all models and components
+        
+        Args:
+            category_cache_path (str): Where the class -> category table is cached
+            nms_iou_threshold (float): Masks overlapping a larger kept mask by
+                more than this IoU are dropped before classification
+            nms_containment_threshold (float): Masks with more than this fraction
+                inside a larger kept mask are dropped (object parts)
+            segment_filter (dict): Optional geometric pre-filter: 'mode' ('drop' or
+                'background') plus prefilter_masks() thresholds; None disables it
+            target_aware_count (bool): Let count_objects use the cached class ->
+                category table (see count_objects)
+            warm_category_table (bool): With target_aware_count, load or build
+                that table at startup (see warm_class_category_table)
+        """
         print("Initializing Object Counting Pipeline...")
         
         # Configuration
         self.TOP_N = 10  # Number of top segments to process
+        self.TOP_K = 5  # ResNet classes kept per segment for re-mapping
+        self.nms_iou_threshold = nms_iou_threshold
+        self.nms_containment_threshold = nms_containment_threshold
+        self.segment_filter = segment_filter
+        self.target_aware_count = target_aware_count
+        self.category_cache_path = category_cache_path
+        self._class_category_table = None
+        self._category_table_lock = threading.Lock()
         
         # GPU setup with memory management
         self._setup_device()
         
         # Predefined object categories
-        self.candidate_labels = [
-            "person", "car", "bus", "bicycle", "motorcycle",
-            "dog", "cat", "bird", "tree", "building", 
-            "road", "sky"
-        ]
+        self.candidate_labels = list(CANDIDATE_LABELS)
         
         # Initialize models with error handling
         try:
@@ -60,6 +88,9 @@ class ObjectCountingPipeline:
                 print("✅ Pipeline initialized on CPU!")
             else:
                 raise e
+        
+        if self.target_aware_count and warm_category_table:
+            self.warm_class_category_table()
     
     def _setup_device(self):
         """Setup device with GPU memory management"""
@@ -95,6 +126,8 @@ class ObjectCountingPipeline:
             pred_iou_thresh=0.7,
             stability_score_thresh=0.85,
             min_mask_region_area=500,
+            # Compact masks: a few KB each instead of a full-resolution bool array
+            output_mode="coco_rle",
         )
         print("SAM model ready!")
     
@@ -123,53 +156,91 @@ class ObjectCountingPipeline:
         
         print(f"Zero-shot classifier ready on {self.device}!")
     
-    def segment_image(self, image):
+    def _load_image(self, image_input):
         """
-        Step 1: Segment image using SAM
+        Load the pipeline input as an RGB array
         
         Args:
-            image (PIL.Image): Input image
+            image_input: Decoded (H, W, 3) uint8 array, PIL image,
+                or an image file / file-like object to decode
             
         Returns:
-            tuple: (segmented_map, segments_list)
+            np.ndarray: (height, width, 3) uint8 array
         """
-        height, width = image.size[1], image.size[0]
-        
-        # Generate masks using SAM
-        masks = self.mask_generator.generate(np.array(image))
-        masks_sorted = sorted(masks, key=lambda x: x['area'], reverse=True)
-        
-        # Create panoptic segmentation map
-        predicted_panoptic_map = np.zeros((height, width), dtype=np.int32)
-        for idx, mask_data in enumerate(masks_sorted[:self.TOP_N]):
-            predicted_panoptic_map[mask_data['segmentation']] = idx + 1
-        
-        predicted_panoptic_map = torch.from_numpy(predicted_panoptic_map)
-        
-        # Extract individual segments
-        transform = tf.Compose([tf.PILToTensor()])
-        img_tensor = transform(image)
-        
-        segments = []
-        for label in predicted_panoptic_map.unique():
-            if label == 0:  # Skip background
-                continue
-                
-            y_start, y_end = self._get_mask_box(predicted_panoptic_map == label)
-            x_start, x_end = self._get_mask_box((predicted_panoptic_map == label).T)
-            
-            if y_start is None or x_start is None:
-                continue
-            
-            cropped_tensor = img_tensor[:, y_start:y_end+1, x_start:x_end+1]
-            cropped_mask = predicted_panoptic_map[y_start:y_end+1, x_start:x_end+1] == label
-            
-            segment = cropped_tensor * cropped_mask.unsqueeze(0)
-            segment[:, ~cropped_mask] = 188  # Set background to gray
+        if isinstance(image_input, np.ndarray):
+            return image_input
+        if isinstance(image_input, Image.Image):
+            return np.array(image_input.convert('RGB'))
+        return np.array(Image.open(image_input).convert('RGB'))
+    
+    def segment_image(self, image, mask_stats=None):
+        """
+        Step 1: Segment image using SAM
+        
+        Args:
+            image (np.ndarray or PIL.Image): Input RGB image
+            mask_stats (dict): Optional; receives masks 'generated', 'suppressed'
+                by mask NMS, masks among the TOP_N 'skipped' by the pre-filter
+                and the time of those steps ('stage_times')
             
-            segments.append(segment)
+        Returns:
+            tuple: ((boxes, areas) of the visible segments, segments_list);
+                   segments the pre-filter labels background are None
+        """
+        image = self._load_image(image)
+        
+        # Generate masks using SAM (COCO RLE)
+        masks = self.mask_generator.generate(image)
+        
+        masks = sort_masks(masks)
+        rles = [rle.to_rle(mask_data['segmentation']) for mask_data in masks]
+        
+        # Find segments that are not worth a ResNet pass (background, slivers)
+        # first, so they cannot suppress the objects inside them below
+        stage_start = time.perf_counter()
+        rejected = np.zeros(len(masks), dtype=bool)
+        if self.segment_filter:
+            thresholds = {key: value for key, value in self.segment_filter.items() if key != 'mode'}
+            rejected = prefilter_masks(
+                rles,
+                [mask_data.get('stability_score', 1.0) for mask_data in masks],
+                (image.shape[1], image.shape[0]),
+                **thresholds
+            )
+        prefilter_time = time.perf_counter() - stage_start
+        
+        # Drop duplicates and object parts before they become crops
+        stage_start = time.perf_counter()
+        keep = suppress_duplicate_masks(
+            rles, self.nms_iou_threshold, self.nms_containment_threshold, suppressors=~rejected
+        )
+        nms_time = time.perf_counter() - stage_start
+        suppressed = len(masks) - int(keep.sum())
         
-        return predicted_panoptic_map, segments
+        skip = None
+        dropped = 0
+        if self.segment_filter and self.segment_filter.get('mode') == 'background':
+            skip = rejected[keep]
+        else:
+            # Only rejected masks that would have been among the TOP_N segments count as skipped
+            dropped = int(rejected[np.flatnonzero(keep)[:self.TOP_N]].sum())
+            keep &= ~rejected
+        kept_masks = [
+            {**mask_data, 'segmentation': mask_rle}
+            for mask_data, mask_rle, kept in zip(masks, rles, keep) if kept
+        ]
+        
+        # Resolve overlaps on RLE and crop each segment
+        geometry, segments = extract_segments_rle(image, kept_masks, self.TOP_N, skip=skip)
+        
+        if mask_stats is not None:
+            mask_stats.update({
+                "generated": len(masks),
+                "suppressed": suppressed,
+                "skipped": dropped + sum(segment is None for segment in segments),
+                "stage_times": {"mask_nms": nms_time, "prefilter": prefilter_time}
+            })
+        return geometry, segments
     
     def _get_mask_box(self, tensor):
         """
@@ -181,14 +252,7 @@ class ObjectCountingPipeline:
         Returns:
             tuple: (first_index, last_index)
         """
-        non_zero_indices = torch.nonzero(tensor, as_tuple=True)[0]
-        if non_zero_indices.shape[0] == 0:
-            return None, None
-        
-        first_n = non_zero_indices[:1].item()
-        last_n = non_zero_indices[-1:].item()
-        
-        return first_n, last_n
+        return get_mask_box(tensor)
     
     def classify_segments(self, segments):
         """
@@ -200,27 +264,118 @@ class ObjectCountingPipeline:
         Returns:
             list: Predicted class names
         """
-        predicted_classes = []
+        return self.classify_segments_topk(segments)[0]
+    
+    def classify_segments_batched(self, segments, batch_size=32):
+        """
+        Step 2 for many segments at once: one ResNet-50 forward pass per batch
+        
+        Args:
+            segments (list): Image segments, possibly from several images
+            batch_size (int): Segments per forward pass
+            
+        Returns:
+            list: Predicted class names, in segment order
+        """
+        return self.classify_segments_topk(segments, batch_size=batch_size)[0]
+    
+    def classify_segments_topk(self, segments, batch_size=1):
+        """
+        Classify segments and keep the TOP_K best classes of each
+        
+        Args:
+            segments (list): Image segments
+            batch_size (int): Segments per forward pass
+            
+        Returns:
+            tuple: (top class names, (n, TOP_K) int16 class ids best first,
+                    (n, TOP_K) float16 logits)
+        """
+        id2label = self.class_model.config.id2label
+        class_ids, logits = [], []
         
-        for segment in segments:
-            inputs = self.image_processor(images=segment, return_tensors="pt")
+        for start in range(0, len(segments), batch_size):
+            inputs = self.image_processor(images=segments[start:start + batch_size], return_tensors="pt")
             
             # Move inputs to GPU if available
             if self.device == "cuda":
                 inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
             with torch.no_grad():  # Optimize GPU memory
-                outputs = self.class_model(**inputs)
-                logits = outputs.logits
-                predicted_class_idx = logits.argmax(-1).item()
-                predicted_class = self.class_model.config.id2label[predicted_class_idx]
-                predicted_classes.append(predicted_class)
+                top = self.class_model(**inputs).logits.topk(self.TOP_K, dim=-1)
+            class_ids.append(top.indices.cpu().numpy().astype(np.int16))
+            logits.append(top.values.float().cpu().numpy().astype(np.float16))
         
         # Clean up GPU memory after classification
         if self.device == "cuda":
             torch.cuda.empty_cache()
         
-        return predicted_classes
+        class_ids = np.concatenate(class_ids) if class_ids else np.zeros((0, self.TOP_K), dtype=np.int16)
+        logits = np.concatenate(logits) if logits else np.zeros((0, self.TOP_K), dtype=np.float16)
+        return [id2label[int(idx)] for idx in class_ids[:, 0]], class_ids, logits
+    
+    def class_category_table(self):
+        """
+        Zero-shot category of every ResNet-50 class (see models.category_mapping)
+        
+        Built with label_classifier on first use (one call per class) and
+        cached in category_cache_path across restarts.
+        """
+        with self._category_table_lock:
+            if self._class_category_table is None:
+                self._class_category_table = build_class_category_table(
+                    self._class_names(),
+                    self.candidate_labels,
+                    lambda name: self.map_to_categories([name])[0],
+                    cache_path=self.category_cache_path
+                )
+        return self._class_category_table
+    
+    def warm_class_category_table(self):
+        """
+        Make class_category_table() available to count_objects
+        
+        Loads it from category_cache_path, or else builds it (and writes the
+        cache) on a background thread; requests meanwhile run the full pipeline.
+        
+        Returns:
+            threading.Thread or None: The builder, None when the cache was used
+        """
+        table = load_class_category_table(self._class_names(), self.candidate_labels, self.category_cache_path)
+        if table is not None:
+            self._class_category_table = table
+            return None
+        
+        def build():
+            try:
+                self.class_category_table()
+                print("✅ Class category table ready for target-aware counting")
+            except Exception as e:
+                print(f"⚠️  Warning: Could not build the class category table, counting without it: {e}")
+        
+        builder = threading.Thread(target=build, name='class-category-table', daemon=True)
+        builder.start()
+        return builder
+    
+    def cached_class_category_table(self):
+        """class_category_table() once loaded or built (see warm_class_category_table), else None; no disk access"""
+        return self._class_category_table
+    
+    def _class_names(self):
+        id2label = self.class_model.config.id2label
+        return [id2label[idx] for idx in range(len(id2label))]
+    
+    @staticmethod
+    def _segment_data(image, geometry, class_ids, logits):
+        """Per-segment geometry and top-k predictions, persisted for re-mapping"""
+        boxes, areas = geometry
+        return {
+            "image_size": (image.shape[1], image.shape[0]),
+            "boxes": boxes,
+            "areas": areas,
+            "class_ids": class_ids,
+            "logits": logits
+        }
     
     def map_to_categories(self, predicted_classes):
         """
@@ -245,37 +400,90 @@ class ObjectCountingPipeline:
         """
         Main pipeline: Count objects of specified type in image
         
+        When the class -> category table is available (target_aware_count and
+        a loaded or built table), a target that no ImageNet class maps to
+        returns a count of 0 without running SAM or ResNet ("early_exit":
+        true). Otherwise only segments with a top-k class that maps to the
+        target are labelled, by table lookup instead of the zero-shot model;
+        the count is the same as the full pipeline's, and
+        all_detected_objects lists just those labelled segments.
+        
         Args:
-            image_file: Image file from Flask request
+            image_file: Decoded RGB array, PIL image or image file
             target_object_type (str): Type of object to count
             
         Returns:
             dict: Results including count and processing info
         """
         start_time = time.time()
+        stage_times = {}
+        
+        table = self.cached_class_category_table() if self.target_aware_count else None
+        if table is not None and not table.can_produce(target_object_type):
+            # The full pipeline could only ever count 0 of this type
+            return self._early_exit_result(start_time)
         
         # Load image
-        image = Image.open(image_file).convert('RGB')
+        stage_start = time.perf_counter()
+        image = self._load_image(image_file)
+        stage_times["load_image"] = time.perf_counter() - stage_start
         
         # Step 1: Segment image
-        segmentation_map, segments = self.segment_image(image)
+        stage_start = time.perf_counter()
+        mask_stats = {}
+        geometry, segments = self.segment_image(image, mask_stats)
+        stage_times["segment"] = time.perf_counter() - stage_start - sum(mask_stats["stage_times"].values())
+        stage_times.update(mask_stats["stage_times"])
+        classified_geometry = self._classified_geometry(geometry, segments)
         
         # Step 2: Classify segments
-        predicted_classes = self.classify_segments(segments)
+        stage_start = time.perf_counter()
+        predicted_classes, class_ids, logits = self.classify_segments_topk(
+            [segment for segment in segments if segment is not None]
+        )
+        stage_times["classify"] = time.perf_counter() - stage_start
         
         # Step 3: Map to categories
-        final_labels = self.map_to_categories(predicted_classes)
-        
-        # Count target objects
+        stage_start = time.perf_counter()
+        if table is not None:
+            # Segments none of whose top-k classes maps to the target can't be
+            # it: they are left unlabelled and only the rest are looked up
+            candidates = np.isin(class_ids, table.classes_of(target_object_type)).any(axis=1)
+            final_labels = table.labels_of(class_ids[candidates, 0])
+        else:
+            final_labels = self._with_background(self.map_to_categories(predicted_classes), segments)
         target_count = final_labels.count(target_object_type)
+        stage_times["map_categories"] = time.perf_counter() - stage_start
         
         processing_time = time.time() - start_time
         
+        segment_data = self._segment_data(image, classified_geometry, class_ids, logits)
+        segment_data["target_object_type"] = target_object_type
+        
         return {
             "count": target_count,
             "total_segments": len(segments),
+            "skipped_segments": mask_stats["skipped"],
             "all_detected_objects": final_labels,
-            "processing_time": round(processing_time, 2)
+            "processing_time": round(processing_time, 2),
+            "stage_times": self._round_stage_times(stage_times),
+            "mask_stats": self._mask_summary(mask_stats),
+            "segment_data": segment_data,
+            "early_exit": False
+        }
+    
+    def _early_exit_result(self, start_time):
+        """count_objects result for a target no segment can be labelled as"""
+        return {
+            "count": 0,
+            "total_segments": 0,
+            "skipped_segments": 0,
+            "all_detected_objects": [],
+            "processing_time": round(time.time() - start_time, 2),
+            "stage_times": {},
+            "mask_stats": self._mask_summary({"generated": 0, "suppressed": 0}),
+            "segment_data": None,
+            "early_exit": True
         }
     
     def count_all_objects(self, image_file):
@@ -283,7 +491,7 @@ class ObjectCountingPipeline:
         Main pipeline: Detect and count ALL objects in image
         
         Args:
-            image_file: Image file from Flask request
+            image_file: Decoded RGB array, PIL image or image file
             
         Returns:
             dict: Results including counts for all detected object types
@@ -300,40 +508,44 @@ class ObjectCountingPipeline:
             except:
                 pass
         
+        stage_times = {}
+        
         # Load image
-        image = Image.open(image_file).convert('RGB')
+        stage_start = time.perf_counter()
+        image = self._load_image(image_file)
+        stage_times["load_image"] = time.perf_counter() - stage_start
         
         # Step 1: Segment image
         if monitor and monitor.is_monitoring:
             monitor.update_stage("segmenting")
-        segmentation_map, segments = self.segment_image(image)
+        stage_start = time.perf_counter()
+        mask_stats = {}
+        geometry, segments = self.segment_image(image, mask_stats)
+        stage_times["segment"] = time.perf_counter() - stage_start - sum(mask_stats["stage_times"].values())
+        stage_times.update(mask_stats["stage_times"])
+        classified_geometry = self._classified_geometry(geometry, segments)
         
         # Step 2: Classify segments
         if monitor and monitor.is_monitoring:
             monitor.update_stage("classifying")
-        predicted_classes = self.classify_segments(segments)
+        stage_start = time.perf_counter()
+        predicted_classes, class_ids, logits = self.classify_segments_topk(
+            [segment for segment in segments if segment is not None]
+        )
+        stage_times["classify"] = time.perf_counter() - stage_start
         
         # Step 3: Map to categories
         if monitor and monitor.is_monitoring:
             monitor.update_stage("mapping_categories")
-        final_labels = self.map_to_categories(predicted_classes)
+        stage_start = time.perf_counter()
+        final_labels = self._with_background(self.map_to_categories(predicted_classes), segments)
+        stage_times["map_categories"] = time.perf_counter() - stage_start
         
         # Count all object types
         if monitor and monitor.is_monitoring:
             monitor.update_stage("counting_objects")
         
-        object_counts = {}
-        for label in final_labels:
-            object_counts[label] = object_counts.get(label, 0) + 1
-        
-        # Convert to list format for frontend
-        objects_list = [
-            {"type": obj_type, "count": count} 
-            for obj_type, count in object_counts.items()
-        ]
-        
-        # Calculate total objects
-        total_objects = sum(object_counts.values())
+        result = self._count_labels(final_labels)
         
         # Final stage
         if monitor and monitor.is_monitoring:
@@ -342,12 +554,134 @@ class ObjectCountingPipeline:
         processing_time = time.time() - start_time
         
         return {
-            "objects": objects_list,
-            "total_objects": total_objects,
+            **result,
             "total_segments": len(segments),
-            "all_detected_objects": final_labels,
-            "processing_time": round(processing_time, 2)
+            "skipped_segments": mask_stats["skipped"],
+            "processing_time": round(processing_time, 2),
+            "stage_times": self._round_stage_times(stage_times),
+            "mask_stats": self._mask_summary(mask_stats),
+            "segment_data": self._segment_data(image, classified_geometry, class_ids, logits)
         }
+    
+    def count_all_objects_batch(self, image_files, classify_batch_size=32):
+        """
+        count_all_objects for several images, for offline ingest
+        
+        SAM runs per image, but ResNet-50 classifies the segments of all images
+        in shared forward passes and each distinct class is mapped to a
+        category once.
+        
+        Args:
+            image_files (list): Decoded RGB arrays, PIL images or image files
+            classify_batch_size (int): Segments per ResNet-50 forward pass
+            
+        Returns:
+            list: One count_all_objects result per image; processing and
+                  stage times are the batch's, divided evenly between images
+        """
+        start_time = time.time()
+        stage_times = {
+            "load_image": 0.0, "segment": 0.0, "mask_nms": 0.0, "prefilter": 0.0, "classify": 0.0, "map_categories": 0.0
+        }
+        
+        images, geometries, segments_per_image, mask_stats_per_image = [], [], [], []
+        for image_file in image_files:
+            stage_start = time.perf_counter()
+            image = self._load_image(image_file)
+            stage_times["load_image"] += time.perf_counter() - stage_start
+            
+            stage_start = time.perf_counter()
+            mask_stats = {}
+            geometry, segments = self.segment_image(image, mask_stats)
+            stage_times["segment"] += time.perf_counter() - stage_start - sum(mask_stats["stage_times"].values())
+            for stage, seconds in mask_stats["stage_times"].items():
+                stage_times[stage] += seconds
+            mask_stats_per_image.append(mask_stats)
+            images.append(image)
+            geometries.append(geometry)
+            segments_per_image.append(segments)
+        
+        stage_start = time.perf_counter()
+        predicted_classes, class_ids, logits = self.classify_segments_topk(
+            [segment for segments in segments_per_image for segment in segments if segment is not None],
+            batch_size=classify_batch_size
+        )
+        stage_times["classify"] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        distinct_classes = sorted(set(predicted_classes))
+        categories = dict(zip(distinct_classes, self.map_to_categories(distinct_classes)))
+        stage_times["map_categories"] = time.perf_counter() - stage_start
+        
+        share = max(len(image_files), 1)
+        processing_time = round((time.time() - start_time) / share, 2)
+        per_image_stage_times = self._round_stage_times({stage: seconds / share for stage, seconds in stage_times.items()})
+        
+        results = []
+        offset = 0
+        for image, geometry, segments, mask_stats in zip(images, geometries, segments_per_image, mask_stats_per_image):
+            end = offset + sum(segment is not None for segment in segments)
+            labels = self._with_background([categories[c] for c in predicted_classes[offset:end]], segments)
+            results.append({
+                **self._count_labels(labels),
+                "total_segments": len(segments),
+                "skipped_segments": mask_stats["skipped"],
+                "processing_time": processing_time,
+                "stage_times": per_image_stage_times,
+                "mask_stats": self._mask_summary(mask_stats),
+                "segment_data": self._segment_data(
+                    image, self._classified_geometry(geometry, segments), class_ids[offset:end], logits[offset:end]
+                )
+            })
+            offset = end
+        return results
+    
+    @staticmethod
+    def _classified_geometry(geometry, segments):
+        """Boxes and areas of the segments that were classified (not skipped by the pre-filter)"""
+        boxes, areas = geometry
+        classified = np.array([segment is not None for segment in segments], dtype=bool)
+        return boxes[classified], areas[classified]
+    
+    @staticmethod
+    def _with_background(labels, segments):
+        """Label per segment: the mapped labels in order, BACKGROUND_LABEL for skipped segments"""
+        labels = iter(labels)
+        return [BACKGROUND_LABEL if segment is None else next(labels) for segment in segments]
+    
+    @staticmethod
+    def _count_labels(final_labels):
+        """Per-type counts of the mapped labels, in the count_all_objects result shape"""
+        object_counts = {}
+        for label in final_labels:
+            if label == BACKGROUND_LABEL:
+                continue  # Skipped by the pre-filter, not an object
+            object_counts[label] = object_counts.get(label, 0) + 1
+        
+        return {
+            # List format for frontend
+            "objects": [
+                {"type": obj_type, "count": count}
+                for obj_type, count in object_counts.items()
+            ],
+            "total_objects": sum(object_counts.values()),
+            "all_detected_objects": final_labels
+        }
+    
+    @staticmethod
+    def _mask_summary(mask_stats):
+        """SAM masks generated and suppressed by mask NMS, for results and benchmarks"""
+        generated = mask_stats["generated"]
+        return {
+            "generated": generated,
+            "suppressed": mask_stats["suppressed"],
+            "suppression_rate": round(mask_stats["suppressed"] / generated, 4) if generated else 0.0
+        }
+    
+    @staticmethod
+    def _round_stage_times(stage_times):
+        """Round per-stage durations (seconds) for JSON responses"""
+        return {stage: round(seconds, 4) for stage, seconds in stage_times.items()}
 
 
 
@@ -0,0 +1,226 @@
+"""
+Array-only postprocessing of SAM masks
+These steps run after mask generation and before classification. They do not
+touch any model, so they can be tested and benchmarked without SAM.
+
+extract_segments_rle() crops segments straight from COCO RLE masks without
+ever building full-image arrays.
+"""
+
+import numpy as np
+import torch
+import torchvision.transforms as tf
+
+from models import rle
+
+# Fill value for pixels outside a segment's mask
+BACKGROUND_FILL = 188
+
+
+def sort_masks(masks):
+    """Sort SAM mask records by area, largest first"""
+    return sorted(masks, key=lambda x: x['area'], reverse=True)
+
+
+def get_mask_box(tensor):
+    """
+    Get bounding box of non-zero elements in tensor
+
+    Args:
+        tensor (torch.Tensor): Input tensor
+
+    Returns:
+        tuple: (first_index, last_index)
+    """
+    non_zero_indices = torch.nonzero(tensor, as_tuple=True)[0]
+    if non_zero_indices.shape[0] == 0:
+        return None, None
+
+    first_n = non_zero_indices[:1].item()
+    last_n = non_zero_indices[-1:].item()
+
+    return first_n, last_n
+
+
+def fill_masked_crop(cropped_tensor, cropped_mask):
+    """Crop with the pixels outside an (h, w) bool mask set to BACKGROUND_FILL"""
+    segment = cropped_tensor * cropped_mask.unsqueeze(0)
+    segment[:, ~cropped_mask] = BACKGROUND_FILL
+
+    return segment
+
+
+def image_to_tensor(image):
+    """
+    Convert an RGB image to a (3, H, W) uint8 tensor
+
+    Accepts a PIL image or an (H, W, 3) uint8 array. Arrays are wrapped
+    without copying.
+    """
+    if isinstance(image, np.ndarray):
+        return torch.from_numpy(image).permute(2, 0, 1)
+
+    transform = tf.Compose([tf.PILToTensor()])
+    return transform(image)
+
+
+def visible_windows(rles, boxes):
+    """
+    Visible part of each mask when painted in order, later masks on top
+
+    Each mask's box is decoded and the union of the masks painted after it is
+    cut out; that union is kept as RLE and only decoded where it overlaps.
+
+    Args:
+        rles (list): COCO RLEs in paint order
+        boxes (np.ndarray): (n, 4) x, y, width, height of each RLE
+
+    Returns:
+        list: (x, y, (h, w) bool mask of the tight visible box) per mask,
+              None for masks that end up fully covered
+    """
+    visible = [None] * len(rles)
+    painted_over = None
+
+    for index in reversed(range(len(rles))):
+        x, y, w, h = (int(v) for v in boxes[index])
+        if w == 0 or h == 0:
+            continue
+        window = rle.decode_window(rles[index], x, y, x + w - 1, y + h - 1)
+        if painted_over is not None and rle.iou([rles[index]], [painted_over])[0, 0] > 0:
+            window &= ~rle.decode_window(painted_over, x, y, x + w - 1, y + h - 1)
+        painted_over = rles[index] if painted_over is None else rle.union([painted_over, rles[index]])
+
+        rows = np.flatnonzero(window.any(axis=1))
+        if not len(rows):
+            continue
+        cols = np.flatnonzero(window.any(axis=0))
+        visible[index] = (
+            x + int(cols[0]), y + int(rows[0]),
+            window[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        )
+
+    return visible
+
+
+def extract_segments_rle(image, masks, top_n, skip=None):
+    """
+    Crop the visible part of the top-N masks, smaller masks painted on top
+
+    Segments come largest mask first. Masks are only decoded inside their own
+    bounding box and no panoptic map is built.
+
+    Args:
+        image (PIL.Image or np.ndarray): Input RGB image
+        masks (list): SAM mask records; 'segmentation' may be a COCO RLE
+                      (output_mode='coco_rle'), an uncompressed RLE or a bool mask
+        top_n (int): Number of largest masks to keep
+        skip (sequence): Optional bool per mask record; these masks still
+                         cover the ones below them but are not cropped
+
+    Returns:
+        tuple: (((n, 4) int32 x, y, width, height boxes, (n,) int32 visible
+               areas), segments_list); skipped segments are None in segments_list
+    """
+    img_tensor = image_to_tensor(image)
+
+    # Same stable largest-first order as sort_masks(), keeping the skip flags aligned
+    order = sorted(range(len(masks)), key=lambda index: masks[index]['area'], reverse=True)[:top_n]
+    rles = [rle.to_rle(masks[index]['segmentation']) for index in order]
+    skipped = [bool(skip[index]) if skip is not None else False for index in order]
+    windows = [
+        (window, skipped_mask)
+        for window, skipped_mask in zip(visible_windows(rles, rle.bbox(rles)), skipped) if window is not None
+    ]
+
+    segments, boxes, areas = [], [], []
+    for (x, y, crop_mask), skipped_mask in windows:
+        h, w = crop_mask.shape
+        segments.append(None if skipped_mask else fill_masked_crop(
+            img_tensor[:, y:y + h, x:x + w], torch.from_numpy(np.ascontiguousarray(crop_mask))
+        ))
+        boxes.append((x, y, w, h))
+        areas.append(int(crop_mask.sum()))
+
+    geometry = (np.array(boxes, dtype=np.int32).reshape(-1, 4), np.array(areas, dtype=np.int32))
+    return geometry, segments
+
+
+def mask_overlaps(rles):
+    """
+    Pairwise IoU and containment of RLE masks
+
+    Returns:
+        tuple: ((n, n) IoU, (n, n) containment where [i, j] is the fraction
+               of mask j that lies inside mask i)
+    """
+    areas = rle.area(rles).astype(np.float64)
+    iou = rle.iou(rles, rles)
+    # |A & B| from IoU: iou = inter / (a + b - inter)
+    intersection = iou * (areas[:, None] + areas[None, :]) / (1.0 + iou)
+    containment = intersection / np.maximum(areas[None, :], 1.0)
+    return iou, containment
+
+
+def suppress_duplicate_masks(rles, iou_threshold=0.7, containment_threshold=0.9, suppressors=None):
+    """
+    Mask NMS: drop masks that duplicate or sit inside an earlier kept mask
+
+    Masks are taken in the given priority order (largest first after
+    sort_masks), so a whole object suppresses its parts. A threshold of 1
+    disables that test.
+
+    Args:
+        suppressors (sequence): Optional bool per mask; only these can
+                                suppress others (e.g. not pre-filtered
+                                background, which would swallow the objects
+                                in front of it)
+
+    Returns:
+        np.ndarray: (n,) bool, True for masks to keep
+    """
+    keep = np.ones(len(rles), dtype=bool)
+    if len(rles) < 2:
+        return keep
+
+    iou, containment = mask_overlaps(rles)
+    suppresses = np.triu((iou > iou_threshold) | (containment > containment_threshold), k=1)
+    if suppressors is not None:
+        suppresses &= np.asarray(suppressors, dtype=bool)[:, None]
+    for index in range(len(rles)):
+        if keep[index]:
+            keep[index + 1:] &= ~suppresses[index, index + 1:]
+    return keep
+
+
+def prefilter_masks(rles, stability_scores, image_size, max_area_fraction=1.0, min_area_fraction=0.0,
+                    max_aspect_ratio=0.0, max_border_edges=4, min_stability=0.0):
+    """
+    Masks not worth classifying, judged from RLE geometry alone
+
+    Rejects masks covering more than max_area_fraction of the frame (sky,
+    road) or less than min_area_fraction, with a bounding box longer than
+    max_aspect_ratio times its width (slivers; 0 disables), touching more
+    than max_border_edges image edges, or with a SAM stability score below
+    min_stability.
+
+    Args:
+        rles (list): COCO RLEs
+        stability_scores (sequence): SAM 'stability_score' per mask
+        image_size (tuple): (width, height)
+
+    Returns:
+        np.ndarray: (n,) bool, True for masks to skip
+    """
+    width, height = image_size
+    boxes = rle.bbox(rles)
+    fractions = rle.area(rles) / float(width * height)
+    x, y, w, h = boxes.T
+
+    reject = (fractions > max_area_fraction) | (fractions < min_area_fraction)
+    if max_aspect_ratio > 0:
+        reject |= np.maximum(w, h) > max_aspect_ratio * np.maximum(np.minimum(w, h), 1)
+    edges = (x <= 0).astype(int) + (y <= 0) + (x + w >= width) + (y + h >= height)
+    reject |= edges > max_border_edges
+    reject |= np.asarray(stability_scores, dtype=np.float64).reshape(-1) < min_stability
+    return reject
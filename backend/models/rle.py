@@ -0,0 +1,123 @@
+"""
+COCO run-length encoded masks
+SAM returns masks as COCO RLE (output_mode='coco_rle'), which is a few KB per
+mask instead of a full-resolution boolean array. Area, bounding box, IoU and
+union are computed by pycocotools directly on the encoding; decode_window()
+expands only the rectangle that is actually needed.
+
+RLE runs are column-major (Fortran order) and alternate background and
+foreground, starting with background.
+"""
+
+import numpy as np
+from pycocotools import mask as mask_utils
+
+
+def encode(mask):
+    """Compressed COCO RLE of an (H, W) boolean mask"""
+    return mask_utils.encode(np.asfortranarray(mask, dtype=np.uint8))
+
+
+def to_rle(segmentation):
+    """
+    Compressed COCO RLE of a SAM 'segmentation'
+
+    Accepts a boolean mask (output_mode='binary_mask'), an uncompressed RLE
+    dict with a list of counts ('uncompressed_rle') or a compressed one
+    ('coco_rle').
+    """
+    if isinstance(segmentation, np.ndarray):
+        return encode(segmentation)
+    if isinstance(segmentation['counts'], list):
+        height, width = segmentation['size']
+        return mask_utils.frPyObjects(segmentation, height, width)
+    return segmentation
+
+
+def area(rles):
+    """(n,) int64 pixel counts"""
+    return mask_utils.area(rles).astype(np.int64)
+
+
+def bbox(rles):
+    """(n, 4) int64 boxes as x, y, width, height (zeros for empty masks)"""
+    return mask_utils.toBbox(rles).astype(np.int64).reshape(-1, 4)
+
+
+def iou(rles_a, rles_b):
+    """(len(a), len(b)) IoU matrix"""
+    if not len(rles_a) or not len(rles_b):
+        return np.zeros((len(rles_a), len(rles_b)))
+    return np.asarray(mask_utils.iou(rles_a, rles_b, [0] * len(rles_b))).reshape(len(rles_a), len(rles_b))
+
+
+def union(rles):
+    """RLE of the union of several masks"""
+    return mask_utils.merge(rles, intersect=False)
+
+
+def run_lengths(rle):
+    """
+    Run lengths of an RLE as an int64 array
+
+    Decodes the compressed COCO counts string (see rleFrString in pycocotools)
+    with array operations instead of a loop per character.
+    """
+    counts = rle['counts']
+    if isinstance(counts, list):
+        return np.asarray(counts, dtype=np.int64)
+    if isinstance(counts, str):
+        counts = counts.encode('ascii')
+
+    chars = np.frombuffer(counts, dtype=np.uint8).astype(np.int64) - 48
+    if not len(chars):
+        return np.zeros(0, dtype=np.int64)
+
+    # Each value is a little-endian group of 5-bit chunks; bit 0x20 means "more follows"
+    last = (chars & 0x20) == 0
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    group = np.cumsum(np.concatenate(([0], last[:-1].astype(np.int64))))
+    shift = 5 * (np.arange(len(chars)) - starts[group])
+
+    values = np.zeros(len(starts), dtype=np.int64)
+    np.add.at(values, group, (chars & 0x1f) << shift)
+    # Sign bit in the last chunk
+    negative = last & ((chars & 0x10) != 0)
+    values[group[negative]] -= np.int64(1) << (shift[negative] + 5)
+
+    # From the fourth value on, each is stored as a delta to the one two before
+    values[2::2] = np.cumsum(values[2::2])
+    values[1::2] = np.cumsum(values[1::2])
+    return values
+
+
+def decode_window(rle, x0, y0, x1, y1):
+    """
+    Dense boolean mask of the inclusive rectangle x0..x1, y0..y1
+
+    Only the image columns x0..x1 are expanded, so the cost does not grow
+    with the image width.
+
+    Returns:
+        np.ndarray: (y1 - y0 + 1, x1 - x0 + 1) bool
+    """
+    height = rle['size'][0]
+    counts = run_lengths(rle)
+    ends = np.cumsum(counts)
+    begins = ends - counts
+
+    # Foreground runs (odd positions) overlapping the column strip, clipped to it
+    low, high = x0 * height, (x1 + 1) * height
+    begins, ends = begins[1::2], ends[1::2]
+    keep = (begins < high) & (ends > low) & (ends > begins)
+    begins = np.clip(begins[keep], low, high) - low
+    ends = np.clip(ends[keep], low, high) - low
+
+    # Runs are disjoint and sorted: expand as alternating gap/run lengths
+    lengths = np.empty(2 * len(begins) + 1, dtype=np.int64)
+    lengths[0:-1:2] = begins - np.concatenate(([0], ends[:-1]))
+    lengths[1::2] = ends - begins
+    lengths[-1] = (high - low) - (ends[-1] if len(ends) else 0)
+    strip = np.repeat(np.arange(len(lengths)) % 2 == 1, lengths)
+
+    return strip.reshape(x1 - x0 + 1, height).T[y0:y1 + 1]
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination helpers
+Pages are fetched with WHERE (created_at, id) < cursor instead of OFFSET, so
+a deep page costs the same index seek as the first one. Exact totals are
+optional and served from a short-lived in-process cache.
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    """Opaque cursor for the position after (created_at, row_id)"""
+    payload = json.dumps({"c": created_at.isoformat(), "i": row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor
+
+    Returns:
+        tuple: (created_at, row_id)
+
+    Raises:
+        ValueError: Malformed cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), int(payload["i"])
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(query, created_column, id_column, cursor, per_page):
+    """
+    Fetch one page of a query ordered by (created_column desc, id_column desc)
+
+    Args:
+        query: Query already ordered newest first
+        created_column, id_column: Sort key columns
+        cursor (str): Cursor from the previous page, or None/'' for the first page
+        per_page (int): Page size
+
+    Returns:
+        tuple: (rows, has_next)
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+
+    # One extra row tells us whether there is a next page without counting
+    rows = query.limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+class CountCache:
+    """Cache exact counts per key for ttl seconds; invalidate() on writes"""
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._counts = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached and now - cached[1] < self.ttl:
+                return cached[0]
+            generation = self._generation
+
+        count = compute()
+        with self._lock:
+            # Don't store a count that an invalidate() raced with
+            if generation == self._generation:
+                self._counts[key] = (count, now)
+        return count
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._counts.clear()
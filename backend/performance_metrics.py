@@ -3,7 +3,9 @@ Performance Metrics Utilities for Object Counting AI
 Implements F1 Score, Precision, Recall, and other evaluation metrics
 """
 
-def calculate_f1_metrics(predicted_count, corrected_count):
+import numpy as np
+
+def calculate_f1_metrics(predicted_count, corrected_count, include_explanation=True):
     """
     Calculate F1 Score, Precision, and Recall for object counting tasks.
     
@@ -21,6 +23,7 @@ def calculate_f1_metrics(predicted_count, corrected_count):
     Args:
         predicted_count (int): AI model's predicted object count
         corrected_count (int): User's corrected/actual object count
+        include_explanation (bool): Build the explanation string (None otherwise)
         
     Returns:
         dict: {
@@ -64,12 +67,14 @@ def calculate_f1_metrics(predicted_count, corrected_count):
     precision_pct = precision * 100
     recall_pct = recall * 100
     
-    # Generate explanation
-    explanation = generate_performance_explanation(
-        f1_score_pct, precision_pct, recall_pct, 
-        predicted_count, corrected_count,
-        true_positives, false_positives, false_negatives
-    )
+    # Generate explanation (only when a caller will show it)
+    explanation = None
+    if include_explanation:
+        explanation = generate_performance_explanation(
+            f1_score_pct, precision_pct, recall_pct, 
+            predicted_count, corrected_count,
+            true_positives, false_positives, false_negatives
+        )
     
     return {
         'f1_score': f1_score_pct,
@@ -189,7 +194,8 @@ def calculate_overall_f1_stats(results):
     Returns:
         dict: Overall F1 statistics
     """
-    if not results:
+    corrected = [r for r in results if r.get('corrected_count') is not None]
+    if not corrected:
         return {
             'count': 0,
             'avg_f1_score': 0,
@@ -200,42 +206,146 @@ def calculate_overall_f1_stats(results):
             'needs_review_count': 0
         }
     
-    total_f1 = 0
-    total_precision = 0
-    total_recall = 0
-    excellent_count = 0
-    good_count = 0
-    needs_review_count = 0
-    
-    for result in results:
-        if result.get('corrected_count') is not None:
-            metrics = calculate_f1_metrics(
-                result['predicted_count'], 
-                result['corrected_count']
-            )
-            
-            total_f1 += metrics['f1_score']
-            total_precision += metrics['precision']
-            total_recall += metrics['recall']
-            
-            if metrics['f1_score'] >= 90:
-                excellent_count += 1
-            elif metrics['f1_score'] >= 70:
-                good_count += 1
-            else:
-                needs_review_count += 1
-    
-    count = len([r for r in results if r.get('corrected_count') is not None])
+    batch = calculate_batch_metrics(
+        [r['predicted_count'] for r in corrected],
+        [r['corrected_count'] for r in corrected]
+    )
+    f1_scores = batch['items']['f1_score']
+    overall = batch['overall']
     
     return {
-        'count': count,
-        'avg_f1_score': total_f1 / count if count > 0 else 0,
-        'avg_precision': total_precision / count if count > 0 else 0,
-        'avg_recall': total_recall / count if count > 0 else 0,
-        'excellent_count': excellent_count,
-        'good_count': good_count,
-        'needs_review_count': needs_review_count
+        'count': overall['count'],
+        'avg_f1_score': overall['macro_f1_score'],
+        'avg_precision': overall['macro_precision'],
+        'avg_recall': overall['macro_recall'],
+        'excellent_count': int(np.count_nonzero(f1_scores >= 90)),
+        'good_count': int(np.count_nonzero((f1_scores >= 70) & (f1_scores < 90))),
+        'needs_review_count': int(np.count_nonzero(f1_scores < 70))
     }
 
+def _ratio(numerator, denominator, empty_value):
+    """numerator / denominator, with empty_value where the denominator is 0"""
+    out = np.array(empty_value, dtype=np.float64)
+    out = np.broadcast_to(out, np.shape(numerator)).copy()
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
 
+def _f1(precision, recall):
+    """Harmonic mean, 0 where precision + recall is 0"""
+    total = precision + recall
+    return _ratio(2 * precision * recall, total, 0.0)
 
+def _pair_metrics(predicted, corrected):
+    """Per-item TP/FP/FN and precision/recall/F1 (fractions) for count arrays"""
+    true_positives = np.minimum(predicted, corrected)
+    false_positives = np.maximum(0, predicted - corrected)
+    false_negatives = np.maximum(0, corrected - predicted)
+    
+    # Same conventions as calculate_f1_metrics for zero counts
+    precision = _ratio(true_positives, predicted, (corrected == 0).astype(np.float64))
+    recall = _ratio(true_positives, corrected, (predicted == 0).astype(np.float64))
+    return true_positives, false_positives, false_negatives, precision, recall, _f1(precision, recall)
+
+def _aggregate(group_index, group_count, predicted, corrected, tp, fp, fn, precision, recall, f1):
+    """Per-group micro / macro metrics and errors via bincount (no Python loop over rows)"""
+    def group_sum(values):
+        return np.bincount(group_index, weights=values, minlength=group_count)
+    
+    count = np.bincount(group_index, minlength=group_count)
+    safe_count = np.maximum(count, 1)
+    sum_tp, sum_fp, sum_fn = group_sum(tp), group_sum(fp), group_sum(fn)
+    sum_predicted, sum_corrected = group_sum(predicted), group_sum(corrected)
+    error = predicted - corrected
+    
+    micro_precision = _ratio(sum_tp, sum_predicted, (sum_corrected == 0).astype(np.float64))
+    micro_recall = _ratio(sum_tp, sum_corrected, (sum_predicted == 0).astype(np.float64))
+    
+    return {
+        'count': count,
+        'true_positives': sum_tp,
+        'false_positives': sum_fp,
+        'false_negatives': sum_fn,
+        'micro_precision': micro_precision * 100,
+        'micro_recall': micro_recall * 100,
+        'micro_f1_score': _f1(micro_precision, micro_recall) * 100,
+        'macro_precision': group_sum(precision) / safe_count * 100,
+        'macro_recall': group_sum(recall) / safe_count * 100,
+        'macro_f1_score': group_sum(f1) / safe_count * 100,
+        'mae': group_sum(np.abs(error)) / safe_count,
+        'rmse': np.sqrt(group_sum(error * error) / safe_count)
+    }
+
+def _group_row(aggregates, index):
+    """Plain-Python dict for one group of _aggregate output"""
+    row = {}
+    for key, values in aggregates.items():
+        value = values[index]
+        row[key] = int(value) if key in ('count', 'true_positives', 'false_positives', 'false_negatives') else float(value)
+    return row
+
+def calculate_batch_metrics(predicted_counts, corrected_counts, object_types=None,
+                            include_items=True, include_explanations=False):
+    """
+    Vectorized F1 / precision / recall / MAE / RMSE over many results.
+    
+    Uses the same per-item definitions as calculate_f1_metrics, computed with
+    NumPy over whole arrays, so millions of rows take well under a second.
+    Micro metrics pool TP/FP/FN over the rows first; macro metrics average
+    the per-item scores.
+    
+    Args:
+        predicted_counts (array-like): Predicted counts
+        corrected_counts (array-like): Corrected (ground truth) counts
+        object_types (array-like): Optional object type per row, for by_object_type
+        include_items (bool): Return per-item arrays
+        include_explanations (bool): Also build per-item explanation strings (slow)
+        
+    Returns:
+        dict: {
+            'overall': dict of micro/macro metrics, MAE, RMSE and totals,
+            'by_object_type': {type: same dict} (only with object_types),
+            'items': {'f1_score', 'precision', 'recall', 'true_positives',
+                      'false_positives', 'false_negatives', 'abs_error'} arrays
+                     (percentages for scores), plus 'explanation' list if requested
+        }
+    """
+    predicted = np.asarray(predicted_counts, dtype=np.int64)
+    corrected = np.asarray(corrected_counts, dtype=np.int64)
+    if predicted.shape != corrected.shape or predicted.ndim != 1:
+        raise ValueError("predicted_counts and corrected_counts must be 1-D arrays of the same length")
+    
+    tp, fp, fn, precision, recall, f1 = _pair_metrics(predicted, corrected)
+    metric_arrays = (predicted, corrected, tp, fp, fn, precision, recall, f1)
+    
+    overall = _aggregate(np.zeros(len(predicted), dtype=np.int64), 1, *metric_arrays)
+    report = {'overall': _group_row(overall, 0)}
+    
+    if object_types is not None:
+        types = np.asarray(object_types)
+        if types.shape != predicted.shape:
+            raise ValueError("object_types must have one entry per row")
+        names, group_index = np.unique(types, return_inverse=True)
+        grouped = _aggregate(group_index, len(names), *metric_arrays)
+        report['by_object_type'] = {str(name): _group_row(grouped, i) for i, name in enumerate(names)}
+    
+    if include_items or include_explanations:
+        items = {
+            'f1_score': f1 * 100,
+            'precision': precision * 100,
+            'recall': recall * 100,
+            'true_positives': tp,
+            'false_positives': fp,
+            'false_negatives': fn,
+            'abs_error': np.abs(predicted - corrected)
+        }
+        if include_explanations:
+            items['explanation'] = [
+                generate_performance_explanation(*values)
+                for values in zip(
+                    items['f1_score'].tolist(), items['precision'].tolist(), items['recall'].tolist(),
+                    predicted.tolist(), corrected.tolist(), tp.tolist(), fp.tolist(), fn.tolist()
+                )
+            ]
+        report['items'] = items
+    
+    return report
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Re-map stored results to categories without re-running segmentation
+Every result keeps its segments' top-k ResNet classes in output_segments. When
+the candidate labels or the class -> category table change, this script
+recomputes the per-type counts of the whole history from those arrays: each
+batch of results is decoded into one (segments, k) array, mapped through the
+table with a single lookup and counted with one bincount.
+
+Results are processed in output-id-ordered batches with a commit per batch,
+so the script can be interrupted and re-run. Corrections are kept, and the
+accuracy statistics follow the new predicted counts.
+
+Usage:
+    python remap_results.py [--labels person,car,...] [--mapping table.json]
+                            [--method top1|topk] [--batch-size 1000] [--dry-run]
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from app import app
+from models.category_mapping import CANDIDATE_LABELS, ClassCategoryTable, build_zero_shot_table
+from models.database import (
+    db, Output, OutputObjectCount, OutputSegments, SEGMENT_ARRAY_DTYPES,
+    apply_accuracy_changes, get_object_type_ids, list_object_types
+)
+
+REMAP_METHODS = ('top1', 'topk')
+
+
+def load_category_table(labels, mapping_path=None):
+    """
+    Class -> category table to re-map with
+
+    Args:
+        labels (list): Candidate labels
+        mapping_path (str): Optional JSON file with 'labels' and 'categories'
+                            (the CLASS_CATEGORY_CACHE format); overrides labels
+
+    Returns:
+        ClassCategoryTable
+    """
+    if mapping_path:
+        with open(mapping_path, encoding='utf-8') as f:
+            mapping = json.load(f)
+        return ClassCategoryTable(mapping['labels'], mapping['categories'])
+
+    if app.config['PIPELINE_BACKEND'] == 'fake':
+        from models.fake_pipeline import FakeObjectCountingPipeline
+        return FakeObjectCountingPipeline(candidate_labels=labels).class_category_table()
+
+    return build_zero_shot_table(labels, cache_path=app.config['CLASS_CATEGORY_CACHE'])
+
+
+def stack_predictions(rows):
+    """
+    Concatenate the class ids and logits of several OutputSegments rows
+
+    Rows with fewer than the largest top_k are padded with class 0 and a
+    logit of -inf, which carries no weight.
+
+    Returns:
+        tuple: ((N, k) class ids, (N, k) float32 logits, (N,) row index per segment)
+    """
+    top_k = max((row.top_k for row in rows), default=1) or 1
+    total = sum(row.segment_count for row in rows)
+    class_ids = np.zeros((total, top_k), dtype=np.int64)
+    logits = np.full((total, top_k), -np.inf, dtype=np.float32)
+
+    offset = 0
+    for row in rows:
+        n, k = row.segment_count, row.top_k
+        if n:
+            class_ids[offset:offset + n, :k] = np.frombuffer(
+                row.class_ids, dtype=SEGMENT_ARRAY_DTYPES['class_ids']).reshape(n, k)
+            logits[offset:offset + n, :k] = np.frombuffer(
+                row.logits, dtype=SEGMENT_ARRAY_DTYPES['logits']).reshape(n, k)
+        offset += n
+
+    owners = np.repeat(np.arange(len(rows)), [row.segment_count for row in rows])
+    return class_ids, logits, owners
+
+
+def segment_categories(class_ids, logits, table, method='top1'):
+    """
+    Category index of each segment
+
+    'top1' maps the best class, like the pipeline. 'topk' adds up the softmax
+    probability of all k classes per category and takes the largest.
+    """
+    if method == 'top1':
+        return table.map_classes(class_ids[:, 0]).astype(np.int64)
+
+    categories = table.map_classes(class_ids).astype(np.int64)
+    probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+    scores = np.zeros((class_ids.shape[0], len(table.labels)), dtype=np.float32)
+    np.add.at(scores, (np.arange(class_ids.shape[0])[:, None], categories), probabilities)
+    return scores.argmax(axis=1)
+
+
+def category_counts(rows, table, method='top1'):
+    """
+    Per-category counts of a batch of OutputSegments rows
+
+    Returns:
+        tuple: ((rows, categories) counts, (rows, categories) index of the first
+               segment of each category, len(segments) where absent)
+    """
+    class_ids, logits, owners = stack_predictions(rows)
+    num_rows, num_categories = len(rows), len(table.labels)
+    categories = segment_categories(class_ids, logits, table, method)
+
+    cells = owners * num_categories + categories
+    counts = np.bincount(cells, minlength=num_rows * num_categories).reshape(num_rows, num_categories)
+
+    # Ties for the primary type go to the type detected first, as in the pipeline's results
+    first_seen = np.full(num_rows * num_categories, len(cells), dtype=np.int64)
+    np.minimum.at(first_seen, cells, np.arange(len(cells)))
+
+    return counts, first_seen.reshape(num_rows, num_categories)
+
+
+def primary_categories(counts, first_seen):
+    """Most detected category per row (first detected on ties), -1 when nothing was detected"""
+    best = counts.max(axis=1)
+    tie_order = np.where(counts == best[:, None], first_seen, np.iinfo(np.int64).max)
+    return np.where(best > 0, tie_order.argmin(axis=1), -1)
+
+
+def remap_batch(rows, table, method='top1', dry_run=False):
+    """
+    Recompute the counts of one batch of results
+
+    Args:
+        rows (list): OutputSegments rows joined with the output's
+                     object_type_fk, predicted_count and corrected_count
+        table (ClassCategoryTable): Table to map with
+        method (str): 'top1' or 'topk'
+        dry_run (bool): Report only, change nothing
+
+    Returns:
+        dict: Counters for remapped and changed results
+    """
+    labels = table.labels
+    label_type_ids = get_object_type_ids(labels)
+    label_index = {label: index for index, label in enumerate(labels)}
+    type_names = {object_type['id']: object_type['name'] for object_type in list_object_types()}
+    fallback_type_id = list_object_types()[0]['id']
+
+    counts, first_seen = category_counts(rows, table, method)
+    primaries = primary_categories(counts, first_seen)
+
+    output_ids = [row.output_fk for row in rows]
+    existing = {}
+    for count_row in OutputObjectCount.query.filter(OutputObjectCount.output_fk.in_(output_ids)):
+        existing.setdefault(count_row.output_fk, {})[count_row.object_type_fk] = count_row
+
+    output_updates, count_updates, count_inserts, count_deletes, accuracy_changes = [], [], [], [], []
+    stats = {'remapped': len(rows), 'changed': 0}
+
+    for index, row in enumerate(rows):
+        if row.target_object_type_fk is not None:
+            # Single-type result: only the target is counted
+            category = label_index.get(type_names.get(row.target_object_type_fk))
+            new_counts = {row.target_object_type_fk: int(counts[index, category]) if category is not None else 0}
+            predicted_count = new_counts[row.target_object_type_fk]
+            object_type_fk = row.object_type_fk
+        else:
+            new_counts = {
+                label_type_ids[labels[category]]: int(counts[index, category])
+                for category in np.flatnonzero(counts[index]) if labels[category] in label_type_ids
+            }
+            predicted_count = int(counts[index].sum())
+            primary = primaries[index]
+            object_type_fk = label_type_ids.get(labels[primary], fallback_type_id) if primary >= 0 \
+                else fallback_type_id
+
+        old_counts = existing.get(row.output_fk, {})
+        changed = predicted_count != row.predicted_count or object_type_fk != row.object_type_fk
+
+        if changed:
+            output_updates.append({'id': row.output_fk, 'predicted_count': predicted_count,
+                                   'object_type_fk': object_type_fk})
+            if row.corrected_count is not None:
+                accuracy_changes.append((row.object_type_fk, row.predicted_count, row.corrected_count, None))
+                accuracy_changes.append((object_type_fk, predicted_count, None, row.corrected_count))
+
+        for type_id, count_row in old_counts.items():
+            if type_id in new_counts:
+                if count_row.predicted_count != new_counts[type_id]:
+                    count_updates.append({'id': count_row.id, 'predicted_count': new_counts[type_id]})
+                    changed = True
+            elif count_row.corrected_count is not None:
+                # Keep the correction; the type is just no longer predicted
+                if count_row.predicted_count != 0:
+                    count_updates.append({'id': count_row.id, 'predicted_count': 0})
+                    changed = True
+            else:
+                count_deletes.append(count_row.id)
+                changed = True
+        for type_id, count in new_counts.items():
+            if type_id not in old_counts:
+                count_inserts.append({'output_fk': row.output_fk, 'object_type_fk': type_id,
+                                      'predicted_count': count})
+                changed = True
+
+        stats['changed'] += changed
+
+    if not dry_run:
+        if output_updates:
+            db.session.execute(db.update(Output), output_updates)
+        if count_updates:
+            db.session.execute(db.update(OutputObjectCount), count_updates)
+        if count_deletes:
+            db.session.execute(db.delete(OutputObjectCount).where(OutputObjectCount.id.in_(count_deletes)))
+        if count_inserts:
+            db.session.execute(db.insert(OutputObjectCount), count_inserts)
+        apply_accuracy_changes(accuracy_changes)
+
+    return stats
+
+
+def remap_results(table, method='top1', batch_size=1000, dry_run=False):
+    """Re-map every result with stored segments, committing after each batch"""
+    if method not in REMAP_METHODS:
+        raise ValueError(f"Unknown method '{method}'. Choose one of: {', '.join(REMAP_METHODS)}")
+
+    print(f"🔄 Re-mapping stored segments ({method}) onto: {', '.join(table.labels)}")
+    print("=" * 50)
+
+    totals = {'remapped': 0, 'changed': 0, 'without_segments': 0}
+
+    with app.app_context():
+        totals['without_segments'] = Output.query.count() - OutputSegments.query.count()
+        last_output_id = 0
+
+        while True:
+            rows = db.session.execute(
+                db.select(
+                    OutputSegments.output_fk, OutputSegments.target_object_type_fk,
+                    OutputSegments.segment_count, OutputSegments.top_k,
+                    OutputSegments.class_ids, OutputSegments.logits,
+                    Output.object_type_fk, Output.predicted_count, Output.corrected_count
+                )
+                .join(Output, Output.id == OutputSegments.output_fk)
+                .where(OutputSegments.output_fk > last_output_id)
+                .order_by(OutputSegments.output_fk)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            try:
+                stats = remap_batch(rows, table, method=method, dry_run=dry_run)
+                if dry_run:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+            except Exception as e:
+                print(f"❌ Re-mapping failed after output ID {last_output_id}: {e}")
+                db.session.rollback()
+                raise e
+
+            for key, value in stats.items():
+                totals[key] += value
+            last_output_id = rows[-1].output_fk
+            print(f"📦 Batch done (up to output ID {last_output_id})")
+
+    print(f"\n📊 Summary{' (dry run)' if dry_run else ''}:")
+    print(f"   ✅ Re-mapped results: {totals['remapped']}")
+    print(f"   🔁 Results with new counts: {totals['changed']}")
+    print(f"   ℹ️  Results without stored segments: {totals['without_segments']}")
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute stored result counts from their saved segments")
+    parser.add_argument('--labels', default=','.join(CANDIDATE_LABELS),
+                        help="Comma-separated candidate labels")
+    parser.add_argument('--mapping', help="JSON class -> category table (labels and categories)")
+    parser.add_argument('--method', choices=REMAP_METHODS, default='top1',
+                        help="top1 maps the best class; topk sums softmax scores over the top-k classes")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Results per batch and commit")
+    parser.add_argument('--dry-run', action='store_true', help="Report only, change nothing")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        category_table = load_category_table([label.strip() for label in args.labels.split(',') if label.strip()],
+                                             mapping_path=args.mapping)
+        remap_results(category_table, method=args.method, batch_size=args.batch_size, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"❌ Re-mapping failed: {e}")
+        sys.exit(1)
@@ -50,6 +50,9 @@ def reset_object_types():
             
             print(f"\n🎉 Object types successfully updated!")
             print(f"📊 Total: {len(new_object_types)} object types")
+            # The commits bumped the object types version, so running servers reload theirs
+            print(f"💡 Running servers pick up the new types within OBJECT_TYPE_CACHE_CHECK_INTERVAL "
+                  f"({app.config['OBJECT_TYPE_CACHE_CHECK_INTERVAL']}s)")
             
         except Exception as e:
             print(f"❌ Database reset failed: {e}")
@@ -0,0 +1,379 @@
+"""
+Write-behind persistence of prediction results
+In write-behind mode a counting request appends its result to a local
+journal, gets pre-allocated ids back and responds; a background thread
+commits queued results in small batches. Results still in the journal when
+the process stops are replayed on the next start, so every acknowledged
+result reaches the database at least once (and exactly once in effect,
+since replay skips results that are already stored).
+
+Each writer process journals to its own file next to the configured path
+and holds an exclusive lock on it while running; on start, a writer
+replays only journals it can lock, i.e. those of processes that are gone.
+Results that cannot be stored (an id taken by a row this writer did not
+insert, or repeated database errors) are moved to '<journal>.failed.jsonl'
+instead of being retried forever.
+"""
+
+import base64
+import glob
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from sqlalchemy import exc
+
+from models.database import (
+    db, get_object_type_ids, pack_segment_data, SEGMENT_ARRAY_DTYPES,
+    IdAllocator, Input, Output, OutputObjectCount, OutputSegments
+)
+
+
+def lock_journal(journal):
+    """
+    Take an exclusive, non-blocking lock on an open journal file
+
+    The lock belongs to the open file and is released when it is closed,
+    including when its process dies.
+
+    Returns:
+        bool: False if another writer holds it
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            journal.seek(0)
+            msvcrt.locking(journal.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def encode_segment_data(segment_data):
+    """JSON-safe form of a result's segment_data: packed columns, binary ones base64"""
+    columns = pack_segment_data(segment_data)
+    return {
+        'target': segment_data.get('target_object_type'),
+        **{name: base64.b64encode(value).decode('ascii') if isinstance(value, bytes) else value
+           for name, value in columns.items()}
+    }
+
+
+def decode_segment_data(encoded):
+    """OutputSegments column values (plus 'target' type name) from encode_segment_data()"""
+    return {
+        name: base64.b64decode(value) if name in SEGMENT_ARRAY_DTYPES else value
+        for name, value in encoded.items()
+    }
+
+
+class ResultWriteBehind:
+    """Journal prediction results and commit them in batches on a background thread"""
+
+    def __init__(self, app, journal_path, batch_size=50, max_delay=0.2, id_block_size=100,
+                 fsync=False, max_attempts=10, on_commit=None, start=True):
+        """
+        Args:
+            app: Flask app whose database receives the results
+            journal_path (str): Base journal path; this process journals to
+                '<stem>.<pid>-<token><ext>' next to it
+            batch_size (int): Most results per commit
+            max_delay (float): Longest a result waits for its batch to fill, in seconds
+            id_block_size (int): Ids reserved per id_sequences round trip, if
+                the app has no shared allocators (see init_database)
+            fsync (bool): fsync the journal before submit() returns
+            max_attempts (int): Tries per batch before its results are moved
+                to the failed journal
+            on_commit (callable): Called with each processed batch of records
+                (committed or moved to the failed journal)
+            start (bool): Start the background writer
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self.on_commit = on_commit
+        # Shared with the process's other result writers, so their ids never collide
+        allocators = app.extensions.get('result_id_allocators', {})
+        self._input_ids = allocators.get('inputs') or IdAllocator(app, 'inputs', id_block_size)
+        self._output_ids = allocators.get('outputs') or IdAllocator(app, 'outputs', id_block_size)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._unacked = 0
+
+        stem, extension = os.path.splitext(os.path.abspath(journal_path))
+        self._journal_stem, self._journal_extension = stem, extension
+        self.failed_path = f"{stem}.failed{extension}"
+        self.journal_path = f"{stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}{extension}"
+
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        lock_journal(self._journal)
+        self.replay()
+
+        if start:
+            threading.Thread(target=self._run, name='result-writer', daemon=True).start()
+
+    def submit(self, image_path, object_type_name, predicted_count, description=None, object_counts=None,
+               segment_data=None):
+        """
+        Journal a result and queue it for the database
+
+        Returns:
+            dict: The journaled record, including pre-allocated 'output_id'
+                  and 'input_id' and the 'created_at' timestamp
+        """
+        record = {
+            'output_id': self._output_ids.next_id(),
+            'input_id': self._input_ids.next_id(),
+            'created_at': datetime.utcnow().isoformat(),
+            'image_path': image_path,
+            'object_type': object_type_name,
+            'predicted_count': predicted_count,
+            'description': description,
+            'object_counts': object_counts or {},
+            'segments': encode_segment_data(segment_data) if segment_data is not None else None
+        }
+
+        with self._lock:
+            self._append({'result': record})
+            self._unacked += 1
+        self._queue.put(record)
+        return record
+
+    def flush(self):
+        """Block until every submitted result is committed"""
+        self._queue.join()
+
+    def close(self):
+        """Stop journaling and release the journal; unacknowledged results are replayed on a later start"""
+        with self._lock:
+            self._journal.close()
+
+    def journals(self):
+        """Journal files of all writers sharing the base path (including the pre-per-process name)"""
+        pattern = re.compile(re.escape(self._journal_stem) + r'(\.\d+-[0-9a-f]+)?' + re.escape(self._journal_extension))
+        candidates = glob.glob(glob.escape(self._journal_stem) + '*' + glob.escape(self._journal_extension))
+        return sorted(path for path in candidates if pattern.fullmatch(path))
+
+    def replay(self):
+        """
+        Commit results left in the journals of writers that are no longer running
+
+        A journal is only read while holding its lock, so live writers'
+        journals are skipped and concurrently starting writers never replay
+        the same one.
+
+        Returns:
+            int: Number of journaled results that were not acknowledged
+        """
+        replayed = 0
+        for path in self.journals():
+            if path == self.journal_path:
+                continue
+            try:
+                journal = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue  # replayed and removed by another writer meanwhile
+            with journal:
+                if not lock_journal(journal):
+                    continue  # its writer is still running
+                records = self._pending_records(journal)
+                for start in range(0, len(records), self.batch_size):
+                    self._store(records[start:start + self.batch_size])
+                journal.truncate(0)
+                os.remove(path)
+            if records:
+                print(f"♻️  Replayed {len(records)} journaled results from {os.path.basename(path)}")
+            replayed += len(records)
+        return replayed
+
+    @staticmethod
+    def _pending_records(journal):
+        pending = {}
+        journal.seek(0)
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash mid-write
+            if 'result' in entry:
+                pending[entry['result']['output_id']] = entry['result']
+            for output_id in entry.get('ack', []):
+                pending.pop(output_id, None)
+        return list(pending.values())
+
+    def _append(self, entry):
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self._commit_with_retry(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _commit_with_retry(self, batch):
+        self._store(batch)
+
+        with self._lock:
+            self._append({'ack': [record['output_id'] for record in batch]})
+            self._unacked -= len(batch)
+            if self._unacked == 0:
+                # Everything journaled is in the database (or the failed journal); start afresh
+                self._journal.truncate(0)
+
+        if self.on_commit:
+            self.on_commit(batch)
+
+    def _store(self, batch):
+        """
+        Write a batch, retrying with backoff up to max_attempts times
+
+        Records that cannot be stored are moved to the failed journal. On an
+        integrity error the records are retried one by one, so only the
+        offending ones are set aside.
+        """
+        delay = 0.1
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                failed = self._write_batch(batch)
+                if failed:
+                    self._record_failed(failed)
+                return
+            except exc.IntegrityError as e:
+                if len(batch) > 1:
+                    for record in batch:
+                        self._store([record])
+                    return
+                error = e
+                break  # retrying the same insert cannot succeed
+            except Exception as e:
+                error = e
+                if attempt < self.max_attempts:
+                    print(f"⚠️  Warning: Could not commit {len(batch)} results, retrying in {delay:.1f}s: {e}")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+
+        self._record_failed([(record, str(error)) for record in batch])
+
+    def _record_failed(self, failed):
+        """Keep (record, reason) pairs of results that could not be stored in the failed journal"""
+        print(f"❌ Could not store {len(failed)} results ({failed[0][1]}); kept in {self.failed_path}")
+        with open(self.failed_path, 'a', encoding='utf-8') as f:
+            for record, reason in failed:
+                f.write(json.dumps({'result': record, 'error': reason}, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_batch(self, records):
+        """
+        Insert records in one transaction, skipping results already stored
+
+        A stored output with the record's id only counts as this result if it
+        also has the record's input and image; any other row holding one of
+        the record's ids is a conflict.
+
+        Returns:
+            list: (record, reason) pairs of results that were not inserted
+        """
+        with self.app.app_context():
+            try:
+                output_ids = [record['output_id'] for record in records]
+                stored_outputs = {
+                    output_id: (input_fk, image_path) for output_id, input_fk, image_path in
+                    db.session.query(Output.id, Output.input_fk, Input.image_path)
+                    .outerjoin(Input, Input.id == Output.input_fk)
+                    .filter(Output.id.in_(output_ids))
+                }
+                taken_input_ids = {
+                    input_id for input_id, in
+                    db.session.query(Input.id).filter(Input.id.in_([record['input_id'] for record in records]))
+                }
+
+                fresh, failed = [], []
+                for record in records:
+                    stored = stored_outputs.get(record['output_id'])
+                    if stored == (record['input_id'], record['image_path']):
+                        continue  # committed before, e.g. replayed after a crash before the ack
+                    if stored is not None or record['input_id'] in taken_input_ids:
+                        failed.append((record, "id already used by another row"))
+                    else:
+                        fresh.append(record)
+                records = fresh
+                if not records:
+                    return failed
+
+                names = {record['object_type'] for record in records}
+                for record in records:
+                    names.update(record['object_counts'])
+                    if record.get('segments') and record['segments']['target']:
+                        names.add(record['segments']['target'])
+                type_ids = get_object_type_ids(names)
+
+                inputs, outputs, object_counts, segments = [], [], [], []
+                for record in records:
+                    if record['object_type'] not in type_ids:
+                        failed.append((record, f"object type '{record['object_type']}' not found"))
+                        continue
+                    created_at = datetime.fromisoformat(record['created_at'])
+                    inputs.append({
+                        'id': record['input_id'], 'created_at': created_at, 'updated_at': created_at,
+                        'image_path': record['image_path'], 'description': record['description']
+                    })
+                    outputs.append({
+                        'id': record['output_id'], 'created_at': created_at, 'updated_at': created_at,
+                        'predicted_count': record['predicted_count'],
+                        'object_type_fk': type_ids[record['object_type']], 'input_fk': record['input_id']
+                    })
+                    object_counts.extend(
+                        {'output_fk': record['output_id'], 'object_type_fk': type_ids[name], 'predicted_count': count}
+                        for name, count in record['object_counts'].items() if name in type_ids
+                    )
+                    if record.get('segments'):
+                        columns = decode_segment_data(record['segments'])
+                        target = columns.pop('target')
+                        segments.append({
+                            'output_fk': record['output_id'],
+                            'target_object_type_fk': type_ids.get(target) if target else None,
+                            **columns
+                        })
+
+                if outputs:
+                    db.session.execute(db.insert(Input), inputs)
+                    db.session.execute(db.insert(Output), outputs)
+                    if object_counts:
+                        db.session.execute(db.insert(OutputObjectCount), object_counts)
+                    if segments:
+                        db.session.execute(db.insert(OutputSegments), segments)
+                db.session.commit()
+                return failed
+            except Exception:
+                db.session.rollback()
+                raise
@@ -0,0 +1,178 @@
+"""
+Streaming export of the results history (outputs + inputs + object types)
+Rows are read with a server-side cursor in batches of yield_per and written
+out batch by batch, so memory stays flat however long the history is.
+"""
+
+import csv
+import io
+import json
+
+from sqlalchemy import false, select
+
+from models.database import db, get_object_type_by_name, Input, ObjectType, Output
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+EXPORT_COLUMNS = (
+    'result_id', 'input_id', 'created_at', 'updated_at', 'object_type',
+    'predicted_count', 'corrected_count', 'image_path', 'description'
+)
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def export_query(start=None, end=None, object_type=None):
+    """
+    Select export rows in id order
+
+    Args:
+        start (datetime): Keep results created at or after this time
+        end (datetime): Keep results created before this time
+        object_type (str): Keep results whose primary type is this
+
+    Returns:
+        Select: Core select yielding rows named like EXPORT_COLUMNS
+    """
+    query = select(
+        Output.id.label('result_id'),
+        Input.id.label('input_id'),
+        Output.created_at,
+        Output.updated_at,
+        ObjectType.name.label('object_type'),
+        Output.predicted_count,
+        Output.corrected_count,
+        Input.image_path,
+        Input.description
+    ).join(Input, Output.input_fk == Input.id).join(ObjectType, Output.object_type_fk == ObjectType.id)
+
+    if start is not None:
+        query = query.where(Output.created_at >= start)
+    if end is not None:
+        query = query.where(Output.created_at < end)
+    if object_type:
+        cached = get_object_type_by_name(object_type)
+        query = query.where(Output.object_type_fk == cached['id'] if cached else false())
+
+    return query.order_by(Output.id)
+
+
+def iter_batches(query, batch_size=5000):
+    """Yield lists of row mappings, batch_size at a time, from a server-side cursor"""
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.mappings().partitions():
+        yield partition
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def stream_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([
+                _iso(row[column]) if column in ('created_at', 'updated_at') else row[column]
+                for column in EXPORT_COLUMNS
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_jsonl(batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({
+                column: _iso(row[column]) if column in ('created_at', 'updated_at') else row[column]
+                for column in EXPORT_COLUMNS
+            }) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back in chunks (for ParquetWriter)"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(batches):
+    """One Parquet row group per batch"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('result_id', pa.int64()),
+        ('input_id', pa.int64()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+        ('object_type', pa.string()),
+        ('predicted_count', pa.int64()),
+        ('corrected_count', pa.int64()),
+        ('image_path', pa.string()),
+        ('description', pa.string())
+    ])
+
+    def generate():
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for rows in batches:
+                columns = {column: [row[column] for row in rows] for column in EXPORT_COLUMNS}
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def stream_export(export_format, query, batch_size=5000):
+    """
+    Stream query rows in an export format
+
+    Args:
+        export_format (str): One of EXPORT_FORMATS
+        query (Select): From export_query()
+        batch_size (int): Rows per cursor fetch (and per Parquet row group)
+
+    Returns:
+        generator: bytes chunks, one per batch
+    """
+    streams = {'csv': stream_csv, 'jsonl': stream_jsonl, 'parquet': stream_parquet}
+    if export_format not in streams:
+        raise ValueError(f"Unknown export format: {export_format} (use one of {', '.join(EXPORT_FORMATS)})")
+    return streams[export_format](iter_batches(query, batch_size))
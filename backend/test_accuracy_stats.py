@@ -0,0 +1,108 @@
+"""
+Tests for running accuracy stats and /api/stats
+"""
+import json
+
+import pytest
+
+from models.database import Output, db, save_prediction_result
+from performance_metrics import calculate_overall_f1_stats
+
+
+def recomputed(app, object_type_fk=None):
+    """Stats recomputed from scratch, to compare with the running sums"""
+    with app.app_context():
+        query = Output.query
+        if object_type_fk is not None:
+            query = query.filter_by(object_type_fk=object_type_fk)
+        return calculate_overall_f1_stats([
+            {'predicted_count': o.predicted_count, 'corrected_count': o.corrected_count}
+            for o in query.all()
+        ])
+
+
+def assert_matches(served, expected):
+    assert served['count'] == expected['count']
+    for key in ('avg_f1_score', 'avg_precision', 'avg_recall'):
+        assert served[key] == pytest.approx(expected[key])
+    for key in ('excellent_count', 'good_count', 'needs_review_count'):
+        assert served[key] == expected[key]
+
+
+def test_stats_follow_corrections_and_deletes(app, client):
+    with app.app_context():
+        outputs = [save_prediction_result(f"stats_{i}.jpg", 'dog', predicted) for i, predicted in enumerate((4, 0, 10))]
+        ids = [o.id for o in outputs]
+        dog_fk = outputs[0].object_type_fk
+
+    client.put('/api/correct', json={'result_id': ids[0], 'corrected_count': 4})
+    client.put('/api/correct', json={'result_id': ids[1], 'corrected_count': 3})
+    client.put(f'/api/results/{ids[2]}/feedback', json={'corrected_count': 6})
+    # Re-correcting replaces the earlier contribution
+    client.put('/api/correct', json={'result_id': ids[1], 'corrected_count': 0})
+
+    stats = json.loads(client.get('/api/stats').data)
+    assert_matches(stats['overall'], recomputed(app))
+    dog = next(row for row in stats['by_object_type'] if row['object_type'] == 'dog')
+    assert_matches(dog, recomputed(app, dog_fk))
+    assert dog['mae'] > 0 and dog['rmse'] >= dog['mae']
+
+    client.delete(f'/api/results/{ids[2]}')
+    client.delete('/api/results/bulk-delete', json={'result_ids': ids[:2]})
+    stats = json.loads(client.get('/api/stats').data)
+    assert_matches(stats['overall'], recomputed(app))
+
+
+def test_feedback_type_change_moves_the_stats(app, client):
+    with app.app_context():
+        output = save_prediction_result('retype.jpg', 'bird', 5)
+        result_id, bird_fk = output.id, output.object_type_fk
+
+    client.put(f'/api/results/{result_id}/feedback', json={'corrected_count': 3})
+    response = client.put(f'/api/results/{result_id}/feedback', json={'corrected_count': 4, 'object_type': 'road'})
+    assert response.status_code == 200
+
+    with app.app_context():
+        road_fk = db.session.get(Output, result_id).object_type_fk
+    assert road_fk != bird_fk
+
+    stats = json.loads(client.get('/api/stats').data)
+    by_type = {row['object_type']: row for row in stats['by_object_type']}
+    assert_matches(stats['overall'], recomputed(app))
+    assert_matches(by_type['road'], recomputed(app, road_fk))
+    # The result's old share left bird's sums
+    assert by_type.get('bird', {'count': 0})['count'] == recomputed(app, bird_fk)['count']
+    client.delete(f'/api/results/{result_id}')
+
+
+def test_concurrently_created_type_rows_do_not_conflict(tmp_path):
+    from sqlalchemy import create_engine, event
+
+    from models.database import AccuracyStats, get_accuracy_stats, get_object_type_by_name
+    from test_db_concurrency import create_file_app
+
+    app = create_file_app(tmp_path)
+    other_process = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    with app.app_context():
+        cat_fk = get_object_type_by_name('cat')['id']
+
+        def race(conn, cursor, statement, *args):
+            # Another writer creates the row between our read and our insert
+            if statement.startswith('INSERT INTO accuracy_stats') and not raced:
+                raced.append(statement)
+                with other_process.begin() as connection:
+                    connection.execute(AccuracyStats.__table__.insert().values(
+                        object_type_fk=cat_fk, corrected_results=1, f1_sum=100.0, precision_sum=100.0,
+                        recall_sum=100.0, abs_error_sum=0, squared_error_sum=0,
+                        excellent_count=1, good_count=0, needs_review_count=0
+                    ))
+        raced = []
+        event.listen(db.engine, 'before_cursor_execute', race)
+
+        stats = get_accuracy_stats(cat_fk, create=True)
+        db.session.commit()
+        assert raced
+        assert stats.corrected_results == 1
+        assert AccuracyStats.query.filter_by(object_type_fk=cat_fk).count() == 1
+        db.engine.dispose()
+    other_process.dispose()
@@ -0,0 +1,61 @@
+"""
+Tests for vectorized batch evaluation metrics
+"""
+import numpy as np
+import pytest
+
+from performance_metrics import calculate_batch_metrics, calculate_f1_metrics, calculate_overall_f1_stats
+
+
+def test_batch_items_match_scalar_metrics():
+    rng = np.random.default_rng(0)
+    predicted = np.concatenate([[0, 0, 3, 5], rng.integers(0, 20, 500)])
+    corrected = np.concatenate([[0, 4, 0, 5], rng.integers(0, 20, 500)])
+
+    items = calculate_batch_metrics(predicted, corrected)['items']
+    for i, (p, c) in enumerate(zip(predicted.tolist(), corrected.tolist())):
+        scalar = calculate_f1_metrics(p, c, include_explanation=False)
+        assert scalar['explanation'] is None
+        assert items['f1_score'][i] == pytest.approx(scalar['f1_score'])
+        assert items['precision'][i] == pytest.approx(scalar['precision'])
+        assert items['recall'][i] == pytest.approx(scalar['recall'])
+        assert items['false_negatives'][i] == scalar['false_negatives']
+
+
+def test_micro_macro_and_errors():
+    report = calculate_batch_metrics([2, 10], [4, 10])
+    overall = report['overall']
+
+    # macro: mean of per-item F1 (66.7 and 100); micro: pooled TP=12, FP=0, FN=2
+    assert overall['macro_f1_score'] == pytest.approx((200 / 3 + 100) / 2)
+    assert overall['micro_precision'] == pytest.approx(100)
+    assert overall['micro_recall'] == pytest.approx(12 / 14 * 100)
+    assert overall['mae'] == pytest.approx(1.0)
+    assert overall['rmse'] == pytest.approx(np.sqrt(2))
+
+
+def test_grouping_by_object_type_and_explanations():
+    report = calculate_batch_metrics([1, 3, 0], [1, 2, 0], object_types=['car', 'cat', 'car'],
+                                     include_items=False, include_explanations=True)
+    assert set(report['by_object_type']) == {'car', 'cat'}
+    assert report['by_object_type']['car']['count'] == 2
+    assert report['by_object_type']['car']['macro_f1_score'] == pytest.approx(100)
+    assert report['by_object_type']['cat']['false_positives'] == 1
+    assert report['items']['explanation'][1] == calculate_f1_metrics(3, 2)['explanation']
+
+
+def test_overall_stats_use_batch_metrics():
+    stats = calculate_overall_f1_stats([
+        {'predicted_count': 5, 'corrected_count': 5},
+        {'predicted_count': 4, 'corrected_count': 5},
+        {'predicted_count': 1, 'corrected_count': 5},
+        {'predicted_count': 3, 'corrected_count': None},
+    ])
+    assert stats['count'] == 3
+    assert (stats['excellent_count'], stats['good_count'], stats['needs_review_count']) == (1, 1, 1)
+    assert calculate_overall_f1_stats([])['count'] == 0
+
+
+def test_mismatched_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        calculate_batch_metrics([1, 2], [1])
@@ -0,0 +1,52 @@
+"""
+Tests for the offline pipeline benchmark
+"""
+import io
+
+from PIL import Image
+
+from benchmark import build_report, generate_synthetic_images, run_benchmark, summarize_latencies
+
+
+class RecordingPipeline:
+    """Minimal pipeline double that reports fixed stage times"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def count_all_objects(self, image):
+        assert image.ndim == 3
+        self.calls += 1
+        return {
+            'total_segments': 3,
+            'stage_times': {'segment': 0.01, 'classify': 0.02}
+        }
+
+
+def test_synthetic_images_are_deterministic():
+    first = generate_synthetic_images(2, [(64, 48)])
+    second = generate_synthetic_images(2, [(64, 48)])
+    assert first == second
+    assert Image.open(io.BytesIO(first[0][1])).size == (64, 48)
+
+
+def test_summarize_latencies_percentiles():
+    summary = summarize_latencies([0.001 * i for i in range(1, 101)])
+    assert summary['count'] == 100
+    assert summary['p50_ms'] == 50.5
+    assert summary['p99_ms'] >= summary['p95_ms'] >= summary['p50_ms']
+    assert summarize_latencies([])['count'] == 0
+
+
+def test_run_benchmark_collects_stage_metrics():
+    pipeline = RecordingPipeline()
+    images = generate_synthetic_images(2, [(32, 32)])
+
+    run = run_benchmark(pipeline, images, repetitions=3, concurrency=2, warmup=1)
+    report = build_report(run, model_load_time=1.5, peak_rss_bytes=0, settings={})
+
+    assert pipeline.calls == 7  # 1 warmup + 2 images x 3 repetitions
+    assert report['images_processed'] == 6
+    assert report['segments_processed'] == 18
+    assert set(report['latency']['stages']) == {'decode', 'segment', 'classify'}
+    assert report['latency']['stages']['classify']['p50_ms'] == 20.0
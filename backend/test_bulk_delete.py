@@ -0,0 +1,99 @@
+"""
+Tests for set-based bulk delete and background file cleanup
+"""
+import io
+import json
+import os
+import threading
+
+from PIL import Image
+
+from file_cleanup import FileCleanupWorker
+from models.database import Input, Output, db
+
+
+def upload(client, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), color=color).save(buffer, 'JPEG')
+    buffer.seek(0)
+    response = client.post('/api/count-all',
+                           data={'image': (buffer, 'bulk.jpg')},
+                           content_type='multipart/form-data')
+    return json.loads(response.data)
+
+
+def bulk_delete(client, result_ids):
+    return client.delete('/api/results/bulk-delete', json={'result_ids': result_ids})
+
+
+def test_bulk_delete_removes_rows_and_files(app, client):
+    from app import upload_cleanup
+
+    uploads = [upload(client, color) for color in ('red', 'green', 'blue')]
+    ids = [u['result_id'] for u in uploads]
+    paths = [os.path.join(app.config['UPLOAD_FOLDER'], u['image_path'].split('/', 1)[1]) for u in uploads]
+
+    response = bulk_delete(client, ids + [999999])
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data['deleted_result_ids'] == ids
+    assert data['failures'] == [{"id": 999999, "reason": "Result not found"}]
+
+    upload_cleanup.join()
+    assert not any(os.path.exists(path) for path in paths)
+    with app.app_context():
+        assert Output.query.filter(Output.id.in_(ids)).count() == 0
+
+
+def test_bulk_delete_statement_count_is_independent_of_size(app, client):
+    ids = [upload(client, (index, 0, 0))['result_id'] for index in range(12)]
+    statements = []
+    request_thread = threading.get_ident()
+
+    # Only count the request's statements, not the cleanup worker's
+    def record(conn, cursor, statement, *args):
+        if threading.get_ident() == request_thread:
+            statements.append(statement.split()[0].upper())
+
+    with app.app_context():
+        db.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            assert bulk_delete(client, ids).status_code == 200
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record)
+
+    # Resolve the rows, then check which files are still referenced
+    assert statements.count('SELECT') == 2
+    assert statements.count('DELETE') == 4
+
+
+def test_shared_input_survives_partial_delete(app, client):
+    keep = upload(client, 'yellow')['result_id']
+    with app.app_context():
+        shared = db.session.get(Output, keep)
+        extra = Output(predicted_count=1, object_type_fk=shared.object_type_fk, input_fk=shared.input_fk)
+        db.session.add(extra)
+        db.session.commit()
+        extra_id, input_id = extra.id, shared.input_fk
+
+    bulk_delete(client, [extra_id])
+    with app.app_context():
+        assert db.session.get(Input, input_id) is not None
+
+
+def test_cleanup_worker_retries_then_gives_up():
+    attempts = []
+
+    def flaky(item):
+        attempts.append(item)
+        if item == 'broken' or len(attempts) < 2:
+            raise OSError("busy")
+
+    worker = FileCleanupWorker(flaky, max_attempts=3, retry_delay=0)
+    worker.enqueue(['eventually-ok'])
+    worker.join()
+    assert attempts == ['eventually-ok', 'eventually-ok']
+
+    worker.enqueue(['broken'])
+    worker.join()
+    assert worker.failed == ['broken']
@@ -0,0 +1,144 @@
+"""
+Tests for content-addressed upload storage
+"""
+import hashlib
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from upload_io import UploadWriter, content_address
+
+
+def jpeg_bytes(color='orange'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color=color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def upload(client, data, name='shared.jpg'):
+    response = client.post('/api/count-all',
+                           data={'image': (io.BytesIO(data), name)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def test_content_address_is_sharded_sha256():
+    digest = hashlib.sha256(b'bytes').hexdigest()
+    assert content_address(b'bytes', 'Photo.JPG') == f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    assert content_address(b'bytes', 'other.jpg') == content_address(b'bytes', 'Photo.jpg')
+
+
+def test_store_deduplicates_identical_bytes(tmp_path):
+    writer = UploadWriter(max_workers=1)
+    folder = str(tmp_path)
+
+    first = writer.store(folder, b'same', 'a.png').result()
+    path = os.path.join(folder, first)
+    mtime = os.path.getmtime(path)
+
+    assert writer.store(folder, b'same', 'b.png').result() == first
+    assert os.path.getmtime(path) == mtime
+    assert writer.store(folder, b'different', 'a.png').result() != first
+
+    flat = writer.store(folder, b'same', 'a.png', layout='flat').result()
+    assert '/' not in flat and flat.endswith('_a.png')
+    writer.shutdown()
+
+
+def test_identical_uploads_share_one_file_until_last_delete(app, client):
+    from app import upload_cleanup
+
+    data = jpeg_bytes()
+    first = upload(client, data)
+    second = upload(client, data, name='copy.jpg')
+
+    assert first['image_path'] == second['image_path']
+    stored = os.path.join(app.config['UPLOAD_FOLDER'], first['image_path'].split('/', 1)[1])
+    assert client.get('/' + first['image_path']).data == data
+
+    client.delete(f"/api/results/{first['result_id']}")
+    upload_cleanup.join()
+    assert os.path.exists(stored)
+
+    client.delete(f"/api/results/{second['result_id']}")
+    upload_cleanup.join()
+    assert not os.path.exists(stored)
+
+
+def test_migration_moves_flat_uploads(app):
+    from migrate_to_content_storage import migrate_to_content_storage
+    from models.database import Input, save_prediction_result
+
+    data = jpeg_bytes(color='navy')
+    folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'legacy_photo.jpg'), 'wb') as f:
+        f.write(data)
+
+    with app.app_context():
+        input_id = save_prediction_result('legacy_photo.jpg', 'car', 1).input_fk
+
+    migrate_to_content_storage(batch_size=2)
+
+    expected = content_address(data, 'legacy_photo.jpg')
+    with app.app_context():
+        assert Input.query.get(input_id).image_path == expected
+    assert not os.path.exists(os.path.join(folder, 'legacy_photo.jpg'))
+    with open(os.path.join(folder, expected), 'rb') as f:
+        assert f.read() == data
+
+
+def test_migration_keeps_old_files_until_commit(app, monkeypatch):
+    from migrate_to_content_storage import migrate_to_content_storage
+    from models.database import db, Input, save_prediction_result
+
+    data = jpeg_bytes(color='teal')
+    folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    old_file = os.path.join(folder, 'legacy_interrupted.jpg')
+    with open(old_file, 'wb') as f:
+        f.write(data)
+    with app.app_context():
+        input_id = save_prediction_result('legacy_interrupted.jpg', 'car', 1).input_fk
+
+    def failing_commit():
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(db.session, 'commit', failing_commit)
+    with pytest.raises(RuntimeError):
+        migrate_to_content_storage(batch_size=500)
+    monkeypatch.undo()
+
+    # Nothing was committed, so the old file must still be there for the re-run
+    assert os.path.exists(old_file)
+    totals = migrate_to_content_storage(batch_size=500)
+    assert totals['missing'] == 0
+    with app.app_context():
+        assert db.session.get(Input, input_id).image_path == content_address(data, 'legacy_interrupted.jpg')
+    assert not os.path.exists(old_file)
+
+
+def test_migration_keeps_shared_old_file_for_later_batches(app):
+    from migrate_to_content_storage import migrate_to_content_storage
+    from models.database import db, Input, save_prediction_result
+
+    data = jpeg_bytes(color='olive')
+    folder = app.config['UPLOAD_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    old_file = os.path.join(folder, 'legacy_shared.jpg')
+    with open(old_file, 'wb') as f:
+        f.write(data)
+    with app.app_context():
+        input_ids = [save_prediction_result('legacy_shared.jpg', 'car', 1).input_fk for _ in range(2)]
+
+    migrate_to_content_storage(batch_size=1)
+
+    expected = content_address(data, 'legacy_shared.jpg')
+    with app.app_context():
+        assert [db.session.get(Input, input_id).image_path for input_id in input_ids] == [expected] * 2
+    assert not os.path.exists(old_file)
+    with open(os.path.join(folder, expected), 'rb') as f:
+        assert f.read() == data
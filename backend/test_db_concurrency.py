@@ -0,0 +1,74 @@
+"""
+Concurrency stress test for the SQLite engine configuration
+"""
+import threading
+
+from flask import Flask
+
+from config import TestingConfig
+from models.database import Output, db, init_database, save_prediction_result
+
+WRITERS = 8
+WRITES_PER_THREAD = 25
+READERS = 4
+
+
+def create_file_app(tmp_path, **overrides):
+    app = Flask('stress')
+    app.config.from_object(TestingConfig)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'stress.db'}"
+    app.config.update(overrides)
+    init_database(app)
+    return app
+
+
+def test_sqlite_connections_use_configured_pragmas(tmp_path):
+    app = create_file_app(tmp_path, SQLITE_BUSY_TIMEOUT_MS=1234)
+    with app.app_context():
+        pragma = lambda name: db.session.execute(db.text(f"PRAGMA {name}")).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 1234
+        db.engine.dispose()
+
+
+def test_concurrent_writers_and_readers_do_not_lock(tmp_path):
+    app = create_file_app(tmp_path)
+    errors = []
+    writers_done = threading.Event()
+
+    def write(thread_index):
+        with app.app_context():
+            try:
+                for i in range(WRITES_PER_THREAD):
+                    save_prediction_result(f"stress_{thread_index}_{i}.jpg", 'car', i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    def read():
+        with app.app_context():
+            try:
+                while not writers_done.is_set():
+                    Output.query.order_by(Output.created_at.desc()).limit(10).all()
+                    db.session.rollback()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    readers = [threading.Thread(target=read) for _ in range(READERS)]
+    writers = [threading.Thread(target=write, args=(i,)) for i in range(WRITERS)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        assert Output.query.count() == WRITERS * WRITES_PER_THREAD
+        db.engine.dispose()
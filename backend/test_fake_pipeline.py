@@ -0,0 +1,90 @@
+"""
+Tests for the model-free pipeline backend
+"""
+import io
+import json
+
+import pytest
+
+from models.backends import create_pipeline, segment_filter_settings
+from models.fake_pipeline import FakeObjectCountingPipeline
+
+
+def test_fake_pipeline_is_deterministic(sample_image):
+    data = sample_image.getvalue()
+    pipeline = FakeObjectCountingPipeline()
+
+    first = pipeline.count_all_objects(io.BytesIO(data))
+    second = pipeline.count_all_objects(io.BytesIO(data))
+
+    assert first['objects'] == second['objects']
+    assert first['total_objects'] == sum(o['count'] for o in first['objects'])
+    assert first['total_segments'] == len(first['all_detected_objects'])
+
+
+def test_fake_pipeline_reports_the_real_pipeline_stages(sample_image):
+    result = FakeObjectCountingPipeline().count_all_objects(sample_image)
+
+    assert set(result['stage_times']) == {
+        'load_image', 'segment', 'mask_nms', 'prefilter', 'classify', 'map_categories'
+    }
+
+
+def test_fake_pipeline_count_matches_count_all(sample_image):
+    pipeline = FakeObjectCountingPipeline()
+    data = sample_image.getvalue()
+    all_result = pipeline.count_all_objects(io.BytesIO(data))
+
+    for label in pipeline.candidate_labels:
+        result = pipeline.count_objects(io.BytesIO(data), label)
+        assert result['count'] == all_result['all_detected_objects'].count(label)
+
+
+def test_fake_pipeline_exits_early_for_unreachable_targets(sample_image):
+    pipeline = FakeObjectCountingPipeline()
+
+    result = pipeline.count_objects(sample_image, 'hardware')
+    assert result['count'] == 0 and result['early_exit'] is True
+    assert result['segment_data'] is None
+    assert pipeline.count_objects(sample_image, 'car')['early_exit'] is False
+
+
+def test_count_endpoint_reports_early_exit(client, sample_image):
+    response = client.post('/api/count',
+                           data={'image': (sample_image, 'test.png'), 'object_type': 'hardware'},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    assert data['predicted_count'] == 0 and data['early_exit'] is True
+
+
+def test_create_pipeline_rejects_unknown_backend():
+    assert isinstance(create_pipeline({'PIPELINE_BACKEND': 'fake'}), FakeObjectCountingPipeline)
+    with pytest.raises(ValueError):
+        create_pipeline({'PIPELINE_BACKEND': 'nope'})
+
+
+def test_segment_filter_settings():
+    assert segment_filter_settings({}) is None
+    assert segment_filter_settings({'SEGMENT_FILTER': 'off'}) is None
+    settings = segment_filter_settings({'SEGMENT_FILTER': 'background', 'SEGMENT_FILTER_MAX_BORDER_EDGES': 3})
+    assert settings['mode'] == 'background' and settings['max_border_edges'] == 3
+    with pytest.raises(ValueError):
+        segment_filter_settings({'SEGMENT_FILTER': 'sometimes'})
+
+
+def test_count_all_endpoint_with_fake_backend(client, sample_image):
+    response = client.post('/api/count-all',
+                           data={'image': (sample_image, 'test.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    assert data['success'] is True
+    assert data['total_objects'] == sum(o['count'] for o in data['objects'])
+    assert data['stage_metrics']['mask_stats']['generated'] == data['total_segments']
+    assert data['skipped_segments'] == 0
+
+    listing = json.loads(client.get('/api/results').data)
+    assert data['result_id'] in [r['id'] for r in listing['results']]
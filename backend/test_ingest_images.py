@@ -0,0 +1,114 @@
+"""
+Tests for the bulk ingest CLI
+"""
+import os
+
+import pytest
+from PIL import Image
+
+import app as app_module
+from ingest_images import ingest_directory, load_checkpoint
+from models.database import Input, Output, db
+
+
+def make_archive(root, count=7):
+    for i in range(count):
+        folder = root / ('nested' if i % 2 else '')
+        folder.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (40 + i, 30), color=(i * 30, 80, 160)).save(folder / f"img_{i}.jpg")
+    (root / 'broken.jpg').write_bytes(b'not an image')
+    (root / 'notes.txt').write_text('ignored')
+
+
+def stored_paths(app):
+    with app.app_context():
+        return sorted(i.image_path for i in Input.query.join(Output, Output.input_fk == Input.id))
+
+
+def test_ingest_stores_every_image_once(app, tmp_path):
+    make_archive(tmp_path / 'archive')
+    checkpoint = str(tmp_path / 'checkpoint.txt')
+    before = len(stored_paths(app))
+
+    stats = ingest_directory(str(tmp_path / 'archive'), batch_size=3, commit_every=4,
+                             decode_workers=2, checkpoint_path=checkpoint)
+    assert (stats['ingested'], stats['failed']) == (7, 1)
+    assert len(stored_paths(app)) == before + 7
+    assert 'nested/img_1.jpg' in load_checkpoint(checkpoint)
+
+    # Everything is checkpointed: a rerun adds nothing
+    assert ingest_directory(str(tmp_path / 'archive'), checkpoint_path=checkpoint)['ingested'] == 0
+    assert len(stored_paths(app)) == before + 7
+
+
+def test_interrupted_ingest_resumes(app, tmp_path, monkeypatch):
+    make_archive(tmp_path / 'archive')
+    checkpoint = str(tmp_path / 'checkpoint.txt')
+    before = len(stored_paths(app))
+
+    real_batch = app_module.pipeline.count_all_objects_batch
+    calls = []
+
+    def failing_batch(images):
+        calls.append(len(images))
+        if len(calls) == 3:
+            raise RuntimeError('GPU fell over')
+        return real_batch(images)
+
+    monkeypatch.setattr(app_module.pipeline, 'count_all_objects_batch', failing_batch)
+    with pytest.raises(RuntimeError):
+        ingest_directory(str(tmp_path / 'archive'), batch_size=2, commit_every=2, checkpoint_path=checkpoint)
+    # broken.jpg, img_0 | img_2, img_4 -> commit | img_6 fails
+    assert len(load_checkpoint(checkpoint)) == 3
+    assert len(stored_paths(app)) == before + 3
+
+    monkeypatch.setattr(app_module.pipeline, 'count_all_objects_batch', real_batch)
+    stats = ingest_directory(str(tmp_path / 'archive'), batch_size=2, commit_every=2, checkpoint_path=checkpoint)
+    assert (stats['ingested'], stats['already_done']) == (4, 3)
+    assert len(stored_paths(app)) == before + 7
+
+
+def test_ingest_that_died_after_a_commit_does_not_duplicate_it(app, tmp_path, monkeypatch):
+    make_archive(tmp_path / 'archive')
+    checkpoint = str(tmp_path / 'checkpoint.txt')
+    before = len(stored_paths(app))
+
+    real_commit = db.session.commit
+    commits = []
+
+    def dying_commit():
+        real_commit()
+        commits.append(1)
+        if len(commits) == 2:
+            raise KeyboardInterrupt  # killed before the checkpoint write
+
+    monkeypatch.setattr(db.session, 'commit', dying_commit)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_directory(str(tmp_path / 'archive'), batch_size=2, commit_every=2, checkpoint_path=checkpoint)
+    # img_0, img_2, img_4 checkpointed | img_6, nested/img_1 committed but not checkpointed
+    assert len(load_checkpoint(checkpoint)) == 3
+    assert len(stored_paths(app)) == before + 5
+
+    monkeypatch.setattr(db.session, 'commit', real_commit)
+    stats = ingest_directory(str(tmp_path / 'archive'), batch_size=2, commit_every=2, checkpoint_path=checkpoint)
+    assert (stats['ingested'], stats['already_done']) == (2, 5)
+    assert len(stored_paths(app)) == before + 7
+
+
+def test_rolled_back_ingest_removes_its_stored_uploads(app, tmp_path, monkeypatch):
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    # Colours no other test stores, so nothing else references these files
+    for i in range(3):
+        Image.new('RGB', (33, 21), color=(7, 200 + i, 13)).save(archive / f"fresh_{i}.jpg")
+
+    def failing_batch(images):
+        raise RuntimeError('GPU fell over')
+
+    monkeypatch.setattr(app_module.pipeline, 'count_all_objects_batch', failing_batch)
+    with pytest.raises(RuntimeError):
+        ingest_directory(str(archive), batch_size=3, checkpoint_path=str(tmp_path / 'checkpoint.txt'))
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    assert [files for _, _, files in os.walk(upload_folder) if files] == []
+    assert not [path for path in app_module.upload_writer._claims if path.startswith(upload_folder)]
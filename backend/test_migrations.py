@@ -0,0 +1,96 @@
+"""
+Tests for versioned schema migrations and the indexes they create
+"""
+from flask import Flask
+from sqlalchemy import create_engine, inspect
+
+from models import migrations
+from models.database import db
+from models.migrations import MIGRATIONS, get_schema_version, initial_schema, run_migrations
+from test_db_concurrency import create_file_app
+
+# Schema as created by db.create_all() before migrations existed
+LEGACY_SCHEMA = [
+    "CREATE TABLE object_types (id INTEGER PRIMARY KEY, created_at DATETIME, updated_at DATETIME, "
+    "name VARCHAR(255) NOT NULL UNIQUE, description TEXT)",
+    "CREATE TABLE inputs (id INTEGER PRIMARY KEY, created_at DATETIME, updated_at DATETIME, "
+    "image_path VARCHAR(500) NOT NULL, description TEXT)",
+    "CREATE TABLE outputs (id INTEGER PRIMARY KEY, created_at DATETIME, updated_at DATETIME, "
+    "predicted_count INTEGER NOT NULL, corrected_count INTEGER, "
+    "object_type_fk INTEGER NOT NULL REFERENCES object_types (id), "
+    "input_fk INTEGER NOT NULL REFERENCES inputs (id))",
+]
+
+
+def query_plan(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_app_database_is_at_latest_version(app):
+    with app.app_context():
+        assert get_schema_version() == MIGRATIONS[-1][0]
+        assert run_migrations() == []
+
+        output_indexes = {index['name'] for index in inspect(db.engine).get_indexes('outputs')}
+        assert {'ix_outputs_created_at', 'ix_outputs_object_type_fk', 'ix_outputs_input_fk',
+                'ix_outputs_object_type_created_at'} <= output_indexes
+
+
+def test_migrations_upgrade_unversioned_database(tmp_path):
+    legacy = Flask('legacy')
+    legacy.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'legacy.db'}"
+    db.init_app(legacy)
+
+    with legacy.app_context():
+        with db.engine.begin() as connection:
+            for statement in LEGACY_SCHEMA:
+                connection.execute(db.text(statement))
+
+        assert get_schema_version() == 0
+        assert run_migrations() == [version for version, _, _ in MIGRATIONS]
+        assert 'ix_inputs_image_path' in {index['name'] for index in inspect(db.engine).get_indexes('inputs')}
+        assert run_migrations() == []
+        db.engine.dispose()
+
+
+def test_initial_schema_is_frozen(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.begin() as connection:
+        initial_schema(connection)
+    inspector = inspect(engine)
+    # Later tables and indexes come from their own migrations, not from the live models
+    assert set(inspector.get_table_names()) == {'object_types', 'inputs', 'outputs'}
+    assert inspector.get_indexes('outputs') == []
+    engine.dispose()
+
+
+def test_migrations_applied_by_another_worker_are_skipped(tmp_path, monkeypatch):
+    app = create_file_app(tmp_path)
+    ran = []
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [
+        (version, description, lambda connection, version=version: ran.append(version))
+        for version, description, _ in MIGRATIONS
+    ])
+    # As if another worker applied everything after this one read the version
+    monkeypatch.setattr(migrations, 'get_schema_version', lambda: 0)
+
+    with app.app_context():
+        assert run_migrations() == []
+        assert ran == []
+        assert db.session.query(migrations.SchemaVersion).count() == len(MIGRATIONS)
+        db.engine.dispose()
+
+
+def test_result_listing_uses_indexes(app):
+    from app import results_query
+
+    with app.app_context():
+        plan = query_plan(results_query().limit(10))
+        assert 'ix_outputs_created_at' in plan
+        assert 'TEMP B-TREE' not in plan
+
+        filtered_plan = query_plan(results_query('car').limit(10))
+        assert 'ix_outputs_object_type_created_at' in filtered_plan
+        assert 'TEMP B-TREE' not in filtered_plan
@@ -0,0 +1,98 @@
+"""
+Tests for per-object-type result counts
+"""
+import io
+import json
+
+from PIL import Image
+
+from models.category_mapping import CANDIDATE_LABELS
+from models.database import (
+    ObjectType, OutputObjectCount, db, get_object_count_totals, save_prediction_result
+)
+from test_db_concurrency import create_file_app
+
+
+def count_all(client, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (48, 48), color=color).save(buffer, 'JPEG')
+    buffer.seek(0)
+    response = client.post('/api/count-all',
+                           data={'image': (buffer, 'multi.jpg')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def known_counts(app, objects):
+    with app.app_context():
+        known = {object_type.name for object_type in ObjectType.query.all()}
+    return {obj['type']: obj['count'] for obj in objects if obj['type'] in known}
+
+
+def test_count_all_stores_every_detected_type(app, client):
+    data = count_all(client, 'teal')
+    expected = {obj['type']: obj['count'] for obj in data['objects']}
+    assert known_counts(app, data['objects']) == expected
+    assert sum(expected.values()) == data['total_objects']
+
+    detail = json.loads(client.get(f"/api/results/{data['result_id']}").data)['result']
+    assert {c['object_type']: c['predicted_count'] for c in detail['object_counts']} == expected
+
+    listing = json.loads(client.get('/api/results?per_page=1000').data)['results']
+    listed = next(r for r in listing if r['id'] == data['result_id'])
+    assert listed['object_counts'] == detail['object_counts']
+
+
+def test_contains_filter_and_sql_totals(app, client):
+    results = [count_all(client, color) for color in ('maroon', 'olive', 'silver', 'lime')]
+    per_result = [known_counts(app, r['objects']) for r in results]
+    object_type = next(name for counts in per_result for name in counts)
+
+    listing = json.loads(client.get(f'/api/results?per_page=1000&contains={object_type}').data)['results']
+    listed_ids = {r['id'] for r in listing}
+    for result, counts in zip(results, per_result):
+        assert (result['result_id'] in listed_ids) == (counts.get(object_type, 0) > 0)
+
+    with app.app_context():
+        totals = {row['object_type']: row for row in get_object_count_totals()}
+    assert totals[object_type]['predicted_total'] >= sum(c.get(object_type, 0) for c in per_result)
+    assert json.loads(client.get('/api/object-counts').data)['object_counts']
+
+
+def test_feedback_corrects_per_type_counts(app, client):
+    # The fake pipeline's labels depend on the image bytes; use one with a known type
+    data = next(r for r in (count_all(client, color) for color in ('navy', 'gold', 'pink', 'gray'))
+                if known_counts(app, r['objects']))
+    object_type = next(iter(known_counts(app, data['objects'])))
+
+    response = client.put(f"/api/results/{data['result_id']}/feedback",
+                          json={'corrected_count': 1, 'object_counts': {object_type: 7}})
+    assert response.status_code == 200
+    corrected = {c['object_type']: c['corrected_count'] for c in json.loads(response.data)['object_counts']}
+    assert corrected[object_type] == 7
+
+    response = client.put(f"/api/results/{data['result_id']}/feedback",
+                          json={'corrected_count': 1, 'object_counts': {'hardware-not-detected': 1}})
+    assert response.status_code == 400
+
+
+def test_every_candidate_label_has_an_object_type(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        counts = {label: index + 1 for index, label in enumerate(CANDIDATE_LABELS)}
+        output = save_prediction_result('all.jpg', 'car', sum(counts.values()), object_counts=counts)
+        stored = OutputObjectCount.query.filter_by(output_fk=output.id).all()
+        assert len(stored) == len(CANDIDATE_LABELS)
+        assert sum(row.predicted_count for row in stored) == sum(counts.values())
+
+        # A database seeded before a label existed gets it on the next start
+        with db.engine.begin() as connection:
+            connection.execute(db.text("DELETE FROM object_types WHERE name = 'bird'"))
+        db.engine.dispose()
+
+    restarted = create_file_app(tmp_path)
+    with restarted.app_context():
+        assert ObjectType.query.filter_by(name='bird').count() == 1
+        assert ObjectType.query.filter_by(name='hardware').count() == 1
+        db.engine.dispose()
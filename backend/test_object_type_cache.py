@@ -0,0 +1,107 @@
+"""
+Tests for the process-local object type cache
+"""
+from sqlalchemy import event
+
+from models.database import ObjectType, db, get_object_type_by_name, get_object_type_ids, list_object_types
+from test_db_concurrency import create_file_app
+
+
+def count_selects(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'object_types' in statement and statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def test_lookups_are_served_from_memory(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        selects = count_selects(db.engine)
+        car = get_object_type_by_name('car')
+        assert get_object_type_ids(['car', 'dog', 'unicorn']) == {'car': car['id'], 'dog': get_object_type_by_name('dog')['id']}
+        assert [t['name'] for t in list_object_types()][0] == 'car'
+        assert get_object_type_by_name('unicorn') is None
+        assert selects == []
+        db.engine.dispose()
+
+
+def test_commits_and_bulk_deletes_invalidate(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        db.session.add(ObjectType(name='boat', description='Boats'))
+        db.session.rollback()
+        assert get_object_type_by_name('boat') is None
+
+        db.session.add(ObjectType(name='boat', description='Boats'))
+        db.session.commit()
+        assert get_object_type_by_name('boat')['description'] == 'Boats'
+
+        # As in reset_object_types.py
+        ObjectType.query.filter_by(name='boat').delete()
+        db.session.commit()
+        assert get_object_type_by_name('boat') is None
+        db.engine.dispose()
+
+
+def test_changes_from_other_processes_are_picked_up(tmp_path):
+    server = create_file_app(tmp_path)
+    script = create_file_app(tmp_path)  # e.g. reset_object_types.py, same database
+    with server.app_context():
+        cache = server.extensions['object_type_cache']
+        cache.check_interval = 3600
+        assert get_object_type_by_name('car')['description'] != 'Cars'
+
+    with script.app_context():
+        db.session.add(ObjectType(name='kite', description='Kites'))
+        ObjectType.query.filter_by(name='car').update({'description': 'Cars'})
+        db.session.commit()
+
+    with server.app_context():
+        # An unknown name checks the version right away
+        assert get_object_type_by_name('kite')['description'] == 'Kites'
+        assert get_object_type_by_name('car')['description'] == 'Cars'
+
+    with script.app_context():
+        ObjectType.query.filter_by(name='kite').delete()
+        db.session.commit()
+
+    with server.app_context():
+        assert get_object_type_by_name('kite') is not None  # not checked yet
+        cache.check_interval = 0
+        assert get_object_type_by_name('kite') is None
+        db.engine.dispose()
+    with script.app_context():
+        db.engine.dispose()
+
+
+def test_unknown_names_check_the_version_once(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        app.extensions['object_type_cache'].check_interval = 3600
+        checks = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: checks.append(statement) if 'cache_versions' in statement else None)
+
+        for _ in range(3):
+            assert get_object_type_ids(['car', 'background']) == {'car': get_object_type_by_name('car')['id']}
+        assert len(checks) == 1
+
+        # Adding the type drops the remembered miss along with the cache
+        db.session.add(ObjectType(name='background', description='Skipped segments'))
+        db.session.commit()
+        assert get_object_type_by_name('background') is not None
+        db.engine.dispose()
+
+
+def test_unchanged_version_does_not_reload(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        app.extensions['object_type_cache'].check_interval = 0
+        selects = count_selects(db.engine)
+        assert get_object_type_by_name('car') is not None
+        assert selects == []
+        db.engine.dispose()
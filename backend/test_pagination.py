@@ -0,0 +1,102 @@
+"""
+Tests for keyset (cursor) pagination of /api/results
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from models.database import db, save_prediction_result
+from pagination import CountCache, decode_cursor, encode_cursor
+
+
+def add_results(app, count, created_at):
+    with app.app_context():
+        for index in range(count):
+            output = save_prediction_result(f"page_{index}.jpg", 'tree', index)
+            output.created_at = created_at
+        db.session.commit()
+
+
+def walk(client, per_page, **params):
+    ids, cursor = [], ''
+    while cursor is not None:
+        response = client.get('/api/results', query_string={'cursor': cursor, 'per_page': per_page, **params})
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        ids.extend(result['id'] for result in data['results'])
+        cursor = data['pagination']['next_cursor']
+    return ids
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_cursor_pages_match_offset_order_with_timestamp_ties(app, client):
+    # Identical timestamps force the id tie-breaker across page boundaries
+    add_results(app, 5, datetime(2023, 1, 1))
+    add_results(app, 3, datetime(2023, 6, 1))
+
+    expected = [r['id'] for r in json.loads(client.get('/api/results?per_page=1000').data)['results']]
+    assert walk(client, per_page=3) == expected
+    assert walk(client, per_page=2, object_type='tree') == [
+        r['id'] for r in json.loads(client.get('/api/results?per_page=1000&object_type=tree').data)['results']
+    ]
+
+
+def test_total_is_optional_and_invalidated_on_insert(app, client):
+    first = json.loads(client.get('/api/results?cursor=').data)['pagination']
+    assert 'total' not in first
+
+    total = json.loads(client.get('/api/results?cursor=&include_total=true').data)['pagination']['total']
+    add_results(app, 1, datetime(2023, 2, 1))
+    assert json.loads(client.get('/api/results?cursor=&include_total=true').data)['pagination']['total'] == total + 1
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get('/api/results?cursor=garbage').status_code == 400
+
+
+def test_count_cache_reuses_within_ttl():
+    cache = CountCache(ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get('all', compute) == 1
+    assert cache.get('all', compute) == 1
+    cache.invalidate()
+    assert cache.get('all', compute) == 2
+
+
+def test_count_cache_drops_count_computed_across_invalidate():
+    cache = CountCache(ttl=60)
+
+    def stale_compute():
+        # A write lands while the old total is being counted
+        cache.invalidate()
+        return 1
+
+    assert cache.get('all', stale_compute) == 1
+    assert cache.get('all', lambda: 2) == 2
+
+
+def test_deep_page_is_an_index_seek(app):
+    from sqlalchemy import and_, or_
+
+    from app import Output, results_query
+
+    created_at = datetime(2023, 3, 1)
+    with app.app_context():
+        query = results_query().filter(or_(
+            Output.created_at < created_at,
+            and_(Output.created_at == created_at, Output.id < 10)
+        )).limit(6)
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = ' | '.join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")))
+
+    assert 'SEARCH outputs USING INDEX ix_outputs_created_at' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,254 @@
+"""
+Tests for SAM mask postprocessing and its microbenchmark
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from pycocotools import mask as mask_utils
+
+from benchmark_postprocess import compare_to_baseline, generate_synthetic_masks
+from models import rle
+from models.pipeline import ObjectCountingPipeline
+from models.postprocess import (
+    BACKGROUND_FILL, extract_segments_rle, fill_masked_crop, image_to_tensor, mask_overlaps, prefilter_masks,
+    sort_masks, suppress_duplicate_masks
+)
+
+
+def dense_segments(image, masks, top_n):
+    """
+    Reference for extract_segments_rle(): paint a full-image panoptic map of
+    the top-N masks (smaller masks last) and crop each label in it
+
+    Returns:
+        tuple: (boxes, areas, segments)
+    """
+    img_tensor = image_to_tensor(image)
+    panoptic_map = torch.zeros(img_tensor.shape[1:], dtype=torch.int32)
+    for idx, mask_data in enumerate(sort_masks(masks)[:top_n]):
+        panoptic_map[torch.from_numpy(mask_data['segmentation'])] = idx + 1
+
+    boxes, areas, segments = [], [], []
+    for label in [label for label in panoptic_map.unique().tolist() if label != 0]:
+        ys, xs = np.where((panoptic_map == label).numpy())
+        y0, y1, x0, x1 = ys.min(), ys.max(), xs.min(), xs.max()
+        boxes.append([int(x0), int(y0), int(x1 - x0 + 1), int(y1 - y0 + 1)])
+        areas.append(len(ys))
+        segments.append(fill_masked_crop(
+            img_tensor[:, y0:y1 + 1, x0:x1 + 1], panoptic_map[y0:y1 + 1, x0:x1 + 1] == label
+        ))
+    return boxes, areas, segments
+
+
+def test_rle_segments_crop_each_visible_mask():
+    width, height = 64, 48
+    masks = generate_synthetic_masks(width, height, 6)
+    image = Image.fromarray(np.full((height, width, 3), 10, dtype=np.uint8), 'RGB')
+    rle_masks = [{**m, 'segmentation': rle.encode(m['segmentation'])} for m in masks]
+
+    (boxes, areas), segments = extract_segments_rle(image, rle_masks, top_n=10)
+
+    assert len(segments) == len(boxes) == len(areas) > 0
+    for (x, y, w, h), area, segment in zip(boxes.tolist(), areas.tolist(), segments):
+        assert segment.shape == (3, h, w)
+        crop_mask = (segment != BACKGROUND_FILL).any(dim=0)
+        assert int(crop_mask.sum()) == area
+        assert (segment[:, crop_mask] == 10).all()
+
+
+def test_smaller_masks_win_overlaps():
+    big = np.zeros((10, 10), dtype=bool)
+    big[:, :] = True
+    small = np.zeros((10, 10), dtype=bool)
+    small[2:4, 2:4] = True
+    masks = [{'segmentation': small, 'area': 4}, {'segmentation': big, 'area': 100}]
+    image = Image.new('RGB', (10, 10))
+
+    (boxes, areas), segments = extract_segments_rle(image, masks, top_n=10)
+
+    assert boxes.tolist() == [[0, 0, 10, 10], [2, 2, 2, 2]]
+    assert areas.tolist() == [96, 4]
+    assert len(segments) == 2
+
+
+@pytest.mark.parametrize('mask_format', ['coco_rle', 'uncompressed_rle', 'binary_mask'])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_rle_segments_match_a_dense_panoptic_map(mask_format, seed):
+    width, height = 97, 61
+    masks = generate_synthetic_masks(width, height, 25, seed=seed)
+    image = Image.fromarray(np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8))
+
+    def convert(segmentation):
+        if mask_format == 'binary_mask':
+            return segmentation
+        encoded = rle.encode(segmentation)
+        if mask_format == 'uncompressed_rle':
+            return {'size': encoded['size'], 'counts': rle.run_lengths(encoded).tolist()}
+        return encoded
+
+    expected_boxes, expected_areas, segments = dense_segments(image, masks, top_n=10)
+    (boxes, areas), rle_segments = extract_segments_rle(
+        image, [{**m, 'segmentation': convert(m['segmentation'])} for m in masks], top_n=10
+    )
+
+    assert boxes.tolist() == expected_boxes
+    assert areas.tolist() == expected_areas
+    assert len(rle_segments) == len(segments)
+    assert all(torch.equal(a, b) for a, b in zip(segments, rle_segments))
+
+
+def test_rle_window_decoding_matches_pycocotools():
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        height, width = rng.integers(1, 40, size=2)
+        mask = rng.random((height, width)) < rng.random()
+        encoded = rle.encode(mask)
+        x0, x1 = sorted(rng.integers(0, width, size=2))
+        y0, y1 = sorted(rng.integers(0, height, size=2))
+
+        assert rle.run_lengths(encoded).sum() == height * width
+        expected = mask_utils.decode(encoded).astype(bool)
+        assert (rle.decode_window(encoded, x0, y0, x1, y1) == expected[y0:y1 + 1, x0:x1 + 1]).all()
+
+
+def test_fully_covered_rle_masks_are_dropped():
+    def box_mask(y0, y1, x0, x1):
+        mask = np.zeros((10, 10), dtype=bool)
+        mask[y0:y1, x0:x1] = True
+        return mask
+
+    masks = [
+        {'segmentation': rle.encode(box_mask(1, 7, 1, 7)), 'area': 36},
+        # Painted over completely by its two halves below
+        {'segmentation': rle.encode(box_mask(2, 6, 2, 6)), 'area': 16},
+        {'segmentation': rle.encode(box_mask(2, 6, 2, 4)), 'area': 8},
+        {'segmentation': rle.encode(box_mask(2, 6, 4, 6)), 'area': 8},
+        {'segmentation': rle.encode(box_mask(0, 0, 0, 0)), 'area': 0},
+    ]
+
+    (boxes, areas), segments = extract_segments_rle(Image.new('RGB', (10, 10)), masks, top_n=10)
+    assert boxes.tolist() == [[1, 1, 6, 6], [2, 2, 2, 4], [4, 2, 2, 4]]
+    assert areas.tolist() == [20, 8, 8]
+    assert len(segments) == 3
+
+
+def box_rle(y0, y1, x0, x1, size=20):
+    mask = np.zeros((size, size), dtype=bool)
+    mask[y0:y1, x0:x1] = True
+    return rle.encode(mask)
+
+
+def test_mask_overlaps_reports_iou_and_containment():
+    whole, part = box_rle(0, 10, 0, 10), box_rle(0, 5, 0, 5)
+    iou, containment = mask_overlaps([whole, part])
+
+    assert iou[0, 1] == pytest.approx(0.25)
+    assert containment[0, 1] == pytest.approx(1.0)  # all of the part is inside the whole
+    assert containment[1, 0] == pytest.approx(0.25)
+
+
+def test_mask_nms_drops_parts_and_duplicates():
+    rles = [
+        box_rle(0, 10, 0, 10),     # whole object
+        box_rle(0, 10, 0, 9),      # near duplicate (IoU 0.9)
+        box_rle(2, 6, 2, 6),       # part inside the whole
+        box_rle(12, 20, 12, 20),   # separate object
+        box_rle(8, 14, 8, 14),     # straddles the whole: mostly outside
+    ]
+
+    assert suppress_duplicate_masks(rles).tolist() == [True, False, False, True, True]
+    assert suppress_duplicate_masks(rles, iou_threshold=1, containment_threshold=1).all()
+    assert suppress_duplicate_masks(rles, iou_threshold=1).tolist() == [True, False, False, True, True]
+    assert suppress_duplicate_masks(rles, containment_threshold=1).tolist() == [True, False, True, True, True]
+
+
+def test_mask_nms_only_lets_suppressors_suppress():
+    rles = [box_rle(0, 20, 0, 20), box_rle(2, 8, 2, 8), box_rle(3, 7, 3, 7)]
+
+    assert suppress_duplicate_masks(rles).tolist() == [True, False, False]
+    assert suppress_duplicate_masks(rles, suppressors=[False, True, True]).tolist() == [True, True, False]
+
+
+def test_prefilter_rejects_background_slivers_and_unstable_masks():
+    rles = [
+        box_rle(5, 10, 5, 10),    # ordinary object
+        box_rle(0, 20, 0, 20),    # whole frame
+        box_rle(0, 8, 0, 20),     # sky-like band: top, left and right edges
+        box_rle(10, 11, 2, 18),   # 1 x 16 sliver
+        box_rle(11, 17, 11, 17),  # ordinary but unstable
+    ]
+    stability = [0.95, 0.95, 0.95, 0.95, 0.5]
+
+    def rejected(**thresholds):
+        return prefilter_masks(rles, stability, (20, 20), **thresholds).tolist()
+
+    assert rejected() == [False] * 5
+    assert rejected(max_area_fraction=0.9) == [False, True, False, False, False]
+    assert rejected(max_border_edges=2) == [False, True, True, False, False]
+    assert rejected(max_aspect_ratio=10) == [False, False, False, True, False]
+    assert rejected(min_area_fraction=0.05) == [False, False, False, True, False]
+    assert rejected(min_stability=0.9) == [False, False, False, False, True]
+
+
+def test_skipped_rle_masks_still_cover_smaller_ones_below():
+    masks = [
+        {'segmentation': box_rle(0, 20, 0, 20), 'area': 400},
+        {'segmentation': box_rle(0, 10, 0, 10), 'area': 100},
+    ]
+    image = Image.new('RGB', (20, 20))
+
+    (boxes, areas), segments = extract_segments_rle(image, masks, top_n=10, skip=[False, True])
+    assert segments[0] is not None and segments[1] is None
+    # The skipped mask is not cropped but still hides its pixels from the one below
+    assert areas.tolist() == [300, 100]
+    assert boxes.tolist()[1] == [0, 0, 10, 10]
+
+
+def segmenting_pipeline(masks, segment_filter, top_n=10):
+    """ObjectCountingPipeline with only segment_image() wired up, SAM returning masks"""
+    pipeline = ObjectCountingPipeline.__new__(ObjectCountingPipeline)
+    pipeline.TOP_N = top_n
+    pipeline.nms_iou_threshold, pipeline.nms_containment_threshold = 0.7, 0.9
+    pipeline.segment_filter = segment_filter
+    pipeline.mask_generator = SimpleNamespace(generate=lambda image: [dict(mask) for mask in masks])
+    return pipeline
+
+
+def test_prefiltered_background_does_not_suppress_objects_inside_it():
+    masks = [
+        {'segmentation': box_rle(0, 20, 0, 20), 'area': 400},   # background around everything
+        {'segmentation': box_rle(2, 8, 2, 8), 'area': 36},
+        {'segmentation': box_rle(11, 17, 11, 17), 'area': 36},
+        {'segmentation': box_rle(19, 20, 0, 1), 'area': 1},     # speck, ranked last
+    ]
+    image = np.zeros((20, 20, 3), dtype=np.uint8)
+    thresholds = {'max_area_fraction': 0.9, 'min_area_fraction': 0.01}
+
+    stats = {}
+    (boxes, _), segments = segmenting_pipeline(masks, {'mode': 'drop', **thresholds}).segment_image(image, stats)
+    assert boxes.tolist() == [[2, 2, 6, 6], [11, 11, 6, 6]]
+    assert stats['suppressed'] == 0 and stats['skipped'] == 2
+
+    # Rejected masks past the TOP_N segments were never going to be classified
+    stats = {}
+    segmenting_pipeline(masks, {'mode': 'drop', **thresholds}, top_n=2).segment_image(image, stats)
+    assert stats['skipped'] == 1
+
+    stats = {}
+    _, segments = segmenting_pipeline(masks, {'mode': 'background', **thresholds}).segment_image(image, stats)
+    assert [segment is None for segment in segments] == [True, False, False, True]
+    assert stats['skipped'] == 2
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {'results': {'case': {'extract': {'throughput_per_s': 100.0},
+                                     'sort': {'throughput_per_s': 100.0}}}}
+    report = {'results': {'case': {'extract': {'throughput_per_s': 80.0},
+                                   'sort': {'throughput_per_s': 95.0}}}}
+
+    regressions = compare_to_baseline(report, baseline, threshold=0.1)
+
+    assert [(case, step) for case, step, *_ in regressions] == [('case', 'extract')]
@@ -0,0 +1,96 @@
+"""
+Tests for per-segment persistence and the re-map job
+"""
+import io
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+import app as app_module
+from models.category_mapping import ClassCategoryTable
+from models.database import db, Output, OutputSegments, get_object_counts, pack_segment_data, unpack_segment_arrays
+from remap_results import category_counts, remap_results
+
+
+def count_all(client, min_segments=2):
+    """Post images until the fake pipeline finds at least min_segments segments"""
+    for shade in range(256):
+        image = io.BytesIO()
+        Image.new('RGB', (64, 48), color=(shade, 90, 30)).save(image, 'PNG')
+        image.seek(0)
+        response = client.post('/api/count-all', data={'image': (image, 'seed.png')},
+                               content_type='multipart/form-data')
+        data = response.get_json()
+        if data['total_segments'] >= min_segments:
+            return data
+    raise AssertionError('no image with enough segments')
+
+
+def stored_counts(output_id):
+    output = db.session.get(Output, output_id)
+    counts = {row['object_type']: row['predicted_count'] for row in get_object_counts([output_id])[output_id]}
+    return output.predicted_count, output.object_type.name, counts
+
+
+def test_count_all_stores_segments(app, client):
+    data = count_all(client)
+    with app.app_context():
+        row = OutputSegments.query.filter_by(output_fk=data['result_id']).one()
+        arrays = unpack_segment_arrays(row)
+        assert row.segment_count == data['total_segments']
+        assert row.target_object_type_fk is None
+        assert arrays['class_ids'].shape == (row.segment_count, row.top_k)
+        assert arrays['boxes'].shape == (row.segment_count, 4)
+
+        # Stored top-1 classes reproduce the response through the class table
+        table = app_module.pipeline.class_category_table()
+        labels = [table.label_of(class_id) for class_id in arrays['class_ids'][:, 0]]
+        assert {label: labels.count(label) for label in labels} == \
+            {obj['type']: obj['count'] for obj in data['objects']}
+
+
+def test_remap_with_same_table_changes_nothing(app, client):
+    data = count_all(client)
+    with app.app_context():
+        before = stored_counts(data['result_id'])
+
+    remap_results(app_module.pipeline.class_category_table(), batch_size=3)
+    with app.app_context():
+        assert stored_counts(data['result_id']) == before
+
+
+def test_remap_with_new_table_recounts_and_restores(app, client):
+    data = count_all(client)
+    total = data['total_objects']
+    table = app_module.pipeline.class_category_table()
+    with app.app_context():
+        before = stored_counts(data['result_id'])
+
+    everything_is_a_car = ClassCategoryTable(table.labels, [table.labels.index('car')] * len(table.categories))
+    totals = remap_results(everything_is_a_car, batch_size=2)
+    assert totals['remapped'] >= 1
+    with app.app_context():
+        assert stored_counts(data['result_id']) == (total, 'car', {'car': total})
+
+    remap_results(table, batch_size=2)
+    with app.app_context():
+        assert stored_counts(data['result_id']) == before
+
+
+def test_topk_sums_probabilities_per_category():
+    table = ClassCategoryTable(['a', 'b'], [0, 1, 1])
+    segment_data = {
+        'image_size': (10, 10),
+        'boxes': np.zeros((1, 4)),
+        'areas': np.ones(1),
+        # Class 0 ('a') is the best single class, but 'b' has more total probability
+        'class_ids': np.array([[0, 1, 2]]),
+        'logits': np.log(np.array([[0.4, 0.35, 0.25]])),
+    }
+    row = SimpleNamespace(**pack_segment_data(segment_data))
+
+    counts, _ = category_counts([row], table, method='top1')
+    assert counts.tolist() == [[1, 0]]
+    counts, _ = category_counts([row], table, method='topk')
+    assert counts.tolist() == [[0, 1]]
@@ -0,0 +1,67 @@
+"""
+Tests for streaming results export
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+
+from models.database import Output, db, save_prediction_result
+from results_export import EXPORT_COLUMNS
+
+
+def seed(app, count=7):
+    with app.app_context():
+        outputs = [save_prediction_result(f"export_{i}.jpg", 'car' if i % 2 else 'dog', i) for i in range(count)]
+        return [o.id for o in outputs]
+
+
+def export(client, **params):
+    response = client.get('/api/results/export', query_string=params)
+    assert response.status_code == 200
+    assert response.is_streamed
+    return response.data
+
+
+def test_formats_export_the_same_rows(app, client, monkeypatch):
+    ids = seed(app)
+    monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 3)
+
+    rows = list(csv.DictReader(io.StringIO(export(client, format='csv').decode())))
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    exported = [int(row['result_id']) for row in rows]
+    assert exported == sorted(exported) and set(ids) <= set(exported)
+
+    lines = export(client, format='jsonl').decode().splitlines()
+    assert [json.loads(line)['result_id'] for line in lines] == exported
+
+    table = pq.read_table(io.BytesIO(export(client, format='parquet')))
+    assert table.column_names == list(EXPORT_COLUMNS)
+    assert table.column('result_id').to_pylist() == exported
+    # One row group per cursor batch
+    assert pq.ParquetFile(io.BytesIO(export(client, format='parquet'))).num_row_groups == -(-len(exported) // 3)
+
+
+def test_filters(app, client):
+    ids = seed(app)
+    with app.app_context():
+        old = db.session.get(Output, ids[0])
+        old.created_at = datetime(2020, 1, 1)
+        db.session.commit()
+
+    lines = export(client, format='jsonl', end='2020-01-02').decode().splitlines()
+    assert [json.loads(line)['result_id'] for line in lines] == [ids[0]]
+
+    start = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    rows = [json.loads(line) for line in export(client, format='jsonl', start=start, object_type='car').decode().splitlines()]
+    assert rows and all(row['object_type'] == 'car' for row in rows)
+    assert ids[0] not in {row['result_id'] for row in rows}
+
+    assert export(client, format='csv', object_type='unicorn').decode().strip() == ','.join(EXPORT_COLUMNS)
+
+
+def test_invalid_parameters(client):
+    assert client.get('/api/results/export?format=xml').status_code == 400
+    assert client.get('/api/results/export?start=yesterday').status_code == 400
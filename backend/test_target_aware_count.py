@@ -0,0 +1,138 @@
+"""
+Parity tests for the target-aware count_objects path
+"""
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from benchmark_postprocess import generate_synthetic_masks, synthetic_image
+from models import rle
+from models.category_mapping import CANDIDATE_LABELS
+from models.pipeline import ObjectCountingPipeline
+
+NUM_CLASSES = 30
+# Classes only ever map to the first six labels; 'cat' .. 'sky' cannot be produced
+REACHABLE_LABELS = CANDIDATE_LABELS[:6]
+
+
+def label_of(class_name):
+    return CANDIDATE_LABELS[int(class_name.split('_')[1]) % len(REACHABLE_LABELS)]
+
+
+class StandInPipeline(ObjectCountingPipeline):
+    """ObjectCountingPipeline with small deterministic stand-ins for SAM, ResNet-50 and the NLI model"""
+
+    def _setup_device(self):
+        self.device = "cpu"
+        self.calls = {"sam": 0, "resnet": 0, "nli": 0}
+
+    def _setup_sam_model(self):
+        def generate(image):
+            self.calls["sam"] += 1
+            masks = generate_synthetic_masks(image.shape[1], image.shape[0], 30)
+            return [{**m, 'segmentation': rle.encode(m['segmentation'])} for m in masks]
+        self.mask_generator = SimpleNamespace(generate=generate)
+
+    def _setup_classification_model(self):
+        weights = torch.from_numpy(np.random.default_rng(3).normal(size=(3, NUM_CLASSES))).float()
+
+        def model(pixel_values):
+            self.calls["resnet"] += 1
+            return SimpleNamespace(logits=pixel_values @ weights)
+        model.config = SimpleNamespace(id2label={idx: f"class_{idx}" for idx in range(NUM_CLASSES)})
+        self.class_model = model
+        # Mean color of each crop stands in for the preprocessed pixels
+        self.image_processor = lambda images, return_tensors: {
+            'pixel_values': torch.stack([segment.float().mean(dim=(1, 2)) / 255 for segment in images])
+        }
+
+    def _setup_label_classifier(self):
+        def classify(class_name, candidate_labels):
+            self.calls["nli"] += 1
+            return {'labels': [label_of(class_name)]}
+        self.label_classifier = classify
+
+
+def comparable(result):
+    """A count_objects result without timings and detected labels"""
+    segment_data = result['segment_data'] or {}
+    return (
+        result['count'], result['total_segments'],
+        {key: np.asarray(value).tolist() for key, value in segment_data.items()}
+    )
+
+
+@pytest.fixture
+def image():
+    return np.array(synthetic_image(96, 64))
+
+
+def test_target_aware_count_matches_full_pipeline(tmp_path, image):
+    full = StandInPipeline(target_aware_count=False)
+    target_aware = StandInPipeline(category_cache_path=str(tmp_path / 'classes.json'))
+    table = target_aware.class_category_table()
+
+    counted = 0
+    for target in CANDIDATE_LABELS + ['hardware']:
+        expected = full.count_objects(image, target)
+        target_aware.calls.update(sam=0, resnet=0, nli=0)
+        result = target_aware.count_objects(image, target)
+
+        assert result['count'] == expected['count']
+        if target in REACHABLE_LABELS:
+            assert comparable(result) == comparable(expected)
+            assert result['early_exit'] is False
+            # Only segments with a top-k class mapping to the target are labelled
+            class_ids = np.asarray(expected['segment_data']['class_ids'])
+            candidates = np.isin(class_ids, table.classes_of(target)).any(axis=1)
+            assert len(result['all_detected_objects']) == int(candidates.sum())
+            assert not Counter(result['all_detected_objects']) - Counter(expected['all_detected_objects'])
+            counted += result['count']
+        else:
+            assert result['early_exit'] is True and result['segment_data'] is None
+            assert target_aware.calls == {"sam": 0, "resnet": 0, "nli": 0}
+    assert counted == len(full.count_objects(image, 'person')['all_detected_objects'])
+
+
+def test_target_aware_count_skips_mapping_and_unreachable_targets(tmp_path, image, monkeypatch):
+    pipeline = StandInPipeline(category_cache_path=str(tmp_path / 'classes.json'))
+    pipeline.class_category_table()
+    pipeline.calls.update(sam=0, resnet=0, nli=0)
+
+    pipeline.count_objects(image, 'car')
+    assert pipeline.calls["sam"] == 1 and pipeline.calls["nli"] == 0
+    resnet_calls = pipeline.calls["resnet"]
+
+    result = pipeline.count_objects(image, 'sky')
+    assert result['count'] == 0 and result['segment_data'] is None
+    assert pipeline.calls == {"sam": 1, "resnet": resnet_calls, "nli": 0}
+
+    # A restarted pipeline loads the table from the cache at startup, not per request
+    restarted = StandInPipeline(category_cache_path=str(tmp_path / 'classes.json'))
+    monkeypatch.setattr('models.pipeline.load_class_category_table', lambda *args: pytest.fail("read per request"))
+    assert restarted.count_objects(image, 'sky')['early_exit'] is True
+    assert restarted.calls == {"sam": 0, "resnet": 0, "nli": 0}
+
+
+def test_missing_table_is_built_in_the_background(tmp_path, image):
+    pipeline = StandInPipeline(category_cache_path=str(tmp_path / 'classes.json'), warm_category_table=False)
+    assert pipeline.cached_class_category_table() is None
+
+    pipeline.warm_class_category_table().join()
+    assert (tmp_path / 'classes.json').exists()
+    assert pipeline.calls["nli"] == NUM_CLASSES
+    assert pipeline.count_objects(image, 'sky')['early_exit'] is True
+    assert pipeline.calls["nli"] == NUM_CLASSES
+
+
+def test_without_a_table_count_objects_runs_the_full_pipeline(tmp_path, image):
+    pipeline = StandInPipeline(category_cache_path=str(tmp_path / 'classes.json'), warm_category_table=False)
+
+    result = pipeline.count_objects(image, 'sky')
+    assert result['early_exit'] is False
+    assert pipeline.calls["nli"] == result['total_segments']
+    # Counting never builds the table; only warm_class_category_table() does
+    assert not (tmp_path / 'classes.json').exists()
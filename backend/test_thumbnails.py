@@ -0,0 +1,99 @@
+"""
+Tests for resized upload variants
+"""
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from thumbnails import VariantGenerator
+
+
+def write_upload(folder, name, size=(800, 600), fmt='JPEG'):
+    os.makedirs(folder, exist_ok=True)
+    Image.new('RGB', size, color='green').save(os.path.join(folder, name), fmt)
+
+
+def test_get_variant_generates_and_caches(tmp_path):
+    folder = str(tmp_path)
+    write_upload(folder, 'photo.jpg')
+    generator = VariantGenerator(sizes={'thumb': 128}, max_workers=0)
+
+    path = generator.get_variant(folder, 'photo.jpg', 'thumb')
+    with Image.open(path) as variant:
+        assert max(variant.size) == 128
+        assert variant.format == 'JPEG'
+
+    mtime = os.path.getmtime(path)
+    assert generator.get_variant(folder, 'photo.jpg', 'thumb') == path
+    assert os.path.getmtime(path) == mtime
+
+    generator.remove(folder, 'photo.jpg')
+    assert not os.path.exists(path)
+
+
+def test_variant_path_replaces_extension(tmp_path):
+    generator = VariantGenerator(max_workers=0)
+    path = generator.variant_path(str(tmp_path), 'ab/cd/abcd.png', 'thumb')
+    assert path == os.path.join(str(tmp_path), '.variants', 'thumb', 'ab', 'cd', 'abcd.jpg')
+
+    with pytest.raises(FileNotFoundError):
+        generator.get_variant(str(tmp_path), 'missing.jpg', 'thumb')
+
+
+def test_enqueue_generates_in_background_and_bounds_queue(tmp_path):
+    folder = str(tmp_path)
+    write_upload(folder, 'a.png', fmt='PNG')
+    generator = VariantGenerator(sizes={'thumb': 64, 'medium': 256}, max_workers=1, max_queue=4)
+
+    assert generator.enqueue(folder, 'a.png')
+    generator.join()
+    for size in ('thumb', 'medium'):
+        assert os.path.exists(generator.variant_path(folder, 'a.png', size))
+
+    full = VariantGenerator(max_workers=0, max_queue=1)
+    assert full.enqueue(folder, 'a.png')
+    assert not full.enqueue(folder, 'a.png')
+
+
+def test_get_variant_rejects_unknown_size(tmp_path):
+    with pytest.raises(ValueError):
+        VariantGenerator(max_workers=0).get_variant(str(tmp_path), 'x.jpg', 'huge')
+
+
+def test_serve_upload_variant(client):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 900), color='red').save(buffer, 'JPEG')
+    buffer.seek(0)
+    response = client.post('/api/count-all',
+                           data={'image': (buffer, 'big.jpg')},
+                           content_type='multipart/form-data')
+    image_path = json.loads(response.data)['image_path']
+
+    thumb = client.get(f"/{image_path}?size=thumb")
+    assert thumb.status_code == 200
+    assert thumb.mimetype == 'image/jpeg'
+    with Image.open(io.BytesIO(thumb.data)) as variant:
+        assert max(variant.size) == 256
+
+    assert client.get(f"/{image_path}?size=poster").status_code == 400
+
+
+def test_variant_of_vanished_upload_is_not_found(client, monkeypatch):
+    import app as app_module
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color='blue').save(buffer, 'JPEG')
+    buffer.seek(0)
+    response = client.post('/api/count-all',
+                           data={'image': (buffer, 'gone.jpg')},
+                           content_type='multipart/form-data')
+    image_path = json.loads(response.data)['image_path']
+
+    # The original disappears between the existence check and variant generation
+    def vanished(upload_folder, filename, size):
+        raise FileNotFoundError(filename)
+    monkeypatch.setattr(app_module.upload_variants, 'get_variant', vanished)
+    assert client.get(f"/{image_path}?size=medium").status_code == 404
@@ -0,0 +1,101 @@
+"""
+Tests for HTTP caching of uploaded images
+"""
+import io
+import json
+import os
+
+from PIL import Image
+
+
+def upload(client, size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color='purple').save(buffer, 'JPEG')
+    buffer.seek(0)
+    response = client.post('/api/count-all',
+                           data={'image': (buffer, 'cache.jpg')},
+                           content_type='multipart/form-data')
+    return '/' + json.loads(response.data)['image_path']
+
+
+def test_upload_has_strong_etag_and_immutable_cache_control(client):
+    url = upload(client)
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('"')
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=31536000' in response.headers['Cache-Control']
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag'] != client.get(f"{url}?size=thumb").headers['ETag']
+
+
+def test_if_none_match_returns_304_without_sending_file(app, client, monkeypatch):
+    url = upload(client)
+    etag = client.get(url).headers['ETag']
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file should not be sent")
+    monkeypatch.setattr('app.send_file', fail)
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_deleted_upload_is_not_revalidated(app, client):
+    url = upload(client)
+    etag = client.get(url).headers['ETag']
+    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], url.split('/uploads/', 1)[1]))
+
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 404
+
+
+def test_path_outside_uploads_is_denied(client):
+    assert client.get('/uploads/..%2Fconfig.py').status_code == 403
+    # A sibling directory sharing the uploads prefix is outside too
+    assert client.get('/uploads/..%2Fuploads_private%2Fx.jpg').status_code == 403
+
+
+def test_if_modified_since_returns_304(client):
+    url = upload(client)
+    last_modified = client.get(url).headers['Last-Modified']
+
+    response = client.get(url, headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+
+def test_range_request_returns_partial_content(client):
+    url = upload(client)
+    full = client.get(url).data
+
+    response = client.get(url, headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.data == full[:100]
+    assert response.headers['Content-Range'] == f"bytes 0-99/{len(full)}"
+
+
+def test_x_accel_mode_hands_file_to_nginx(app, client, monkeypatch):
+    url = upload(client)
+    monkeypatch.setitem(app.config, 'UPLOAD_SERVE_MODE', 'x-accel')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/' + url.split('/uploads/', 1)[1]
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    thumb = client.get(f"{url}?size=thumb")
+    assert thumb.headers['X-Accel-Redirect'].startswith('/protected-uploads/.variants/thumb/')
+
+
+def test_x_sendfile_mode_sets_header(app, client, monkeypatch):
+    url = upload(client)
+    monkeypatch.setitem(app.config, 'UPLOAD_SERVE_MODE', 'x-sendfile')
+    monkeypatch.setitem(app.config, 'USE_X_SENDFILE', True)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['X-Sendfile'].endswith(url.rsplit('/', 1)[1])
@@ -0,0 +1,120 @@
+"""
+Tests for upload decoding and background persistence
+"""
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from upload_io import UploadWriter, decode_image
+
+
+def encode(size, fmt):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color='blue').save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_decode_image_returns_rgb_array(sample_image):
+    image, stats = decode_image(sample_image.getvalue())
+    assert isinstance(image, np.ndarray)
+    assert image.shape == (1, 1, 3)
+    assert image.dtype == np.uint8
+    assert stats['decoded_pixels'] == 1
+
+
+def test_decode_image_drafts_large_jpegs():
+    image, stats = decode_image(encode((4000, 3000), 'JPEG'), draft_size=1024)
+
+    assert stats['draft'] is True
+    assert stats['original_size'] == [4000, 3000]
+    # DCT scaling stops at the largest reduction that keeps the long side >= 1024
+    assert image.shape == (1500, 2000, 3)
+    assert stats['decoded_pixels'] == 2000 * 1500
+
+
+@pytest.mark.parametrize('fmt,draft_size', [('PNG', 1024), ('JPEG', None)])
+def test_decode_image_full_decode_fallback(fmt, draft_size):
+    image, stats = decode_image(encode((2400, 1800), fmt), draft_size=draft_size)
+    assert stats['draft'] is False
+    assert image.shape == (1800, 2400, 3)
+
+
+@pytest.mark.parametrize('policy', ['none', 'file', 'full'])
+def test_upload_writer_persists_bytes(tmp_path, policy):
+    writer = UploadWriter(max_workers=1, fsync_policy=policy)
+    path = str(tmp_path / 'nested' / 'upload.bin')
+
+    assert writer.submit(path, b'payload').result() == path
+    with open(path, 'rb') as f:
+        assert f.read() == b'payload'
+    assert not os.path.exists(f"{path}.part")
+    writer.shutdown()
+
+
+def test_failed_upload_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr('upload_io.os.replace', fail_replace)
+    writer = UploadWriter(max_workers=1)
+
+    with pytest.raises(OSError):
+        writer.submit(str(tmp_path / 'upload.bin'), b'payload').result()
+    assert os.listdir(tmp_path) == []
+    writer.shutdown()
+
+
+def test_upload_writer_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        UploadWriter(fsync_policy='sometimes')
+
+
+def test_claimed_upload_is_not_removed(tmp_path):
+    writer = UploadWriter(max_workers=1)
+    folder = str(tmp_path)
+    nothing_referenced = lambda paths: set()
+
+    relative_path = writer.store(folder, b'shared bytes', 'a.jpg').result()
+    path = os.path.join(folder, relative_path)
+    # Stored but its result is not committed yet
+    assert writer.condemn(folder, [relative_path], nothing_referenced) == []
+
+    writer.release(folder, relative_path)
+    assert writer.condemn(folder, [relative_path], nothing_referenced) == [relative_path]
+    # An identical upload dedups against the file before the cleanup worker gets to it
+    assert writer.store(folder, b'shared bytes', 'b.jpg').result() == relative_path
+    assert writer.remove(folder, relative_path) is False
+    assert os.path.exists(path)
+
+    writer.release(folder, relative_path)
+    assert writer.condemn(folder, [relative_path], lambda paths: set(paths)) == []
+    assert writer.condemn(folder, [relative_path], nothing_referenced) == [relative_path]
+    assert writer.remove(folder, relative_path) is True
+    assert not os.path.exists(path)
+    writer.shutdown()
+
+
+def test_count_endpoint_persists_original_upload(app, client, sample_image):
+    original = sample_image.getvalue()
+    response = client.post('/api/count',
+                           data={'image': (sample_image, 'photo.png'), 'object_type': 'car'},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+    data = json.loads(response.data)
+    assert data['stage_metrics']['decoded_pixels'] == 1
+    assert 'decode' in data['stage_metrics']['stage_times']
+    filename = data['image_path'].split('/', 1)[1]
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'rb') as f:
+        assert f.read() == original
+
+
+def test_count_endpoint_rejects_undecodable_upload(client):
+    response = client.post('/api/count-all',
+                           data={'image': (io.BytesIO(b'not an image'), 'photo.jpg')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
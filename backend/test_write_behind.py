@@ -0,0 +1,172 @@
+"""
+Tests for write-behind persistence of prediction results
+"""
+import json
+import os
+
+import numpy as np
+
+from models.database import (
+    IdAllocator, Input, Output, OutputObjectCount, OutputSegments, db, save_prediction_result, unpack_segment_arrays
+)
+from result_writer import ResultWriteBehind
+from test_db_concurrency import create_file_app
+
+
+def test_results_commit_in_batches_with_preallocated_ids(tmp_path):
+    app = create_file_app(tmp_path)
+    with app.app_context():
+        existing = save_prediction_result('before.jpg', 'car', 1).id
+
+    committed = []
+    writer = ResultWriteBehind(app, str(tmp_path / 'journal.jsonl'), batch_size=10, max_delay=0.05,
+                               on_commit=committed.append)
+    records = [writer.submit(f"wb_{i}.jpg", 'car', i, object_counts={'car': i, 'dog': 1}) for i in range(25)]
+    writer.flush()
+
+    ids = [record['output_id'] for record in records]
+    assert len(set(ids)) == 25 and min(ids) > existing
+    assert sum(len(batch) for batch in committed) == 25
+    assert all(len(batch) <= 10 for batch in committed)
+    with app.app_context():
+        stored = db.session.get(Output, ids[3])
+        assert stored.predicted_count == 3
+        assert stored.input.image_path == 'wb_3.jpg'
+        assert OutputObjectCount.query.filter_by(output_fk=ids[3]).count() == 2
+        db.engine.dispose()
+    # Everything was acknowledged, so the journal starts over
+    with open(writer.journal_path) as f:
+        assert f.read() == ''
+
+
+def test_unacknowledged_results_are_replayed_once(tmp_path):
+    app = create_file_app(tmp_path)
+    journal = str(tmp_path / 'journal.jsonl')
+
+    # No writer thread: results are journaled but never committed, as after a crash
+    crashed = ResultWriteBehind(app, journal, start=False)
+    segment_data = {
+        'image_size': (32, 24), 'boxes': np.array([[1, 2, 3, 4]]), 'areas': np.array([9]),
+        'class_ids': np.array([[7, 8]]), 'logits': np.array([[2.5, -1.0]]), 'target_object_type': 'dog'
+    }
+    records = [crashed.submit(f"crash_{i}.jpg", 'dog', i, segment_data=segment_data if i == 0 else None)
+               for i in range(3)]
+    with open(crashed.journal_path, 'a') as f:
+        f.write('{"result": {"output_id": ')  # torn write
+    crashed.close()
+
+    restarted = ResultWriteBehind(app, journal, start=False)
+    with app.app_context():
+        assert {o.id for o in Output.query.all()} == {r['output_id'] for r in records}
+        segments = OutputSegments.query.one()
+        assert segments.output_fk == records[0]['output_id']
+        assert unpack_segment_arrays(segments)['class_ids'].tolist() == [[7, 8]]
+        assert unpack_segment_arrays(segments)['logits'].tolist() == [[2.5, -1.0]]
+    assert not os.path.exists(crashed.journal_path)
+
+    # The journal was cleared; replaying the same records again is a no-op
+    with open(journal, 'w') as f:
+        for record in records:
+            f.write(json.dumps({'result': record}) + '\n')
+    assert restarted.replay() == 3
+    with app.app_context():
+        assert Output.query.count() == 3
+        assert Input.query.count() == 3
+        db.engine.dispose()
+
+
+def test_allocators_reserve_disjoint_blocks(tmp_path):
+    app = create_file_app(tmp_path)
+    first, second = IdAllocator(app, 'outputs', 5), IdAllocator(app, 'outputs', 5)
+
+    ids = [first.next_id() for _ in range(7)] + [second.next_id() for _ in range(7)]
+    assert len(set(ids)) == len(ids)
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_sync_saves_and_write_behind_share_ids(tmp_path):
+    app = create_file_app(tmp_path, RESULT_WRITE_MODE='write-behind', ID_BLOCK_SIZE=5)
+    writer = ResultWriteBehind(app, str(tmp_path / 'journal.jsonl'), max_delay=0.01)
+
+    records = []
+    for i in range(6):
+        records.append(writer.submit(f"wb_{i}.jpg", 'car', i))
+        with app.app_context():
+            save_prediction_result(f"sync_{i}.jpg", 'car', i)
+    writer.flush()
+
+    with app.app_context():
+        assert Output.query.count() == 12
+        for record in records:
+            assert db.session.get(Output, record['output_id']).input.image_path == record['image_path']
+        db.engine.dispose()
+    assert not os.path.exists(writer.failed_path)
+
+
+def test_sync_saves_reserve_no_id_blocks(tmp_path):
+    app = create_file_app(tmp_path)
+    assert app.extensions['result_id_allocators'] == {}
+
+    with app.app_context():
+        ids = [save_prediction_result(f"sync_{i}.jpg", 'car', i).id for i in range(3)]
+        assert ids == sorted(ids) and len(set(ids)) == 3
+        assert db.session.execute(db.text("SELECT COUNT(*) FROM id_sequences")).scalar() == 0
+        db.engine.dispose()
+
+
+def test_results_whose_ids_are_taken_go_to_the_failed_journal(tmp_path):
+    app = create_file_app(tmp_path)
+    writer = ResultWriteBehind(app, str(tmp_path / 'journal.jsonl'), start=False, max_attempts=2)
+    output_taken = writer.submit('a.jpg', 'car', 1)
+    input_taken = writer.submit('b.jpg', 'car', 2)
+    unknown_type = writer.submit('c.jpg', 'unicorn', 3)
+    fine = writer.submit('d.jpg', 'car', 4)
+
+    # Rows written around the allocators, e.g. by another tool
+    with app.app_context():
+        db.session.add(Input(id=output_taken['input_id'] + 1000, image_path='other.jpg'))
+        db.session.flush()
+        db.session.add(Output(id=output_taken['output_id'], predicted_count=9, object_type_fk=1,
+                              input_fk=output_taken['input_id'] + 1000))
+        db.session.add(Input(id=input_taken['input_id'], image_path='other.jpg'))
+        db.session.commit()
+
+    writer._commit_with_retry([output_taken, input_taken, unknown_type, fine])
+
+    with open(writer.failed_path) as f:
+        failed = [json.loads(line) for line in f]
+    assert [entry['result']['image_path'] for entry in failed] == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert all(entry['error'] for entry in failed)
+    with app.app_context():
+        assert db.session.get(Output, output_taken['output_id']).predicted_count == 9
+        assert db.session.get(Output, fine['output_id']).input.image_path == 'd.jpg'
+        db.engine.dispose()
+
+
+def test_writers_only_replay_journals_of_stopped_writers(tmp_path):
+    app = create_file_app(tmp_path)
+    journal = str(tmp_path / 'journal.jsonl')
+
+    running = ResultWriteBehind(app, journal, start=False)
+    stopped = ResultWriteBehind(app, journal, start=False)
+    assert running.journal_path != stopped.journal_path
+    running.submit('running.jpg', 'car', 1)
+    stopped.submit('stopped.jpg', 'car', 2)
+    stopped.close()
+
+    starting = ResultWriteBehind(app, journal, start=False)
+    with app.app_context():
+        assert [o.input.image_path for o in Output.query.all()] == ['stopped.jpg']
+        db.engine.dispose()
+    assert os.path.exists(running.journal_path)
+    assert not os.path.exists(stopped.journal_path)
+    assert sorted(starting.journals()) == sorted([running.journal_path, starting.journal_path])
+
+
+def test_importing_the_app_starts_no_writer(app):
+    import app as app_module
+
+    # Only the server creates the writer (and replays journals), on first use
+    assert app_module.result_writer is None
+    assert app_module.start_result_writer() is None
@@ -0,0 +1,107 @@
+"""
+Resized variants of uploaded images
+Thumbnails and medium-size copies are generated once (at ingest on a
+background pool, or lazily on first request) and cached on disk next to the
+uploads, so history pages download kilobytes instead of full originals.
+"""
+
+import os
+import queue
+import threading
+
+from PIL import Image
+
+# Variant name -> longest side in pixels
+DEFAULT_VARIANT_SIZES = {'thumb': 256, 'medium': 1024}
+VARIANTS_DIRNAME = '.variants'
+
+
+class VariantGenerator:
+    """Generate and cache resized JPEG variants of uploads"""
+
+    def __init__(self, sizes=None, max_workers=1, max_queue=64, quality=85):
+        self.sizes = dict(sizes or DEFAULT_VARIANT_SIZES)
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+
+        for index in range(max_workers):
+            worker = threading.Thread(target=self._worker, name=f"variant-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def variant_path(self, upload_folder, filename, size):
+        """Cache location of a variant: <uploads>/.variants/<size>/<filename stem>.jpg"""
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(upload_folder, VARIANTS_DIRNAME, size, f"{stem}.jpg")
+
+    def enqueue(self, upload_folder, filename):
+        """
+        Queue all variants of an upload for background generation
+
+        Returns:
+            bool: False if the queue was full; the variants are then
+                  generated lazily on first request instead
+        """
+        try:
+            self._queue.put_nowait((upload_folder, filename))
+            return True
+        except queue.Full:
+            return False
+
+    def get_variant(self, upload_folder, filename, size):
+        """
+        Return the path of a variant, generating it now if it is not cached
+
+        Raises:
+            ValueError: Unknown size name
+            FileNotFoundError: The original upload does not exist
+        """
+        if size not in self.sizes:
+            raise ValueError(f"Unknown image size '{size}'. Choose one of: {', '.join(self.sizes)}")
+
+        path = self.variant_path(upload_folder, filename, size)
+        if not os.path.exists(path):
+            self._generate(upload_folder, filename, size)
+        return path
+
+    def remove(self, upload_folder, filename):
+        """Delete every cached variant of an upload"""
+        for size in self.sizes:
+            path = self.variant_path(upload_folder, filename, size)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _generate(self, upload_folder, filename, size):
+        original_path = os.path.join(upload_folder, filename)
+        path = self.variant_path(upload_folder, filename, size)
+        max_side = self.sizes[size]
+
+        with Image.open(original_path) as image:
+            # JPEGs can be decoded straight at (close to) the target size
+            image.draft('RGB', (max_side, max_side))
+            image = image.convert('RGB')
+            image.thumbnail((max_side, max_side))
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.part"
+            image.save(tmp_path, 'JPEG', quality=self.quality, optimize=True)
+            os.replace(tmp_path, path)
+
+        return path
+
+    def _worker(self):
+        while True:
+            upload_folder, filename = self._queue.get()
+            try:
+                for size in self.sizes:
+                    if not os.path.exists(self.variant_path(upload_folder, filename, size)):
+                        self._generate(upload_folder, filename, size)
+            except Exception as e:
+                print(f"⚠️  Warning: Could not generate variants for {filename}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until all queued variants are generated"""
+        self._queue.join()
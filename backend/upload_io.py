@@ -0,0 +1,248 @@
+"""
+Upload I/O helpers
+Decode uploaded images once in memory and persist the original bytes on a
+small background thread pool, so disk latency overlaps with inference instead
+of adding to it.
+
+Uploads are stored content-addressed by default: the file name is the SHA-256
+of the bytes, sharded two levels deep (ab/cd/abcd...jpg), so identical uploads
+share one file and no directory grows unbounded.
+
+Because files are shared, deleting one is coordinated with the writer: a
+stored upload is claimed until its result is committed, and a file is only
+removed if it is still unclaimed and condemned when the cleanup runs.
+"""
+
+import hashlib
+import io
+import math
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+# none: leave flushing to the OS
+# file: fsync the file before the write is reported done
+# full: fsync the file and its directory entry
+FSYNC_POLICIES = ('none', 'file', 'full')
+
+# content: sharded sha256 names, identical bytes stored once
+# flat: legacy <uuid>_<filename> names in the upload folder root
+UPLOAD_LAYOUTS = ('content', 'flat')
+
+
+def content_address(data, filename):
+    """
+    Relative storage path for upload bytes under the content layout
+
+    Returns:
+        str: 'ab/cd/<sha256><ext>' using the original file's extension
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    extension = os.path.splitext(secure_filename(filename))[1].lower()
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def flat_address(filename):
+    """Relative storage path under the legacy flat layout"""
+    return f"{uuid.uuid4()}_{secure_filename(filename)}"
+
+
+def decode_image(data, draft_size=None):
+    """
+    Decode image bytes into an RGB array
+
+    JPEGs larger than draft_size are decoded with Image.draft, which scales in
+    the DCT domain by 1/2, 1/4 or 1/8 and never below draft_size on the long
+    side. Other formats, or draft_size=None, get a full decode.
+
+    Args:
+        data (bytes): Encoded image
+        draft_size (int): Working resolution (long side) the caller needs
+
+    Returns:
+        tuple: ((height, width, 3) uint8 array, decode stats dict)
+    """
+    start = time.perf_counter()
+
+    with Image.open(io.BytesIO(data)) as image:
+        original_size = image.size
+        drafted = False
+
+        if draft_size and image.format == 'JPEG':
+            width, height = image.size
+            scale = draft_size / max(width, height)
+            if scale < 1:
+                requested = (math.ceil(width * scale), math.ceil(height * scale))
+                drafted = image.draft('RGB', requested) is not None
+
+        array = np.array(image.convert('RGB'))
+
+    decoded_height, decoded_width = array.shape[:2]
+    stats = {
+        "decode_time": round(time.perf_counter() - start, 4),
+        "decoded_pixels": decoded_width * decoded_height,
+        "original_size": list(original_size),
+        "decoded_size": [decoded_width, decoded_height],
+        "draft": drafted and (decoded_width, decoded_height) != tuple(original_size)
+    }
+    return array, stats
+
+
+class UploadWriter:
+    """Persist upload bytes to disk on a background thread pool"""
+
+    def __init__(self, max_workers=2, fsync_policy='none'):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}'. Choose one of: {', '.join(FSYNC_POLICIES)}")
+        self.fsync_policy = fsync_policy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-io')
+        # Stored files whose result is not committed yet, and files queued for removal
+        self._claims = Counter()
+        self._condemned = set()
+        self._lock = threading.Lock()
+
+    def submit(self, path, data):
+        """
+        Queue bytes to be written to path
+
+        Returns:
+            concurrent.futures.Future: Resolves to path once the file is written
+        """
+        return self._executor.submit(self._write, path, data)
+
+    def store(self, upload_folder, data, filename, layout='content'):
+        """
+        Queue upload bytes to be stored under the given layout
+
+        Hashing happens on the I/O thread too, so it overlaps with inference.
+        Under the content layout, bytes that are already stored are not
+        written again. The stored file is claimed until release() is called,
+        which the caller does once the result referencing it is committed.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the path relative to
+                upload_folder (the value stored in Input.image_path)
+        """
+        if layout not in UPLOAD_LAYOUTS:
+            raise ValueError(f"Unknown upload layout '{layout}'. Choose one of: {', '.join(UPLOAD_LAYOUTS)}")
+        return self._executor.submit(self._store, upload_folder, data, filename, layout)
+
+    def _store(self, upload_folder, data, filename, layout):
+        if layout == 'content':
+            relative_path = content_address(data, filename)
+        else:
+            relative_path = flat_address(filename)
+
+        path = os.path.join(upload_folder, *relative_path.split('/'))
+        exists = self.claim(upload_folder, relative_path)
+        if layout == 'content' and exists:
+            return relative_path
+
+        try:
+            self._write(path, data)
+        except Exception:
+            self.release(upload_folder, relative_path)
+            raise
+        return relative_path
+
+    def claim(self, upload_folder, relative_path):
+        """
+        Keep a stored file from being removed until release()
+
+        Returns:
+            bool: Whether the file exists
+        """
+        path = os.path.join(upload_folder, *relative_path.split('/'))
+        with self._lock:
+            # A pending removal is called off: the file is in use again
+            self._claims[path] += 1
+            self._condemned.discard(path)
+            return os.path.exists(path)
+
+    def release(self, upload_folder, relative_path):
+        """Drop the claim store() took, once the referencing result is committed"""
+        path = os.path.join(upload_folder, *relative_path.split('/'))
+        with self._lock:
+            self._claims[path] -= 1
+            if self._claims[path] <= 0:
+                del self._claims[path]
+
+    def condemn(self, upload_folder, relative_paths, find_referenced):
+        """
+        Mark the files that nothing uses any more for removal
+
+        Args:
+            upload_folder (str): Upload root
+            relative_paths (list): Paths of deleted inputs
+            find_referenced (callable): paths -> subset still stored on an input
+
+        Returns:
+            list: The condemned paths, to pass to remove()
+        """
+        with self._lock:
+            # Under the lock: a result committed after this check held a claim during it
+            unclaimed = [
+                relative_path for relative_path in relative_paths
+                if os.path.join(upload_folder, *relative_path.split('/')) not in self._claims
+            ]
+            referenced = find_referenced(unclaimed) if unclaimed else set()
+            condemned = [relative_path for relative_path in unclaimed if relative_path not in referenced]
+            self._condemned.update(os.path.join(upload_folder, *p.split('/')) for p in condemned)
+        return condemned
+
+    def remove(self, upload_folder, relative_path):
+        """
+        Delete a condemned file unless it was stored again since
+
+        Returns:
+            bool: True if the file was deleted
+        """
+        path = os.path.join(upload_folder, *relative_path.split('/'))
+        with self._lock:
+            if path not in self._condemned or path in self._claims:
+                self._condemned.discard(path)
+                return False
+            if os.path.exists(path):
+                os.remove(path)
+            self._condemned.discard(path)
+            return True
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a unique temp name first so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if self.fsync_policy != 'none':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            # Don't leave the partial temp file behind (e.g. disk full)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        if self.fsync_policy == 'full' and hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        return path
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
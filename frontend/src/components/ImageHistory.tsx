@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { ArrowLeft, Calendar, Eye, Image as ImageIcon, TrendingUp, Clock, Users, RefreshCw, MousePointer, Trash2, Square, CheckSquare, Layers, X } from 'lucide-react';
-import api, { ApiObjectType } from '../services/api';
+import api, { ApiObjectType, ApiStatsResponse } from '../services/api';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import { Badge } from './ui/badge';
@@ -46,6 +46,7 @@ export function ImageHistory({ onBack }: HistoryProps) {
   const [currentPage, setCurrentPage] = useState(1);
   const [selectedFilter, setSelectedFilter] = useState<string>('all');
   const [objectTypes, setObjectTypes] = useState<ApiObjectType[]>([]);
+  const [accuracyStats, setAccuracyStats] = useState<ApiStatsResponse | null>(null);
   
   // Result details dialog state
   const [showDetailsDialog, setShowDetailsDialog] = useState(false);
@@ -116,9 +117,15 @@ export function ImageHistory({ onBack }: HistoryProps) {
     }
   };
 
+  // Accuracy over the whole history comes from the server; fall back to this page if unavailable
+  const loadStats = () => {
+    api.getStats().then(setAccuracyStats).catch(() => setAccuracyStats(null));
+  };
+
   // Manual refresh function
   const refreshData = async () => {
     console.log('🔄 Manually refreshing data...');
+    loadStats();
     await loadResults();
     
     // Show success message
@@ -294,6 +301,11 @@ export function ImageHistory({ onBack }: HistoryProps) {
     loadResults();
   }, [currentPage, selectedFilter]);
 
+  // Server stats cover every page, so paging does not refetch them
+  useEffect(() => {
+    loadStats();
+  }, [selectedFilter]);
+
   // Auto-refresh when component mounts and when returning from other pages
   useEffect(() => {
     console.log('📱 ImageHistory component mounted - auto-refreshing data');
@@ -369,10 +381,25 @@ export function ImageHistory({ onBack }: HistoryProps) {
     
     const avgF1Score = f1Scores.length > 0 ? f1Scores.reduce((a, b) => a + b, 0) / f1Scores.length : 0;
     
-    // Count performance categories
+    // Count performance categories (same thresholds as the server's /api/stats)
     const excellentCount = f1Scores.filter(score => score >= 90).length;
-    const goodCount = f1Scores.filter(score => score >= 60 && score < 90).length;
-    const needsReviewCount = f1Scores.filter(score => score < 60).length;
+    const goodCount = f1Scores.filter(score => score >= 70 && score < 90).length;
+    const needsReviewCount = f1Scores.filter(score => score < 70).length;
+
+    const serverStats = selectedFilter === 'all' ? accuracyStats?.overall
+      : accuracyStats?.by_object_type.find(row => row.object_type === selectedFilter);
+    if (accuracyStats) {
+      // No row means no corrected results of this type yet
+      return {
+        total: totalResults,
+        withFeedback: serverStats?.count ?? 0,
+        avgF1Score: Math.round(serverStats?.avg_f1_score ?? 0),
+        excellentCount: serverStats?.excellent_count ?? 0,
+        goodCount: serverStats?.good_count ?? 0,
+        needsReviewCount: serverStats?.needs_review_count ?? 0,
+        accuracy: serverStats && serverStats.count > 0 ? Math.round(serverStats.avg_f1_score) : 0
+      };
+    }
 
     return {
       total: totalResults,
@@ -656,7 +683,7 @@ export function ImageHistory({ onBack }: HistoryProps) {
                       <div className="aspect-square rounded-lg bg-gray-100 flex items-center justify-center overflow-hidden">
                         {result.image_path ? (
                           <img 
-                            src={`http://127.0.0.1:5000/uploads/${result.image_path}`}
+                            src={`http://127.0.0.1:5000/uploads/${result.image_path}?size=thumb`}
                             alt="Analyzed image"
                             className="w-full h-full object-cover"
                             onLoad={() => {
@@ -664,7 +691,7 @@ export function ImageHistory({ onBack }: HistoryProps) {
                             }}
                             onError={(e) => {
                               console.error('❌ Image failed to load:', result.image_path);
-                              console.error('   URL:', `http://127.0.0.1:5000/uploads/${result.image_path}`);
+                              console.error('   URL:', `http://127.0.0.1:5000/uploads/${result.image_path}?size=thumb`);
                               const target = e.target as HTMLImageElement;
                               target.style.display = 'none';
                               target.parentElement!.innerHTML = '<div class="text-gray-400"><svg class="h-12 w-12" fill="currentColor" viewBox="0 0 20 20"><path fill-rule="evenodd" d="M4 3a2 2 0 00-2 2v10a2 2 0 002 2h12a2 2 0 002-2V5a2 2 0 00-2-2H4zm12 12H4l4-8 3 6 2-4 3 6z" clip-rule="evenodd" /></svg></div>';
@@ -329,7 +329,7 @@ export function ResultDetailsDialog({
                     <div className="aspect-square rounded-lg bg-gray-100 flex items-center justify-center overflow-hidden">
                       {result.image_path ? (
                         <img 
-                          src={`http://127.0.0.1:5000/uploads/${result.image_path}`}
+                          src={`http://127.0.0.1:5000/uploads/${result.image_path}?size=medium`}
                           alt="Analyzed image"
                           className="w-full h-full object-cover"
                         />
@@ -53,6 +53,24 @@ export interface ApiHealthResponse {
   pipeline_available?: boolean;
 }
 
+export interface ApiAccuracyStats {
+  count: number;
+  avg_f1_score: number;
+  avg_precision: number;
+  avg_recall: number;
+  mae: number;
+  rmse: number;
+  excellent_count: number;
+  good_count: number;
+  needs_review_count: number;
+}
+
+export interface ApiStatsResponse {
+  success: boolean;
+  overall: ApiAccuracyStats;
+  by_object_type: (ApiAccuracyStats & { object_type: string })[];
+}
+
 class ObjectCountingAPI {
   
   /**
@@ -201,6 +219,22 @@ class ObjectCountingAPI {
     }
   }
 
+  /**
+   * Get accuracy stats over all corrected results, overall and per object type
+   */
+  async getStats(): Promise<ApiStatsResponse> {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/stats`);
+      if (!response.ok) {
+        throw new Error(`Failed to get stats: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error('Failed to get stats:', error);
+      throw error;
+    }
+  }
+
   /**
    * Performance monitoring methods
    */